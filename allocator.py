@@ -0,0 +1,166 @@
+""" Invoice number allocation that is safe across processes and crashes. """
+import os
+import time
+from configparser import ConfigParser
+
+CONFIG_PATH: str = './config.ini'
+LOCK_TIMEOUT: float = 10.0
+STALE_LOCK_AGE: float = 30.0
+
+
+class FileLock:
+    """
+    A lock held by creating `<path>.lock` exclusively. Works on every platform and between unrelated
+    processes. A lock file older than `STALE_LOCK_AGE` seconds is treated as left behind by a crashed
+    process and removed. Removing it is itself done under `<path>.lock.break`, and the age is checked
+    again once that is held, so a process that saw the stale lock late never removes the fresh lock
+    another process has created since.
+    """
+
+    def __init__(self, path, timeout=LOCK_TIMEOUT):
+        self.lock_path = path + '.lock'
+        self.timeout = timeout
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        delay = 0.001
+        while True:
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self._break_stale():
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f'Could not lock {self.lock_path} within {self.timeout:.0f}s')
+                time.sleep(delay)
+                delay = min(delay * 2, 0.05)
+            else:
+                os.write(fd, str(os.getpid()).encode())
+                os.close(fd)
+                return self
+
+    def __exit__(self, *exc):
+        os.remove(self.lock_path)
+
+    def _break_stale(self):
+        # Returns True when the lock file is gone, having removed it if it was stale
+        if not _is_stale(self.lock_path):
+            return not os.path.exists(self.lock_path)
+        breaker = self.lock_path + '.break'
+        try:
+            os.close(os.open(breaker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            if _is_stale(breaker):  # the process breaking the lock crashed while doing so
+                _remove(breaker)
+            return False
+        try:
+            if _is_stale(self.lock_path):
+                _remove(self.lock_path)
+        finally:
+            os.remove(breaker)
+        return True
+
+
+class InvoiceNumberAllocator:
+    """
+    Hands out invoice numbers from the `invoice_number` setting of the configuration file.
+
+    The counter is advanced under a `FileLock` and written with an atomic rename before a number is
+    handed out, so two processes never get the same number and a crash while rendering can only skip
+    a number, never reuse it. With `lease` above 1, a block of numbers is reserved per counter update,
+    so high-volume runs rewrite the configuration file once per block instead of once per invoice.
+    """
+
+    def __init__(self, config_path=CONFIG_PATH, lease=1):
+        """
+        Args:
+        - `config_path` (str): Path to the configuration file holding the counter.
+        - `lease` (int): Numbers reserved per counter update.
+        """
+
+        self.config_path = config_path
+        self.lease = max(1, lease)
+        self._start = 0  # the first number of the current run of back-to-back leases
+        self._next = 0
+        self._end = 0
+
+    def next(self):
+        """
+        Returns the next invoice number, e.g. '000042'.
+        """
+
+        if self._next == self._end:
+            start, end = self._reserve(self.lease)
+            if start != self._end:
+                self._start = start
+            self._next, self._end = start, end
+        number = self._next
+        self._next += 1
+        return str(number).zfill(6)
+
+    def give_back(self, count):
+        """
+        Takes back the last `count` numbers handed out when they were not used after all (e.g. their
+        invoices failed to render), so `next()` hands them out again and `release()` can give them back.
+        Returns False, taking nothing back, if they were not all leased back to back by this allocator.
+        """
+
+        if count > self._next - self._start:
+            return False
+        self._next -= count
+        return True
+
+    def release(self):
+        """
+        Gives unused leased numbers back when no other process has reserved numbers since, so a run
+        that ends early leaves no gap. Returns the number of numbers given back.
+        """
+
+        if self._next == self._end:
+            return 0
+        with FileLock(self.config_path):
+            parser = _read(self.config_path)
+            if int(parser.get('settings', 'invoice_number')) != self._end:
+                return 0
+            _write_number(self.config_path, parser, self._next)
+        released = self._end - self._next
+        self._end = self._next
+        return released
+
+    def _reserve(self, count):
+        with FileLock(self.config_path):
+            parser = _read(self.config_path)
+            start = int(parser.get('settings', 'invoice_number'))
+            _write_number(self.config_path, parser, start + count)
+        return start, start + count
+
+
+def _is_stale(path):
+    try:
+        return time.time() - os.path.getmtime(path) > STALE_LOCK_AGE
+    except OSError:
+        return False
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _read(config_path):
+    parser = ConfigParser()
+    if not parser.read(config_path):
+        raise FileNotFoundError(config_path)
+    return parser
+
+
+def _write_number(config_path, parser, number):
+    parser['settings']['invoice_number'] = str(number).zfill(6)
+    temp_path = f'{config_path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as configfile:
+        parser.write(configfile)
+        configfile.flush()
+        os.fsync(configfile.fileno())
+    os.replace(temp_path, config_path)
@@ -0,0 +1,311 @@
+""" Headless batch invoicing for orders stored in a CSV or JSONL file. """
+import argparse
+import csv
+import datetime as dt
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from configparser import ConfigParser
+
+import metrics
+from allocator import InvoiceNumberAllocator
+from cart import Cart
+from catalog import get_catalog
+from journal import get_journal, sale_record
+from project import add_to_cart, build_invoice, parse_selection
+from renderers import get_renderer
+from sinks import INVOICES_DIR, DirectorySink, open_sink
+from validation import validate_customer
+
+
+def read_orders(path):
+    """
+    Streams orders from a CSV or JSONL file, one at a time, so large backlogs are never loaded into memory.
+
+    CSV files need the columns `cx_name`, `cx_unit`, `cx_street`, `cx_city`, `cx_province`, `cx_postal` and `cart`,
+    where `cart` holds "Service xQuantity" selections separated by `;`.
+    JSONL files hold one object per line with `cx_name`, either a `cx_address` object or the flat address fields,
+    and `cart` as a list of "Service xQuantity" selections.
+
+    Args:
+    - `path` (str): Path to the orders file (`.csv` or `.jsonl`).
+
+    Yields:
+    - `line_no` (int): The line number of the order in the file.
+    - `order` (dict): The raw order, or the exception raised while parsing it.
+    """
+
+    if os.path.splitext(path)[1].lower() == '.csv':
+        with open(path, 'r', newline='') as file:
+            reader = csv.DictReader(file)
+            for row in reader:
+                order = {key.strip(): (value or '').strip() for key, value in row.items() if key}
+                order['cart'] = [line for line in order.get('cart', '').split(';') if line.strip()]
+                yield reader.line_num, order
+    else:
+        with open(path, 'r') as file:
+            for line_no, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except ValueError as e:
+                    yield line_no, e
+
+
+def build_order(order, catalog):
+    """
+    Validates a raw order (customer details with `validate_customer()`, services against the catalog)
+    and builds the customer details and cart exactly like the interactive checkout does.
+
+    Args:
+    - `order` (dict): The raw order as read by `read_orders()`.
+    - `catalog` (ServiceCatalog): The offered services.
+
+    Returns:
+    - `cx_name` (str): The customer's name.
+    - `cx_address` (dict): The customer's address details.
+    - `cart` (Cart): The shopping cart containing the ordered services.
+
+    Raises:
+    - `ValueError`: If a customer field is missing or invalid, a service is not offered or the cart is empty.
+    """
+
+    cx_name, cx_address = validate_customer(order)
+    return cx_name, cx_address, build_cart(order.get('cart') or [], catalog)
+
+
+def build_cart(selections, catalog):
+    """
+    Builds a cart from "Service xQuantity" selections, like the interactive checkout does.
+
+    Args:
+    - `selections` (list): The selections, e.g. `["Virus Removal x2", "RAM Upgrade"]`.
+    - `catalog` (ServiceCatalog): The offered services.
+
+    Returns:
+    - `cart` (Cart): The shopping cart.
+
+    Raises:
+    - `ValueError`: If a service is not offered or the cart is empty.
+    """
+
+    cart = Cart()
+    for selection in selections:
+        service, quantity = parse_selection(str(selection).strip())
+        row = catalog.find(service)
+        if row is None:
+            suggestions = catalog.suggest(service.title())
+            hint = f" (did you mean: {', '.join(suggestions)}?)" if suggestions else ''
+            raise ValueError(f'unknown service "{service}"{hint}')
+        if quantity == 0:
+            continue
+        add_to_cart([*row, quantity], cart, quiet=True)
+
+    if len(cart) == 0:
+        raise ValueError('empty cart')
+    return cart
+
+
+def render_job(job):
+    """
+    Renders one invoice in memory. Runs in a worker process when the batch uses more than one worker.
+
+    Args:
+    - `job` (tuple): The arguments of `build_invoice()` followed by the renderer name.
+
+    Returns:
+    - `result` (tuple): `(worker_pid, seconds, total, data, error)` where `total` is the balance due,
+      `data` the PDF file contents and `error` is None unless rendering failed.
+    """
+
+    start = time.perf_counter()
+    try:
+        with metrics.profile(job[0]):
+            invoice = build_invoice(*job[:-1])
+            data = get_renderer(job[-1]).render_bytes(invoice)
+        return os.getpid(), time.perf_counter() - start, invoice['balance_due'], data, None
+    except Exception as e:
+        return os.getpid(), time.perf_counter() - start, None, None, str(e)
+
+
+def _init_worker(renderer_name):
+    """
+    Loads the renderer (and with it the template) once per worker process. Workers record no metrics,
+    the parent process records the outcome of every job.
+    """
+
+    metrics.disable()
+    renderer = get_renderer(renderer_name)
+    if hasattr(renderer, 'logo'):
+        renderer.logo()
+
+
+def _blocks(items, size):
+    block = []
+    for item in items:
+        block.append(item)
+        if len(block) == size:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+def run_batch(path, workers=1, chunk_size=16, output=INVOICES_DIR):
+    """
+    Creates an invoice for every order in the file. Invalid orders and failed invoices are reported
+    and skipped without stopping the run.
+
+    Invoice numbers are leased in blocks and handed out in the parent process, in file order, to
+    validated orders only. Rendering is fanned out to a pool of `workers` processes. When an invoice of
+    a block fails to render, the invoices after it are rendered again with the numbers moved up, and
+    the numbers left over are given back to the allocator for the next block, so the numbers stay
+    gap-free and in file order. The PDFs are written in invoice-number order. Sales go to the checkout
+    journal (see `journal.py`), which commits each block in a few groups before its PDFs are written.
+
+    Args:
+    - `path` (str): Path to the orders file (`.csv` or `.jsonl`).
+    - `workers` (int): Number of worker processes; 1 renders in this process.
+    - `chunk_size` (int): Number of invoices sent to a worker at a time.
+    - `output` (str): Directory for the PDFs, or a `.zip` / `.tar` archive to append them to.
+
+    Returns:
+    - `created` (int): Number of invoices created.
+    - `failures` (list): `(line_no, error)` pairs for every order that failed.
+    """
+
+    catalog = get_catalog()
+    parser = ConfigParser()
+    parser.read('./config.ini')
+    block_size = max(1, workers) * chunk_size * 4
+    allocator = InvoiceNumberAllocator(lease=block_size)
+    business = dict(parser['business_data'])
+    renderer_name = parser.get('settings', 'renderer', fallback='pdf')
+
+    created = 0
+    failures = []
+    skipped = []
+    worker_stats = {}
+
+    def jobs():
+        for line_no, order in read_orders(path):
+            try:
+                if isinstance(order, Exception):
+                    raise order
+                cx_name, cx_address, cart = build_order(order, catalog)
+            except Exception as e:
+                failures.append((line_no, str(e)))
+                metrics.count_error('order')
+                print(f'❌ Order on line {line_no}: {e}')
+                continue
+            invoice_number = allocator.next()
+            date_time = dt.datetime.today().strftime('%m-%d-%Y') + ' ' + dt.datetime.now().strftime('%I:%M %p')
+            yield line_no, (invoice_number, date_time, business, cx_name, cx_address, cart, renderer_name)
+
+    def render(block):
+        job_list = [job for _, job in block]
+        if pool is not None:
+            results = pool.map(render_job, job_list, chunksize=chunk_size)
+        else:
+            results = map(render_job, job_list)
+        for item, (pid, seconds, total, data, error) in zip(block, results):
+            count, busy = worker_stats.get(pid, (0, 0.0))
+            worker_stats[pid] = (count + 1, busy + seconds)
+            metrics.observe('invoice', seconds)
+            yield item, (total, data, error)
+
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(renderer_name,))
+    sink = open_sink(output)
+    journal = get_journal()
+    start = time.perf_counter()
+    try:
+        for block in _blocks(jobs(), block_size):
+            numbers = [job[0] for _, job in block]
+            rendered = []
+            pending = render(block)
+            while pending:
+                retry = []
+                for (line_no, job), (total, data, error) in pending:
+                    if error is not None:
+                        failures.append((line_no, error))
+                        metrics.count_error('invoice')
+                        print(f'❌ Order on line {line_no}: {error}')
+                        continue
+                    number = numbers[len(rendered) + len(retry)]
+                    if retry or job[0] != number:
+                        retry.append((line_no, (number,) + job[1:]))
+                    else:
+                        rendered.append((job, total, data))
+                pending = render(retry) if retry else None
+            if not allocator.give_back(len(numbers) - len(rendered)):
+                skipped.extend(numbers[len(rendered):])
+
+            for job, total, data in rendered:
+                invoice_number, date_time, _, cx_name, cx_address, cart, _ = job
+                pdf = {'path': None, 'business': business, 'renderer': renderer_name}
+                if isinstance(sink, DirectorySink):
+                    pdf['path'] = os.path.abspath(os.path.join(sink.directory, f'{invoice_number}.pdf'))
+                journal.append(sale_record(invoice_number, date_time, cx_name, cx_address, cart, total, pdf))
+            # The block's sales are committed in a few groups rather than one by one, and before their
+            # PDFs are written, so a crash in between leaves sales that recovery renders again.
+            journal.wait()
+
+            for (invoice_number, _, _, _, _, cart, _), _, data in rendered:
+                sink.write(f'{invoice_number}.pdf', data)
+                metrics.count('invoices')
+                metrics.count('lines', len(cart))
+                created += 1
+    finally:
+        sink.close()
+        allocator.release()
+        if pool is not None:
+            pool.shutdown()
+
+    elapsed = time.perf_counter() - start
+    rate = created / elapsed if elapsed > 0 else 0.0
+    print('')
+    print(f'Invoices created : {created}')
+    print(f'Failed orders    : {len(failures)}')
+    if skipped:
+        print(f'Skipped numbers  : {", ".join(skipped)}')
+    print(f'Elapsed          : {elapsed:.2f}s ({rate:.1f} invoices/sec)')
+    for pid, (count, busy) in sorted(worker_stats.items()):
+        print(f'Worker {pid:<7}   : {count} invoices, {count / busy if busy > 0 else 0.0:.1f} invoices/sec')
+    return created, failures
+
+
+def main():
+    """
+    Command line entry point: `python batch.py orders.jsonl [--workers N] [--chunk-size N] [--output PATH]
+    [--metrics FILE] [--profile N]`.
+    """
+
+    arg_parser = argparse.ArgumentParser(description='Create invoices for every order in a CSV or JSONL file.')
+    arg_parser.add_argument('orders', help='path to the orders file (.csv or .jsonl)')
+    arg_parser.add_argument('--workers', type=int, default=1, help='number of worker processes (default: 1)')
+    arg_parser.add_argument('--chunk-size', type=int, default=16, help='invoices sent to a worker at a time')
+    arg_parser.add_argument('--output', default=INVOICES_DIR,
+                            help=f'directory, .zip or .tar archive for the invoices (default: {INVOICES_DIR}/)')
+    arg_parser.add_argument('--metrics', metavar='FILE',
+                            help='write stage timings and counters to FILE (.json, else Prometheus text)')
+    arg_parser.add_argument('--profile', type=int, default=0, metavar='N',
+                            help='save cProfile traces of the N slowest invoices in profiles/ (with --workers 1)')
+    args = arg_parser.parse_args()
+
+    if args.metrics or args.profile:
+        metrics.enable(profile_slowest=args.profile)
+    _, failures = run_batch(args.orders, args.workers, args.chunk_size, args.output)
+    if args.metrics:
+        metrics.write(args.metrics)
+        print(f'Metrics          : {args.metrics}')
+    for path, seconds in metrics.dump_profiles() if args.profile else []:
+        print(f'Profile          : {path} ({seconds * 1000:.1f} ms)')
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+""" Benchmarks for the invoice pipeline. Run from the repository root, e.g. `python -m benchmarks.fill`. """
@@ -0,0 +1,122 @@
+""" Service lookup and suggestion latency: `python -m benchmarks.catalog [sizes...] [--reload SIZE]` """
+import argparse
+import csv
+import difflib
+import os
+import random
+import tempfile
+import time
+
+import catalog
+from catalog import LiveCatalog, ServiceCatalog
+
+WORDS = ('Screen', 'Battery', 'Keyboard', 'Hinge', 'Fan', 'Hard Drive', 'SSD', 'RAM', 'Motherboard', 'Charger',
+         'Port', 'Speaker', 'Camera', 'Trackpad', 'Display', 'Cable', 'Bracket', 'Housing', 'Antenna', 'Sensor')
+KINDS = ('Repair', 'Replacement', 'Upgrade', 'Cleaning', 'Kit', 'Assembly', 'Install', 'Diagnostic')
+LEGACY_LIMIT: int = 10000
+QUERIES: int = 200
+
+
+def build_services(size, seed=0):
+    """
+    Builds `size` distinct synthetic service rows, e.g. 'Screen Hinge Repair 0042'.
+    """
+
+    rng = random.Random(seed)
+    return [{'service': f'{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(KINDS)} {i:06d}',
+             'price': f' {rng.uniform(5, 500):.2f}'} for i in range(size)]
+
+
+def typo(name, rng):
+    position = rng.randrange(len(name))
+    return name[:position] + name[position + 1:]
+
+
+def per_query(function, queries):
+    start = time.perf_counter()
+    for query in queries:
+        function(query)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def write_services(path, rows):
+    with open(f'{path}.tmp', 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['Service', 'Price'])
+        writer.writerows([row['service'], row['price']] for row in rows)
+    os.replace(f'{path}.tmp', path)
+
+
+def reload_latency(size):
+    """
+    Changes every price of a `size`-service catalog file and times lookups while it reloads in the
+    background, until the reload thread has finished and the reaper thread has freed the old snapshot.
+
+    With 500,000 services the longest lookup during a reload takes ~40 ms (p99 0.04 ms), down from
+    ~100 ms when the old snapshot was freed in one go; what remains are the garbage collector's passes
+    while the new snapshot is built. With 200,000 services it is ~13 ms.
+    """
+
+    rows = build_services(size)
+    names = [row['service'] for row in rows]
+    rng = random.Random(2)
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'services_list.csv')
+        write_services(path, rows)
+        start = time.perf_counter()
+        live = LiveCatalog(path, check_interval=0)
+        print(f'Loaded {size:,} services in {time.perf_counter() - start:.1f}s')
+
+        write_services(path, [dict(row, price=' 1.00') for row in rows])
+        reaped = catalog._reaped
+        latencies = []
+        start = time.perf_counter()
+        while live.reloads < 2 or live._reloading.is_alive() or catalog._reaped == reaped:
+            name = rng.choice(names)
+            lookup_start = time.perf_counter()
+            live.current().find(name)
+            latencies.append(time.perf_counter() - lookup_start)
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p50, p99, p999 = (latencies[int(q * len(latencies))] * 1000 for q in (0.5, 0.99, 0.999))
+    print(f'Background reload: {elapsed:.1f}s, {len(latencies):,} lookups meanwhile, p50 {p50:.3f} ms, '
+          f'p99 {p99:.3f} ms, p99.9 {p999:.3f} ms, max {latencies[-1] * 1000:.1f} ms')
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Time exact lookups and suggestions for synthetic catalogs.')
+    arg_parser.add_argument('sizes', nargs='*', type=int, default=[100, 10000, 500000])
+    arg_parser.add_argument('--reload', type=int, metavar='SIZE', help='time lookups during a reload of SIZE services')
+    args = arg_parser.parse_args()
+    if args.reload:
+        return reload_latency(args.reload)
+
+    print(f'{"services":>9} {"build":>10} {"find":>10} {"suggest":>12} {"legacy find":>12} {"legacy suggest":>15}')
+    for size in args.sizes:
+        rows = build_services(size)
+        names = [row['service'] for row in rows]
+        rng = random.Random(1)
+        exact = [rng.choice(names).lower() for _ in range(QUERIES)]
+        typos = [typo(rng.choice(names), rng) for _ in range(QUERIES)]
+
+        start = time.perf_counter()
+        services = ServiceCatalog(rows)
+        build = time.perf_counter() - start
+        find = per_query(services.find, exact)
+        suggest = per_query(services.suggest, typos)
+
+        legacy_find = legacy_suggest = '-'
+        if size <= LEGACY_LIMIT:
+            def scan(service):
+                for row in rows:
+                    if row['service'].title() == service.title():
+                        return row
+            legacy_find = f'{per_query(scan, exact):.1f} us'
+            legacy_suggest = f'{per_query(lambda item: difflib.get_close_matches(item, names), typos[:20]):.0f} us'
+        print(f'{size:>9} {build * 1000:>7.0f} ms {find:>7.1f} us {suggest:>9.0f} us {legacy_find:>12} '
+              f'{legacy_suggest:>15}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+""" End-to-end soak test of scripted cashier sessions: `python -m benchmarks.checkout [--cashiers 8] [--duration 60] [--tcp]` """
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from configparser import ConfigParser
+
+import metrics
+import renderers
+from benchmarks.service import percentile
+from catalog import get_catalog
+from journal import close_journals
+from pdf import Canvas, PdfWriter
+from session import PROMPTS, Session, SessionServer
+from sinks import Sink, open_sink
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESERVOIR: int = 100_000
+FIRST_NAMES = ('Ava', 'Liam', 'Noah', 'Emma', 'Maya', 'Omar', 'Priya', 'Chen', 'Sofia', 'Lucas', 'Amara', 'Jonas')
+LAST_NAMES = ('Smit', 'Tremblay', 'Nguyen', 'Patel', 'Roy', 'Martin', 'Singh', 'Okafor', 'Kowalski', 'Garcia')
+ADDRESSES = (('', 'Abc Street', 'Toronto, ON', 'A1B 2C3'), ('4B', '12 King Street West', 'Ottawa, ON', 'K1A 0B1'),
+             ('', 'Maple Avenue', 'Montreal, QC', 'H2X 1Y4'), ('1203', '400 Front Street', 'Vancouver, BC', 'V6B 1A1'))
+THANKS = 'Thank you for shopping with us!'
+UNEXPECTED = ('❌', '⚠️', '❗')
+PROMPT_ENDINGS = tuple({prompt.rsplit('}', 1)[-1].encode() for prompt in PROMPTS.values() if prompt})
+
+
+class NullSink(Sink):
+    """
+    Counts the invoices and their bytes and drops them, so a long soak does not fill the disk.
+    """
+
+    def __init__(self):
+        self.invoices = 0
+        self.bytes = 0
+
+    def write(self, name, data):
+        self.invoices += 1
+        self.bytes += len(data)
+        return name
+
+
+def stand_in_converter(delay):
+    """
+    Returns a stand-in for `renderers.convert_to_pdf()`, so the `docx` renderer fills the real template
+    without Microsoft Word: it waits `delay` seconds, as Word would, and writes a one-page PDF.
+    """
+
+    def convert(docx_path, pdf_path):
+        time.sleep(delay)
+        canvas = Canvas()
+        canvas.text(72, 72, f'Stand-in conversion of a {os.path.getsize(docx_path)}-byte invoice document')
+        writer = PdfWriter()
+        writer.add_page(canvas)
+        with open(pdf_path, 'wb') as file:
+            file.write(writer.tobytes())
+
+    return convert
+
+
+def resident_memory():
+    """
+    Returns the resident memory of this process in bytes: the current size on Linux, the peak elsewhere.
+    """
+
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return metrics.peak_memory() or 0
+
+
+def typo(rng, catalog, service):
+    """
+    Returns `service` with one letter dropped or two swapped, or None if that is another service's name.
+    """
+
+    index = rng.randrange(1, len(service) - 1)
+    if rng.random() < 0.5:
+        misspelt = service[:index] + service[index + 1:]
+    else:
+        misspelt = service[:index - 1] + service[index] + service[index - 1] + service[index + 1:]
+    return None if ' x' in misspelt or catalog.find(misspelt) is not None else misspelt
+
+
+def visit_lines(rng, catalog, customer, returning, typos, removals):
+    """
+    Returns the lines a cashier types for one customer: the customer (searched for if `returning`),
+    services in the "Service xQuantity" format with some typos first, a look at the cart, some
+    removals, then checkout and "continue" for the next customer.
+
+    Args:
+    - `rng` (random.Random): The cashier's random numbers.
+    - `catalog` (Catalog): The service catalog.
+    - `customer` (tuple): `(name, address)`, `address` an entry of `ADDRESSES`.
+    - `returning` (bool): Whether the customer checked out before, so the directory finds them.
+    - `typos` (float): The chance of a misspelt service before each service.
+    - `removals` (float): The chance of removing part of the cart before checkout.
+
+    Returns:
+    - `lines` (list): The lines, the checkout confirmation second to last.
+    """
+
+    name, address = customer
+    lines = [f'/{name.split()[0]}', '1'] if returning else [name, *address]
+    lines.append('1')
+    cart = {}
+    count = rng.choice((1, 1, 2, 2, 3, 4, 6))
+    for index in range(count):
+        service = rng.choice(catalog.names)
+        misspelt = typo(rng, catalog, service) if rng.random() < typos else None
+        if misspelt:
+            lines.append(misspelt)
+        quantity = rng.choice((1, 1, 1, 2, 3))
+        typed = service.lower() if rng.random() < 0.3 else service
+        lines.append(f'{typed} x{quantity}' if quantity > 1 else typed)
+        lines.append('Y' if index + 1 < count else 'N')
+        cart[service] = cart.get(service, 0) + quantity
+    if rng.random() < 0.3:
+        lines.append('3')
+
+    if rng.random() < removals:
+        service = rng.choice(list(cart))
+        keep = 0 if len(cart) > 1 else 1  # never empty the cart before checkout
+        if cart[service] > 1 and cart[service] - keep >= 1:
+            lines += ['5', service.lower(), str(rng.randint(1, cart[service] - keep))]
+        elif keep == 0:
+            lines += ['5', service.lower()]
+    return lines + ['4', 'Y', 'Y']
+
+
+class Stats:
+    """
+    Latencies of answers and checkouts for the current report interval, plus a bounded random sample
+    of all of them for the final percentiles, so memory stays flat over a soak of any length.
+    """
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.answers, self.checkouts, self.visits = [], [], 0
+        self.all_answers, self.all_checkouts = [], []
+        self.seen_answers = self.seen_checkouts = 0
+        self.total_visits = self.failures = self.unexpected = 0
+
+    def _sample(self, sample, seen, seconds):
+        # Reservoir sampling (algorithm R): each latency stays in the sample with the same chance
+        if len(sample) < RESERVOIR:
+            sample.append(seconds)
+        else:
+            slot = self.rng.randrange(seen)
+            if slot < RESERVOIR:
+                sample[slot] = seconds
+
+    def answer(self, seconds):
+        self.answers.append(seconds)
+        self.seen_answers += 1
+        self._sample(self.all_answers, self.seen_answers, seconds)
+
+    def checkout(self, seconds):
+        self.checkouts.append(seconds)
+        self.seen_checkouts += 1
+        self._sample(self.all_checkouts, self.seen_checkouts, seconds)
+
+    def interval(self):
+        """
+        Returns and forgets the latencies and number of visits since the last call.
+        """
+
+        answers, checkouts, visits = self.answers, self.checkouts, self.visits
+        self.answers, self.checkouts, self.visits = [], [], 0
+        return answers, checkouts, visits
+
+
+class LocalCashier:
+    """
+    Drives a session in this process, each answer on the shared worker thread like `SessionServer`.
+    """
+
+    def __init__(self, executor, business_name, sink):
+        self.executor = executor
+        self.session = Session(business_name, sink)
+
+    async def start(self):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.session.start)
+
+    async def answer(self, line):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.session.handle, line)
+
+    def close(self):
+        pass
+
+
+class TcpCashier:
+    """
+    Drives a session of a `SessionServer` over TCP, reading each reply up to the next prompt.
+    """
+
+    def __init__(self, port):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def _reply(self):
+        data = b''
+        while not data.endswith(PROMPT_ENDINGS):
+            chunk = await self.reader.read(65536)
+            if not chunk:
+                raise ConnectionError('the session server closed the session')
+            data += chunk
+        return data.decode()
+
+    async def start(self):
+        self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+        return await self._reply()
+
+    async def answer(self, line):
+        self.writer.write(f'{line}\r\n'.encode())
+        return await self._reply()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def cashier(index, client, catalog, args, stats, deadline):
+    """
+    Serves customers with scripted visits until `deadline`, recording every answer in `stats`.
+    """
+
+    rng = random.Random(args.seed * 100_003 + index)
+    served = []
+    await client.start()
+    try:
+        while time.monotonic() < deadline:
+            returning = bool(served) and rng.random() < args.returning
+            customer = rng.choice(served) if returning else (
+                f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}', rng.choice(ADDRESSES))
+            lines = visit_lines(rng, catalog, customer, returning, args.typos, args.removals)
+            for number, line in enumerate(lines):
+                if args.think:
+                    await asyncio.sleep(rng.uniform(0.5, 1.5) * args.think / 1000)
+                start = time.perf_counter()
+                reply = await client.answer(line)
+                elapsed = time.perf_counter() - start
+                if number == len(lines) - 2:
+                    stats.checkout(elapsed)
+                    if THANKS not in reply:
+                        stats.failures += 1
+                else:
+                    stats.answer(elapsed)
+                if any(mark in reply for mark in UNEXPECTED):
+                    stats.unexpected += 1
+            stats.visits += 1
+            stats.total_visits += 1
+            if not returning and len(served) < 50:
+                served.append(customer)
+    finally:
+        client.close()
+
+
+async def report(stats, args, deadline, memory):
+    """
+    Prints one line per `--interval` seconds and keeps the resident memory at each in `memory`.
+    """
+
+    print(f'{"elapsed":>8} {"visits/s":>9} {"answer p50":>11} {"p99":>9} {"checkout p50":>13} {"p95":>9} '
+          f'{"p99":>9} {"checkouts":>9} {"memory":>9}')
+    started = last = time.monotonic()
+    while last < deadline:
+        await asyncio.sleep(min(args.interval, max(0.0, deadline - last)))
+        now = time.monotonic()
+        answers, checkouts, visits = stats.interval()
+        memory.append(resident_memory())
+        answer_p = [percentile(answers, f) * 1000 if answers else 0.0 for f in (0.50, 0.99)]
+        checkout_p = [percentile(checkouts, f) * 1000 if checkouts else 0.0 for f in (0.50, 0.95, 0.99)]
+        print(f'{now - started:>7.0f}s {visits / (now - last):>9.1f} {answer_p[0]:>8.2f} ms {answer_p[1]:>6.2f} ms '
+              f'{checkout_p[0]:>10.1f} ms {checkout_p[1]:>6.1f} ms {checkout_p[2]:>6.1f} ms {stats.seen_checkouts:>9} '
+              f'{memory[-1] / 1e6:>6.1f} MB')
+        last = now
+
+
+async def soak(args, sink):
+    """
+    Runs `--cashiers` cashiers for `--duration` seconds, in this process or over TCP.
+
+    Returns:
+    - `stats` (Stats): What was measured.
+    - `memory` (list): The resident memory at each report.
+    - `elapsed` (float): Seconds the cashiers ran.
+    """
+
+    parser = ConfigParser()
+    parser.read('config.ini')
+    business_name = parser.get('business_data', 'business_name')
+    catalog = get_catalog()
+    stats = Stats(args.seed)
+    memory = []
+    server = executor = None
+    if args.tcp:
+        server = SessionServer(max_sessions=args.cashiers, sink=sink)
+        port = (await server.start('127.0.0.1', 0)).sockets[0].getsockname()[1]
+        clients = [TcpCashier(port) for _ in range(args.cashiers)]
+    else:
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='session')
+        clients = [LocalCashier(executor, business_name, sink) for _ in range(args.cashiers)]
+    start = time.monotonic()
+    deadline = start + args.duration
+    try:
+        await asyncio.gather(report(stats, args, deadline, memory),
+                             *(cashier(index, client, catalog, args, stats, deadline)
+                               for index, client in enumerate(clients)))
+    finally:
+        if server is not None:
+            await server.close()
+        if executor is not None:
+            executor.shutdown()
+    return stats, memory, time.monotonic() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Soak test scripted cashier sessions end to end.')
+    arg_parser.add_argument('--cashiers', type=int, default=8)
+    arg_parser.add_argument('--duration', type=float, default=60.0, help='seconds, e.g. 14400 for a 4-hour soak')
+    arg_parser.add_argument('--interval', type=float, default=10.0, help='seconds between report lines')
+    arg_parser.add_argument('--tcp', action='store_true', help='go through a SessionServer on localhost')
+    arg_parser.add_argument('--think', type=float, default=0.0, help='mean cashier think time per answer (ms)')
+    arg_parser.add_argument('--typos', type=float, default=0.2, help='chance of a misspelt service')
+    arg_parser.add_argument('--removals', type=float, default=0.3, help='chance of a removal before checkout')
+    arg_parser.add_argument('--returning', type=float, default=0.4, help='chance of a returning customer')
+    arg_parser.add_argument('--renderer', default='pdf', choices=('pdf', 'pdf-compact', 'docx'))
+    arg_parser.add_argument('--convert-ms', type=float, default=300.0,
+                            help='time taken by the stand-in for Word with the docx renderer')
+    arg_parser.add_argument('--output', help='keep the invoices in this directory or archive (default: drop them)')
+    arg_parser.add_argument('--metrics', action='store_true', help='also print the time spent in each stage')
+    arg_parser.add_argument('--seed', type=int, default=1)
+    args = arg_parser.parse_args()
+
+    if args.renderer == 'docx':
+        renderers.convert_to_pdf = stand_in_converter(args.convert_ms / 1000)
+    if args.metrics:
+        metrics.enable()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name in ('config.ini', 'services_list.csv', 'invoice_template.docx'):
+            shutil.copy(os.path.join(ROOT, name), work_dir)
+        os.chdir(work_dir)
+        parser = ConfigParser()
+        parser.read('config.ini')
+        parser.set('settings', 'renderer', args.renderer)
+        with open('config.ini', 'w') as file:
+            parser.write(file)
+        sink = open_sink(os.path.join(cwd, args.output)) if args.output else NullSink()
+        try:
+            stats, memory, elapsed = asyncio.run(soak(args, sink))
+        finally:
+            sink.close()
+            close_journals()
+            os.chdir(cwd)
+
+    print(f'\n{stats.total_visits} visits by {args.cashiers} cashiers in {elapsed:.0f}s: '
+          f'{stats.total_visits / elapsed:.1f} checkouts/s, {stats.failures} failed, '
+          f'{stats.unexpected} unexpected replies')
+    if stats.all_checkouts:
+        print('answers:   ' + '  '.join(f'p{f * 100:g} {percentile(stats.all_answers, f) * 1000:.2f} ms'
+                                        for f in (0.50, 0.95, 0.99, 0.999)))
+        print('checkouts: ' + '  '.join(f'p{f * 100:g} {percentile(stats.all_checkouts, f) * 1000:.1f} ms'
+                                        for f in (0.50, 0.95, 0.99, 0.999)))
+    if isinstance(sink, NullSink) and sink.invoices:
+        print(f'invoices: {sink.bytes / sink.invoices:,.0f} B on average')
+    if len(memory) > 1:
+        growth = memory[-1] - memory[0]
+        print(f'memory: {memory[0] / 1e6:.1f} MB after the first interval, {memory[-1] / 1e6:.1f} MB at the end '
+              f'({growth / 1e6:+.1f} MB, {growth / max(1, stats.total_visits) / 1e3:+.2f} kB per checkout)')
+    if args.metrics:
+        for stage, values in metrics.snapshot()['stages'].items():
+            print(f'{stage:<16} {values["count"]:>9} x {values["mean"] * 1000:>8.3f} ms  '
+                  f'max {values["max"] * 1000:.1f} ms')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+""" Average bytes per invoice by renderer and storage: `python -m benchmarks.compact [--invoices 200]` """
+import argparse
+import datetime as dt
+import os
+import tempfile
+from configparser import ConfigParser
+
+from benchmarks.lines import ADDRESS
+from project import build_invoice
+from renderers import get_renderer
+from sinks import open_sink
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STORAGES = (('pdf', 'invoices'), ('pdf', 'invoices.zip'), ('pdf-compact', 'invoices'),
+            ('pdf', 'invoices.pdfpack'), ('pdf-compact', 'invoices.pdfpack'))
+
+
+def render_all(renderer, invoices, target):
+    """
+    Renders `invoices` with `renderer` into the sink for `target`.
+
+    Returns:
+    - `size` (int): The bytes on disk: the archive, or the sum of the files of a directory.
+    """
+
+    with open_sink(target) as sink:
+        for invoice in invoices:
+            sink.write(f"{invoice['invoice_number']}.pdf", renderer.render_bytes(invoice))
+    if os.path.isdir(target):
+        return sum(os.path.getsize(os.path.join(target, name)) for name in os.listdir(target))
+    return os.path.getsize(target)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Compare the space invoices take by renderer and storage.')
+    arg_parser.add_argument('--invoices', type=int, default=200)
+    args = arg_parser.parse_args()
+
+    parser = ConfigParser()
+    parser.read(os.path.join(ROOT, 'config.ini'))
+    business = dict(parser['business_data'])
+    start = dt.datetime(2025, 1, 1, 9)
+    invoices = []
+    for number in range(1, args.invoices + 1):
+        # Mostly short carts, with an occasional long one running over several pages
+        lines = number % 12 + 1 if number % 25 else 60
+        cart = [[f'Service {line}', ' 20.52', line % 3 + 1] for line in range(lines)]
+        date_time = (start + dt.timedelta(minutes=7 * number)).strftime('%m-%d-%Y %I:%M %p')
+        invoices.append(build_invoice(f'{number:06d}', date_time, business, f'Customer {number % 37}', ADDRESS, cart))
+
+    print(f'{"renderer":<12} {"storage":<10} {"total":>10} {"per invoice":>12} {"vs pdf files":>13}')
+    baseline = None
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name, target in STORAGES:
+            renderer = get_renderer(name)
+            renderer.template_path = os.path.join(ROOT, renderer.template_path)
+            size = render_all(renderer, invoices, os.path.join(work_dir, f'{name}-{target}'))
+            baseline = baseline or size
+            storage = os.path.splitext(target)[1] or 'files'
+            print(f'{name:<12} {storage:<10} {size / 1e3:>7.0f} kB {size / len(invoices):>10,.0f} B '
+                  f'{size / baseline - 1:>+12.0%}')
+
+
+if __name__ == "__main__":
+    main()
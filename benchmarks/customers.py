@@ -0,0 +1,66 @@
+""" Customer search latency at scale: `python -m benchmarks.customers [--customers 1000000]` """
+import argparse
+import os
+import random
+import statistics
+import string
+import tempfile
+import time
+
+from customers import CustomerDirectory
+
+FIRST_NAMES = ('Smit', 'Keshav', 'Aarav', 'Olivia', 'Liam', 'Emma', 'Noah', 'Ava', 'Mia', 'Lucas', 'Zoe', 'Ethan')
+LAST_NAMES = ('Patel', 'Smith', 'Tremblay', 'Roy', 'Gagnon', 'Lee', 'Wilson', 'Martin', 'Brown', 'Singh', 'Chen')
+
+
+def random_customer(rng):
+    name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}{"".join(rng.choices(string.ascii_lowercase, k=3))}'
+    postal = (f'{rng.choice("ABCEGHJKLMNPRSTVXY")}{rng.randint(0, 9)}{rng.choice(string.ascii_uppercase)} '
+              f'{rng.randint(0, 9)}{rng.choice(string.ascii_uppercase)}{rng.randint(0, 9)}')
+    return name, {'cx_street': f'{rng.randint(1, 9999)} Main Street', 'cx_city': 'Toronto', 'cx_province': 'ON',
+                  'cx_postal': postal}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Time customer prefix searches in a large directory.')
+    arg_parser.add_argument('--customers', type=int, default=1_000_000)
+    arg_parser.add_argument('--searches', type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as work_dir:
+        directory = CustomerDirectory(os.path.join(work_dir, 'customers.db'))
+        start = time.perf_counter()
+        with directory.connection:
+            for _ in range(args.customers):
+                directory._remember(*random_customer(rng), '02-24-2025 07:09 PM')
+        print(f'Built {len(directory):,} customers in {time.perf_counter() - start:.1f}s '
+              f'({os.path.getsize(directory.path) / 1e6:.0f} MB)')
+
+        start = time.perf_counter()
+        directory.remember(*random_customer(rng), '02-24-2025 07:09 PM')
+        print(f'remember() at checkout: {(time.perf_counter() - start) * 1000:.2f} ms')
+
+        print(f'{"prefix":<20} {"matches":>8} {"p50":>9} {"p99":>9}')
+        for label, make_prefix in (
+                ('name, 1 char', lambda: rng.choice(FIRST_NAMES)[:1]),
+                ('name, 3 chars', lambda: rng.choice(FIRST_NAMES)[:3]),
+                ('surname, 4 chars', lambda: rng.choice(LAST_NAMES)[:4]),
+                ('postal, 3 chars', lambda: random_customer(rng)[1]['cx_postal'][:3]),
+                ('postal, full', lambda: random_customer(rng)[1]['cx_postal']),
+                ('no match', lambda: 'qqq')):
+            latencies = []
+            matches = 0
+            for _ in range(args.searches):
+                prefix = make_prefix()
+                start = time.perf_counter()
+                matches += len(directory.search(prefix))
+                latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            print(f'{label:<20} {matches / args.searches:>8.1f} {statistics.median(latencies) * 1000:>6.3f} ms '
+                  f'{latencies[int(0.99 * len(latencies))] * 1000:>6.3f} ms')
+        directory.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+""" Placeholder fill time for synthetic carts: `python -m benchmarks.fill [sizes...]` """
+import argparse
+import time
+
+from template import ITEM_TABLE_INDEX, fill_placeholders, get_template
+
+LEGACY_LIMIT: int = 100
+
+
+def build_document(lines):
+    """
+    Builds an unfilled invoice with `lines` item rows, using the legacy `[ItemN]` placeholders so both
+    fill strategies do the same amount of substitution.
+
+    Args:
+    - `lines` (int): Number of line items.
+
+    Returns:
+    - `document` (docx.Document): The document.
+    - `paragraphs` (list): Its placeholder paragraphs plus the item row paragraphs.
+    - `replacements` (dict): All placeholders with their values.
+    """
+
+    template = get_template('invoice_template.docx')
+    document = template.new_document()
+    paragraphs = template.placeholder_paragraphs(document)
+    replacements = {placeholder: 'value' for placeholder in template.placeholders}
+    table = document.tables[ITEM_TABLE_INDEX]
+    header = table.rows[0]._tr
+    for i in range(lines, 0, -1):
+        row = template.new_item_row(table)
+        for cell, name in zip(row.cells, ('Item', 'Quantity', 'Amount', 'Full Price')):
+            cell.text = f'[{name}{i}]'
+            replacements[f'[{name}{i}]'] = f'{name} {i}'
+            paragraphs.extend(p._p for p in cell.paragraphs)
+        header.addnext(row._tr)
+    return document, paragraphs, replacements
+
+
+def legacy_fill(document, replacements):
+    """
+    The fill loop `generate_invoice()` used before the single-pass engine.
+    """
+
+    def replace_text(paragraph, old_text, new_text):
+        if old_text in paragraph.text:
+            paragraph.text = paragraph.text.replace(str(old_text), str(new_text))
+
+    for paragraph in list(document.paragraphs):
+        for old_text, new_text in replacements.items():
+            replace_text(paragraph, old_text, new_text)
+    for _table in document.tables:
+        for row in _table.rows:
+            for cell in row.cells:
+                for paragraph in cell.paragraphs:
+                    for old_text, new_text in replacements.items():
+                        replace_text(paragraph, old_text, new_text)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Time placeholder substitution for synthetic carts.')
+    arg_parser.add_argument('sizes', nargs='*', type=int, default=[10, 1000, 10000])
+    args = arg_parser.parse_args()
+
+    print(f'{"lines":>8} {"single-pass":>14} {"legacy":>14}')
+    for lines in args.sizes:
+        _, paragraphs, replacements = build_document(lines)
+        start = time.perf_counter()
+        fill_placeholders(paragraphs, replacements)
+        single_pass = time.perf_counter() - start
+
+        legacy = '-'
+        if lines <= LEGACY_LIMIT:
+            document, _, replacements = build_document(lines)
+            start = time.perf_counter()
+            legacy_fill(document, replacements)
+            legacy = f'{(time.perf_counter() - start) * 1000:.1f} ms'
+        print(f'{lines:>8} {single_pass * 1000:>11.1f} ms {legacy:>14}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+""" Durable checkout commits per second, grouped and one by one: `python -m benchmarks.journal [--threads 1 8 64]` """
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from benchmarks.lines import ADDRESS
+from journal import COMMIT_INTERVAL, CheckoutJournal, sale_record
+
+CART = [['Virus Removal', ' 20.52', 2], ['RAM Upgrade', ' 89.99', 1]]
+
+
+def run(threads, sales, commit_interval, group_size):
+    """
+    Commits `sales` sales from `threads` threads at once, each sale waiting until it is durable, in a
+    fresh journal, ledger and directory.
+
+    Returns:
+    - `rate` (float): Commits per second.
+    - `latencies` (list): Seconds from `commit()` to durable, sorted.
+    - `groups` (int): The number of group commits.
+    """
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        journal = CheckoutJournal(os.path.join(work_dir, 'journal'), commit_interval, group_size,
+                                  os.path.join(work_dir, 'sales_data.csv'), os.path.join(work_dir, 'sales_data.db'),
+                                  os.path.join(work_dir, 'customers.db'))
+        latencies = []
+        numbers = iter(range(1, sales + 1))
+        lock = threading.Lock()
+
+        def cashier():
+            while True:
+                with lock:
+                    number = next(numbers, None)
+                if number is None:
+                    return
+                record = sale_record(f'{number:06d}', '02-24-2025 07:09 PM', f'Customer {number % 500}', ADDRESS,
+                                     CART, '$ 146.09')
+                start = time.perf_counter()
+                journal.commit(record)
+                latencies.append(time.perf_counter() - start)
+
+        workers = [threading.Thread(target=cashier) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        groups = journal.groups
+        journal.close()
+    latencies.sort()
+    return sales / elapsed, latencies, groups
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Time durable checkout commits with and without grouping.')
+    arg_parser.add_argument('--threads', nargs='*', type=int, default=[1, 8, 64])
+    arg_parser.add_argument('--sales', type=int, default=5000)
+    arg_parser.add_argument('--interval', type=float, default=COMMIT_INTERVAL, help='grouped commit interval (s)')
+    args = arg_parser.parse_args()
+
+    print(f'{"threads":>7} {"mode":<9} {"commits/s":>10} {"sales/group":>12} {"p50":>9} {"p99":>9}')
+    for threads in args.threads:
+        for mode, commit_interval, group_size in (('one each', 0.0, 1), ('grouped', args.interval, 256)):
+            rate, latencies, groups = run(threads, args.sales, commit_interval, group_size)
+            print(f'{threads:>7} {mode:<9} {rate:>10,.0f} {args.sales / groups:>12.1f} '
+                  f'{statistics.median(latencies) * 1000:>6.2f} ms {latencies[int(0.99 * len(latencies))] * 1000:>6.2f} ms')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+""" Render time for invoices with very long item tables: `python -m benchmarks.lines [sizes...]` """
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from cart import Cart
+from project import build_invoice
+from renderers import ITEM_TABLE_INDEX, get_renderer, invoice_replacements
+from template import fill_placeholders, get_template
+
+LEGACY_LIMIT: int = 200
+ADDRESS = {'cx_street': 'Abc Street', 'cx_city': 'Toronto', 'cx_province': 'ON', 'cx_postal': 'A1B 2C3'}
+
+
+def build_large_invoice(lines):
+    """
+    Builds the invoice data for a cart of `lines` distinct services.
+    """
+
+    cart = Cart()
+    for i in range(lines):
+        cart.add(f'Fleet Part {i:06d}', f' {5 + i % 500}.{i % 100:02d}', 1 + i % 4)
+    business = {key: key for key in ('business_name', 'business_street_address', 'business_city_province',
+                                     'business_email_address', 'business_contact', 'business_payment_recipient',
+                                     'business_payment_bank', 'business_payment_iban', 'business_payment_bic')}
+    return build_invoice('000001', '02-24-2025 07:09 PM', business, 'Fleet Customer', ADDRESS, cart)
+
+
+def legacy_build(invoice, temp_dir):
+    """
+    The row loop `generate_invoice()` used before the one-pass table: rows inserted in reverse next to
+    the header row, and the document saved after every row.
+    """
+
+    template = get_template('invoice_template.docx')
+    doc = template.new_document()
+    paragraphs = template.placeholder_paragraphs(doc)
+    table = doc.tables[ITEM_TABLE_INDEX]
+    for line in reversed(invoice['lines']):
+        row = template.new_item_row(table)
+        for cell, value in zip(row.cells, line):
+            cell.text = value
+        table.rows[0]._tr.addnext(row._tr)
+        doc.save(os.path.join(temp_dir, '_system_filled.docx'))
+    fill_placeholders(paragraphs, invoice_replacements(invoice))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Time rendering of invoices with long item tables.')
+    arg_parser.add_argument('sizes', nargs='*', type=int, default=[100, 5000, 20000])
+    args = arg_parser.parse_args()
+
+    pdf_renderer = get_renderer('pdf')
+    docx_renderer = get_renderer('docx')
+    print(f'{"lines":>7} {"pages":>6} {"pdf":>10} {"docx build+save":>16} {"legacy docx":>12}')
+    for lines in args.sizes:
+        invoice = build_large_invoice(lines)
+
+        start = time.perf_counter()
+        pdf = pdf_renderer.render_bytes(invoice)
+        pdf_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        docx_renderer.build_document(invoice).save(io.BytesIO())
+        docx_time = time.perf_counter() - start
+
+        legacy = '-'
+        if lines <= LEGACY_LIMIT:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                start = time.perf_counter()
+                legacy_build(invoice, temp_dir)
+                legacy = f'{time.perf_counter() - start:.2f} s'
+        print(f'{lines:>7} {pdf.count(b"/Type /Page "):>6} {pdf_time:>8.2f} s {docx_time:>14.2f} s {legacy:>12}')
+
+
+if __name__ == "__main__":
+    main()
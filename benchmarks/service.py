@@ -0,0 +1,126 @@
+""" Load test of the invoice service: `python -m benchmarks.service [--concurrency 1 8 32] [--requests N]` """
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ORDER = {'cx_name': 'Load Test', 'cx_street': 'Abc Street', 'cx_city': 'Toronto', 'cx_province': 'ON',
+         'cx_postal': 'A1B 2C3', 'cart': ['Virus Removal x2', 'RAM Upgrade', 'Screen Repair']}
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Client:
+    """
+    A minimal keep-alive HTTP/1.1 client, one connection per simulated terminal.
+    """
+
+    def __init__(self, port):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def post(self, path, payload):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+        body = json.dumps(payload).encode()
+        self.writer.write(f'POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+                          f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while (line := await self.reader.readline()) != b'\r\n':
+            name, _, value = line.decode().partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        await self.reader.readexactly(length)
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def run_level(port, path, payload, concurrency, requests):
+    """
+    Sends `requests` requests from `concurrency` connections and returns the latencies (seconds) and
+    the elapsed time.
+    """
+
+    latencies = []
+    remaining = [requests]
+
+    async def terminal():
+        client = Client(port)
+        try:
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                start = time.perf_counter()
+                status = await client.post(path, payload)
+                if status != 200:
+                    raise RuntimeError(f'{path} answered {status}')
+                latencies.append(time.perf_counter() - start)
+        finally:
+            client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(terminal() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def wait_ready(port, process, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('the service exited during start-up')
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError('the service did not start')
+
+
+async def load_test(port, process, levels, requests):
+    await wait_ready(port, process)
+    print(f'{"endpoint":>9} {"conns":>6} {"p50":>9} {"p99":>9} {"req/sec":>9}')
+    for path, payload in (('/price', {'cart': ORDER['cart']}), ('/invoice', ORDER)):
+        await run_level(port, path, payload, 4, 20)
+        for concurrency in levels:
+            latencies, elapsed = await run_level(port, path, payload, concurrency, requests)
+            print(f'{path:>9} {concurrency:>6} {percentile(latencies, 0.50) * 1000:>6.1f} ms '
+                  f'{percentile(latencies, 0.99) * 1000:>6.1f} ms {len(latencies) / elapsed:>9.0f}')
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Load test the invoice service on localhost.')
+    arg_parser.add_argument('--concurrency', nargs='*', type=int, default=[1, 8, 32, 128])
+    arg_parser.add_argument('--requests', type=int, default=1000, help='requests per concurrency level')
+    arg_parser.add_argument('--port', type=int, default=8765)
+    arg_parser.add_argument('--workers', type=int, default=None)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name in ('config.ini', 'services_list.csv', 'invoice_template.docx'):
+            shutil.copy(os.path.join(ROOT, name), work_dir)
+        command = [sys.executable, os.path.join(ROOT, 'service.py'), '--port', str(args.port), '--output', 'out.zip']
+        if args.workers:
+            command += ['--workers', str(args.workers)]
+        process = subprocess.Popen(command, cwd=work_dir, stdout=subprocess.DEVNULL)
+        try:
+            asyncio.run(load_test(args.port, process, args.concurrency, args.requests))
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
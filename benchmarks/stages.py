@@ -0,0 +1,193 @@
+""" Per-stage timings of the invoice pipeline: `python -m benchmarks.stages [--sizes 1 100 1000 10000] [--compare BASELINE]` """
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from configparser import ConfigParser
+
+from allocator import InvoiceNumberAllocator
+from benchmarks.lines import ADDRESS
+from cart import Cart
+from project import build_invoice, post_data
+from renderers import ITEM_TABLE_INDEX, TEMPLATE_PATH, add_item_rows, get_renderer, invoice_replacements
+from template import CompiledTemplate, fill_placeholders
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ('config_parse', 'template_load', 'invoice_data', 'row_insertion', 'placeholder_fill', 'docx_save',
+          'pdf_convert', 'pdf_render', 'post_data', 'config_rewrite')
+THRESHOLD: float = 0.20
+NOISE_FLOOR: float = 0.0005
+
+
+def time_stages(lines):
+    """
+    Runs the invoice pipeline once for a cart of `lines` services and times each stage, in the current
+    directory (which must hold `config.ini` and the template).
+
+    Args:
+    - `lines` (int): Number of line items.
+
+    Returns:
+    - `timings` (dict): Seconds per stage; `pdf_convert` is None where `docx2pdf` cannot run.
+    """
+
+    timings = {}
+    cart = Cart()
+    for i in range(lines):
+        cart.add(f'Fleet Part {i:06d}', f' {5 + i % 500}.{i % 100:02d}', 1 + i % 4)
+
+    start = time.perf_counter()
+    parser = ConfigParser()
+    parser.read('./config.ini')
+    business = dict(parser['business_data'])
+    timings['config_parse'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    template = CompiledTemplate(TEMPLATE_PATH)
+    doc = template.new_document()
+    paragraphs = template.placeholder_paragraphs(doc)
+    timings['template_load'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    invoice = build_invoice('000001', '02-24-2025 07:09 PM', business, 'Fleet Customer', ADDRESS, cart)
+    timings['invoice_data'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    add_item_rows(template, doc.tables[ITEM_TABLE_INDEX], invoice)
+    timings['row_insertion'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fill_placeholders(paragraphs, invoice_replacements(invoice))
+    timings['placeholder_fill'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    doc.save('invoice.docx')
+    timings['docx_save'] = time.perf_counter() - start
+
+    timings['pdf_convert'] = None
+    try:
+        from docx2pdf import convert
+        start = time.perf_counter()
+        convert('invoice.docx', 'invoice.pdf')
+        timings['pdf_convert'] = time.perf_counter() - start
+    except Exception:
+        pass
+
+    start = time.perf_counter()
+    get_renderer('pdf').render_bytes(invoice)
+    timings['pdf_render'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    post_data('000001', invoice['date_time'], 'Fleet Customer', ADDRESS, cart, invoice['balance_due'])
+    timings['post_data'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    InvoiceNumberAllocator().next()
+    timings['config_rewrite'] = time.perf_counter() - start
+    return timings
+
+
+def run_suite(sizes, repeat):
+    """
+    Times every stage `repeat` times per cart size in a scratch directory and keeps the median.
+
+    Returns:
+    - `results` (dict): `{"meta": {...}, "results": {size: {stage: seconds}}}`, ready for JSON.
+    """
+
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='stages-') as work_dir:
+        for name in ('config.ini', TEMPLATE_PATH):
+            shutil.copy(os.path.join(ROOT, name), work_dir)
+        os.chdir(work_dir)
+        try:
+            for lines in sizes:
+                runs = [time_stages(lines) for _ in range(repeat)]
+                results[str(lines)] = {
+                    stage: statistics.median(run[stage] for run in runs) if runs[0][stage] is not None else None
+                    for stage in STAGES
+                }
+        finally:
+            os.chdir(cwd)
+    return {
+        'meta': {'created': dt.datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                 'platform': platform.platform(), 'repeat': repeat},
+        'results': results
+    }
+
+
+def compare(baseline, current, threshold=THRESHOLD, noise_floor=NOISE_FLOOR):
+    """
+    Lists the stages slower than in `baseline` by more than `threshold` (a fraction) and more than
+    `noise_floor` seconds. Sizes or stages missing from either run are ignored.
+
+    Returns:
+    - `regressions` (list): `(size, stage, baseline_seconds, current_seconds)` tuples.
+    """
+
+    regressions = []
+    for size, stages in current['results'].items():
+        for stage, seconds in stages.items():
+            before = baseline['results'].get(size, {}).get(stage)
+            if seconds is None or before is None:
+                continue
+            if seconds > before * (1 + threshold) and seconds - before > noise_floor:
+                regressions.append((size, stage, before, seconds))
+    return regressions
+
+
+def print_results(suite, baseline=None):
+    sizes = list(suite['results'])
+    width = 14 if baseline is None else 20
+    print(f'{"stage":<17}' + ''.join(f'{size + " lines":>{width}}' for size in sizes))
+    for stage in STAGES:
+        cells = []
+        for size in sizes:
+            seconds = suite['results'][size][stage]
+            before = (baseline or {}).get('results', {}).get(size, {}).get(stage)
+            cell = '-' if seconds is None else f'{seconds * 1000:.2f} ms'
+            if seconds is not None and before:
+                cell += f' {(seconds / before - 1) * 100:+.0f}%'
+            cells.append(f'{cell:>{width}}')
+        print(f'{stage:<17}' + ''.join(cells))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Time each stage of the invoice pipeline.')
+    arg_parser.add_argument('--sizes', nargs='*', type=int, default=[1, 100, 1000, 10000])
+    arg_parser.add_argument('--repeat', type=int, default=5, help='runs per size; the median is kept')
+    arg_parser.add_argument('--output', default='stages.json', help='where to save the results (default: stages.json)')
+    arg_parser.add_argument('--compare', metavar='BASELINE', help='results of an earlier run to check for regressions')
+    arg_parser.add_argument('--threshold', type=float, default=THRESHOLD * 100,
+                            help='slowdown in percent reported as a regression')
+    args = arg_parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+
+    suite = run_suite(args.sizes, args.repeat)
+    with open(args.output, 'w') as file:
+        json.dump(suite, file, indent=2)
+    print_results(suite, baseline)
+    print(f'\nSaved to {args.output}')
+
+    if baseline is not None:
+        regressions = compare(baseline, suite, args.threshold / 100)
+        for size, stage, before, seconds in regressions:
+            print(f'❌ {stage} at {size} lines: {before * 1000:.2f} ms -> {seconds * 1000:.2f} ms')
+        if regressions:
+            sys.exit(1)
+        print(f'✅ No stage slower than the baseline by more than {args.threshold:.0f}%')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+""" Cold start vs warm daemon latency for one invoice: `python -m benchmarks.startup [--runs N]` """
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from client import DaemonClient
+
+ORDER = {'cx_name': 'Startup Test', 'cx_street': 'Abc Street', 'cx_city': 'Toronto', 'cx_province': 'ON',
+         'cx_postal': 'A1B 2C3', 'cart': ['Virus Removal x2', 'RAM Upgrade', 'Screen Repair']}
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(command, work_dir):
+    """
+    Runs `command` in `work_dir` and returns its wall-clock time in seconds.
+    """
+
+    start = time.perf_counter()
+    subprocess.run(command, cwd=work_dir, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def wait_ready(socket_path, process, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('the daemon exited during start-up')
+        try:
+            with DaemonClient(socket_path) as client:
+                client.ping()
+                return
+        except ConnectionError:
+            time.sleep(0.05)
+    raise RuntimeError('the daemon did not start')
+
+
+def report(label, seconds):
+    print(f'{label:<34} {statistics.median(seconds) * 1000:>8.1f} ms {min(seconds) * 1000:>8.1f} ms')
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Compare cold-start and warm-daemon invoice latency.')
+    arg_parser.add_argument('--runs', type=int, default=10)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name in ('config.ini', 'services_list.csv', 'invoice_template.docx'):
+            shutil.copy(os.path.join(ROOT, name), work_dir)
+        order_path = os.path.join(work_dir, 'order.jsonl')
+        with open(order_path, 'w') as file:
+            file.write(json.dumps(ORDER) + '\n')
+        socket_path = os.path.join(work_dir, 'daemon.sock')
+
+        run([sys.executable, '-c', 'pass'], work_dir)
+        interpreter = [run([sys.executable, '-c', 'pass'], work_dir) for _ in range(args.runs)]
+        cold = [run([sys.executable, os.path.join(ROOT, 'batch.py'), order_path], work_dir) for _ in range(args.runs)]
+
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'daemon.py'), '--socket', socket_path],
+                                   cwd=work_dir, stdout=subprocess.DEVNULL)
+        try:
+            wait_ready(socket_path, process)
+            daemon_start = time.perf_counter() - start
+            client_command = [sys.executable, os.path.join(ROOT, 'client.py'), order_path, '--socket', socket_path]
+            warm_cli = [run(client_command, work_dir) for _ in range(args.runs)]
+            warm_request = []
+            with DaemonClient(socket_path) as client:
+                for _ in range(args.runs):
+                    start = time.perf_counter()
+                    client.invoice(ORDER)
+                    warm_request.append(time.perf_counter() - start)
+        finally:
+            process.terminate()
+            process.wait()
+
+    print(f'{"one invoice, end to end":<34} {"median":>11} {"best":>11}')
+    report('python start-up only', interpreter)
+    report('cold: python batch.py', cold)
+    report('warm: python client.py', warm_cli)
+    report('warm: request on open connection', warm_request)
+    print(f'\nDaemon start-up (paid once): {daemon_start:.2f}s; '
+          f'cold/warm CLI speed-up: {statistics.median(cold) / statistics.median(warm_cli):.1f}x')
+
+
+if __name__ == "__main__":
+    main()
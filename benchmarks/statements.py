@@ -0,0 +1,65 @@
+""" Statement size, time and peak memory by number of invoices: `python -m benchmarks.statements [--sizes 100 1000 5000]` """
+import argparse
+import datetime as dt
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from configparser import ConfigParser
+
+from benchmarks.lines import ADDRESS
+from ledger import Ledger
+from project import build_invoice
+from renderers import get_renderer
+from statements import write_statement
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+START = dt.date(2025, 1, 1)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Time customer statements and measure their peak memory.')
+    arg_parser.add_argument('--sizes', nargs='*', type=int, default=[100, 1000, 5000])
+    args = arg_parser.parse_args()
+
+    parser = ConfigParser()
+    parser.read(os.path.join(ROOT, 'config.ini'))
+    business = dict(parser['business_data'])
+    renderer = get_renderer('pdf')
+    renderer.template_path = os.path.join(ROOT, renderer.template_path)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        shutil.copy(os.path.join(ROOT, 'config.ini'), work_dir)
+        os.chdir(work_dir)
+        os.makedirs('invoices')
+        ledger = Ledger()
+        invoice_bytes = 0
+        print(f'{"invoices":>8} {"pages":>7} {"invoice PDFs":>13} {"statement":>11} {"time":>8} {"peak memory":>12}')
+        try:
+            for size in sorted(args.sizes):
+                for number in range(ledger.connection.execute('SELECT COUNT(*) FROM invoices').fetchone()[0] + 1, size + 1):
+                    invoice_number = f'{number:06d}'
+                    date_time = (dt.datetime.combine(START, dt.time(9)) + dt.timedelta(minutes=number)).strftime(
+                        '%m-%d-%Y %I:%M %p')
+                    cart = [[f'Service {line}', ' 20.52', line % 3 + 1] for line in range(number % 40 + 1)]
+                    invoice = build_invoice(invoice_number, date_time, business, 'Fleet Customer', ADDRESS, cart)
+                    ledger.record(invoice_number, date_time, 'Fleet Customer', ADDRESS, cart, invoice['balance_due'])
+                    renderer.render(invoice, os.path.join('invoices', f'{invoice_number}.pdf'))
+                    invoice_bytes += os.path.getsize(os.path.join('invoices', f'{invoice_number}.pdf'))
+
+                tracemalloc.start()
+                start = time.perf_counter()
+                report = write_statement('Fleet Customer', START, START + dt.timedelta(days=365), 'statement.pdf')
+                elapsed = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print(f"{report['invoices']:>8} {report['pages']:>7} {invoice_bytes / 1e6:>10.1f} MB "
+                      f"{report['bytes'] / 1e6:>8.1f} MB {elapsed:>7.1f}s {peak / 1e6:>9.1f} MB")
+        finally:
+            ledger.close()
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+""" The shopping cart: line items keyed by service with running totals in integer cents. """
+import metrics
+from catalog import normalize
+from ledger import format_cents, to_cents
+
+TAX_RATE: float = 15.00
+
+
+class LineItem:
+    """
+    One service in the cart. Indexes like the `[service, price, quantity]` lists the cart used to hold,
+    so code reading `item[0]`, `item[1]` and `item[2]` keeps working.
+    """
+
+    __slots__ = ('service', 'price', 'unit_cents', 'quantity')
+
+    def __init__(self, service, price, quantity):
+        """
+        Args:
+        - `service` (str): The service name.
+        - `price` (str): The unit price as listed in `services_list.csv`, e.g. ' 20.52'.
+        - `quantity` (int): The quantity.
+        """
+
+        self.service = service
+        self.price = price
+        self.unit_cents = to_cents(price)
+        self.quantity = int(quantity)
+
+    @property
+    def amount_cents(self):
+        return self.unit_cents * self.quantity
+
+    def __getitem__(self, index):
+        return (self.service, self.price, self.quantity)[index]
+
+    def __iter__(self):
+        return iter((self.service, self.price, self.quantity))
+
+    def __len__(self):
+        return 3
+
+    def __repr__(self):
+        return repr([self.service, self.price, self.quantity])
+
+
+class Cart:
+    """
+    Line items keyed by service name (case-insensitive), in the order they were added. The subtotal,
+    tax and total are updated on every change, so reading them never walks the items.
+    """
+
+    def __init__(self, tax_rate=TAX_RATE, catalog=None):
+        """
+        Args:
+        - `tax_rate` (float): The tax rate in percent.
+        - `catalog` (ServiceCatalog): The catalog snapshot the sale started with, so a catalog reload
+          does not change prices halfway through a sale.
+        """
+
+        self.tax_rate = tax_rate
+        self.catalog = catalog
+        self._tax_basis_points = round(tax_rate * 100)
+        self._items = {}
+        self.subtotal_cents = 0
+        self.tax_cents = 0
+        self.total_cents = 0
+
+    @classmethod
+    def from_items(cls, items, tax_rate=TAX_RATE):
+        """
+        Builds a cart from `[service, price, quantity]` items, e.g. a cart read back from the sales data.
+        """
+
+        cart = cls(tax_rate)
+        for service, price, quantity in items:
+            cart.add(service, price, quantity)
+        return cart
+
+    def get(self, service):
+        """
+        Returns the line item for `service`, or None if it is not in the cart.
+        """
+
+        return self._items.get(normalize(service))
+
+    @metrics.timed('cart_add')
+    def add(self, service, price, quantity):
+        """
+        Adds `quantity` of a service, merging with the line item already in the cart.
+
+        Returns:
+        - `item` (LineItem): The updated line item.
+        """
+
+        key = normalize(service)
+        item = self._items.get(key)
+        if item is None:
+            item = self._items[key] = LineItem(service, price, 0)
+        item.quantity += int(quantity)
+        self._update(item.unit_cents * int(quantity))
+        return item
+
+    @metrics.timed('cart_remove')
+    def remove(self, service, quantity=None):
+        """
+        Removes `quantity` of a service, or all of it if `quantity` is None or covers the whole line.
+
+        Returns:
+        - `item` (LineItem): The line item, with its remaining quantity (0 once removed from the cart).
+
+        Raises:
+        - `KeyError`: If the service is not in the cart.
+        - `ValueError`: If `quantity` is negative or more than the cart holds.
+        """
+
+        key = normalize(service)
+        item = self._items[key]
+        if quantity is None:
+            quantity = item.quantity
+        if quantity < 0 or quantity > item.quantity:
+            raise ValueError(f'Cannot remove {quantity} of {item.quantity} {item.service}')
+        item.quantity -= quantity
+        if item.quantity == 0:
+            del self._items[key]
+        self._update(-item.unit_cents * quantity)
+        return item
+
+    def __getstate__(self):
+        # The catalog snapshot stays behind when a cart is sent to a worker process
+        return dict(vars(self), catalog=None)
+
+    def clear(self):
+        self._items.clear()
+        self._update(-self.subtotal_cents)
+
+    def _update(self, delta_cents):
+        self.subtotal_cents += delta_cents
+        self.tax_cents = (self.subtotal_cents * self._tax_basis_points + 5000) // 10000
+        self.total_cents = self.subtotal_cents + self.tax_cents
+
+    @property
+    def subtotal(self):
+        return format_cents(self.subtotal_cents)
+
+    @property
+    def tax(self):
+        return format_cents(self.tax_cents)
+
+    @property
+    def total(self):
+        return format_cents(self.total_cents)
+
+    def to_list(self):
+        """
+        Returns the items as `[service, price, quantity]` lists, the format stored in `sales_data.csv`.
+        """
+
+        return [[item.service, item.price, item.quantity] for item in self._items.values()]
+
+    def __iter__(self):
+        return iter(self._items.values())
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return repr(self.to_list())
@@ -0,0 +1,322 @@
+""" Indexed service catalog with exact and fuzzy lookup by service name, reloaded when `services_list.csv` changes. """
+import csv
+import difflib
+import hashlib
+import heapq
+import io
+import os
+import queue
+import threading
+import time
+from array import array
+from collections import Counter
+
+import metrics
+
+SERVICES_PATH: str = 'services_list.csv'
+SCAN_LIMIT: int = 1000
+CANDIDATES: int = 64
+COMMON_TRIGRAM: int = 5000
+CHECK_INTERVAL: float = 1.0
+YIELD_EVERY: int = 200
+_catalogs: dict = {}
+_retired = queue.SimpleQueue()  # contents of dropped snapshots, freed by the reaper thread
+_reaper = None
+_reaped: int = 0  # snapshots freed by the reaper thread so far
+_reaper_lock = threading.Lock()
+
+
+def normalize(name):
+    """
+    Normalizes a service name for exact lookups: case-insensitive, with runs of whitespace collapsed.
+    """
+
+    return ' '.join(name.split()).casefold()
+
+
+def trigrams(name):
+    """
+    Returns the set of trigrams of a normalized name, padded so short names and word starts count.
+    """
+
+    padded = f'  {name} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def read_services(file):
+    """
+    Reads the rows of a services CSV file with a header row and `service, price` columns. Rows are
+    read as they are consumed, so a reload never holds every parsed row at once and then frees them
+    all in one go.
+    """
+
+    reader = csv.DictReader(file, fieldnames=['service', 'price'])
+    next(reader, None)
+    return reader
+
+
+class ServiceCatalog:
+    """
+    An immutable snapshot of the offered services, indexed by normalized name for exact matches and
+    by trigram for suggestions. Each service is kept as a `(service, price)` tuple. A reload builds a
+    new snapshot instead of changing this one, so code holding a snapshot (e.g. a cart) keeps the
+    prices it started with. Tuples of strings are also left alone by the cyclic garbage collector, so
+    a large snapshot does not make its full collections any longer.
+
+    Freeing a snapshot of half a million services takes ~100 ms with the GIL held, on whichever thread
+    drops the last reference to it. Once a `LiveCatalog` has replaced a snapshot, a dropped snapshot
+    hands its contents to a reaper thread instead, which frees them a slice at a time and lets other
+    threads run in between.
+
+    Suggestions are ranked like `difflib.get_close_matches()`. Small catalogs are scanned in full, so
+    they get exactly the same suggestions; larger ones only score the names sharing the most
+    trigrams with the query. Trigrams found in more than `COMMON_TRIGRAM` names (e.g. 'rep') are
+    skipped when the query has rarer ones, as they barely narrow the search.
+    """
+
+    def __init__(self, rows, yield_every=0):
+        """
+        Args:
+        - `rows` (iterable): Dictionaries with the `service` and `price` of each service.
+        - `yield_every` (int): When set, lets other threads run after every `yield_every` services, so
+          building a large catalog in the background does not hold up lookups.
+        """
+
+        self.rows = tuple((row['service'], row['price']) for row in rows)
+        self.names = tuple(service for service, _ in self.rows)
+        self._exact = {}
+        self._trigrams = {}
+        for index, name in enumerate(self.names):
+            if yield_every and index % yield_every == 0:
+                time.sleep(0)
+            key = normalize(name)
+            self._exact.setdefault(key, index)
+            for trigram in trigrams(key):
+                postings = self._trigrams.get(trigram)
+                if postings is None:
+                    postings = self._trigrams[trigram] = array('I')
+                postings.append(index)
+
+    def __del__(self):
+        # Runs on the thread that dropped the last reference; only hands the contents over
+        if _reaper is not None and _reaper.is_alive():
+            _retired.put(list(vars(self).values()))
+            vars(self).clear()
+
+    @classmethod
+    def from_csv(cls, path=SERVICES_PATH):
+        """
+        Loads the catalog from a services CSV file with a header row and `service, price` columns.
+        """
+
+        with open(path, 'r', newline='') as file:
+            return cls(read_services(file))
+
+    def __len__(self):
+        return len(self.rows)
+
+    @metrics.timed('catalog_find')
+    def find(self, service):
+        """
+        Finds a service by name, ignoring case and extra whitespace.
+
+        Returns:
+        - `row` (tuple): The `(service, price)` of the matching service, or None if it is not offered.
+        """
+
+        index = self._exact.get(normalize(service))
+        return None if index is None else self.rows[index]
+
+    @metrics.timed('catalog_suggest')
+    def suggest(self, item, n=3, cutoff=0.6):
+        """
+        Returns up to `n` service names similar to `item`, best match first.
+
+        Args:
+        - `item` (str): The name entered by the user.
+        - `n` (int): The maximum number of suggestions.
+        - `cutoff` (float): The minimum similarity score (0 to 1) of a suggestion.
+        """
+
+        if len(self.names) <= SCAN_LIMIT:
+            return difflib.get_close_matches(item, self.names, n, cutoff)
+
+        found = sorted((self._trigrams[trigram] for trigram in trigrams(normalize(item)) if trigram in self._trigrams),
+                       key=len)
+        if not found:
+            return []
+        limit = max(COMMON_TRIGRAM, len(found[0]))
+        counts = Counter()
+        for postings in found:
+            if len(postings) > limit:
+                break
+            counts.update(postings)
+
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(item)
+        result = []
+        for index, _ in counts.most_common(CANDIDATES):
+            matcher.set_seq1(self.names[index])
+            if (matcher.real_quick_ratio() >= cutoff and matcher.quick_ratio() >= cutoff
+                    and matcher.ratio() >= cutoff):
+                result.append((matcher.ratio(), self.names[index]))
+        return [name for _, name in heapq.nlargest(n, result)]
+
+
+class LiveCatalog:
+    """
+    The current `ServiceCatalog` snapshot of a services file, replaced when the file changes.
+
+    `current()` checks the file's modification time and size at most every `check_interval` seconds.
+    When they change, a background thread reads the file and, if its content hash differs, builds a
+    new snapshot and swaps it in with a single assignment. Lookups never wait for a reload: until the
+    swap they are served from the previous snapshot, which also stays valid for whoever holds it.
+    """
+
+    def __init__(self, path=SERVICES_PATH, check_interval=CHECK_INTERVAL):
+        """
+        Args:
+        - `path` (str): Path to the services CSV file.
+        - `check_interval` (float): The minimum time between two checks of the file, in seconds.
+        """
+
+        self.path = path
+        self.check_interval = check_interval
+        self.reloads = 0
+        self.snapshot = None
+        self._stat = None
+        self._digest = None
+        self._next_check = time.monotonic() + check_interval
+        self._reloading = None
+        self._lock = threading.Lock()
+        self.reload()
+
+    def current(self):
+        """
+        Returns the latest snapshot, starting a background reload if the file has changed.
+        """
+
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            if self._file_stat() != self._stat:
+                self._start_reload()
+        return self.snapshot
+
+    def reload(self, yield_every=0):
+        """
+        Reads the file and swaps in a new snapshot if its content has changed.
+
+        Args:
+        - `yield_every` (int): Passed to `ServiceCatalog`; set when reloading in the background.
+
+        Returns:
+        - `swapped` (bool): True if a new snapshot was swapped in.
+        """
+
+        start = time.perf_counter()
+        self._stat = self._file_stat()
+        with open(self.path, 'rb') as file:
+            data = file.read()
+        digest = hashlib.blake2b(data).digest()
+        if digest == self._digest:
+            return False
+        snapshot = ServiceCatalog(read_services(_decoded_lines(data, yield_every)), yield_every)
+        self._digest = digest
+        if self.snapshot is not None:
+            _start_reaper()
+        self.snapshot = snapshot  # the replaced snapshot is freed by the reaper once no cart holds it
+        self.reloads += 1
+        metrics.observe('catalog_reload', time.perf_counter() - start)
+        return True
+
+    def wait(self):
+        """
+        Waits for a background reload, if one is running.
+        """
+
+        reloading = self._reloading
+        if reloading is not None:
+            reloading.join()
+
+    def _start_reload(self):
+        with self._lock:
+            if self._reloading is not None and self._reloading.is_alive():
+                return
+            self._reloading = threading.Thread(target=self._reload_in_background, name='catalog-reload', daemon=True)
+            self._reloading.start()
+
+    def _reload_in_background(self):
+        try:
+            self.reload(YIELD_EVERY)
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            # e.g. the file is being replaced; keep the current snapshot and retry on the next change
+            metrics.count_error('catalog_reload')
+            print(f'⚠️ Could not reload {self.path}: {e}')
+
+    def _file_stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return self._stat
+        return stat.st_mtime_ns, stat.st_size
+
+
+def _decoded_lines(data, yield_every):
+    # Decodes line by line rather than copying the whole file into one string, which would hold the GIL
+    for number, line in enumerate(io.BytesIO(data)):
+        if yield_every and number % yield_every == 0:
+            time.sleep(0)
+        yield line.decode()
+
+
+def _start_reaper():
+    global _reaper
+    with _reaper_lock:
+        if _reaper is None or not _reaper.is_alive():  # threads do not survive a fork
+            _reaper = threading.Thread(target=_reap, name='catalog-reaper', daemon=True)
+            _reaper.start()
+
+
+def _reap():
+    global _reaped
+    while True:
+        contents = _retired.get()
+        while contents:
+            _free_in_slices(contents.pop())
+        _reaped += 1
+
+
+def _free_in_slices(value):
+    # The caller holds no other reference, so each slice deleted here is freed here
+    if isinstance(value, tuple):
+        value = list(value)
+    if isinstance(value, list):
+        while value:
+            del value[-YIELD_EVERY:]
+            time.sleep(0)
+    elif isinstance(value, dict):
+        while value:
+            for _ in range(min(YIELD_EVERY, len(value))):
+                value.popitem()
+            time.sleep(0)
+
+
+def get_live_catalog(path=SERVICES_PATH):
+    """
+    Returns the `LiveCatalog` of `path`, loaded once per process.
+    """
+
+    path = os.path.abspath(path)
+    if path not in _catalogs:
+        _catalogs[path] = LiveCatalog(path)
+    return _catalogs[path]
+
+
+def get_catalog(path=SERVICES_PATH):
+    """
+    Returns the current catalog snapshot of `path`. The file is loaded once per process and reloaded
+    in the background when it changes; see `LiveCatalog`.
+    """
+
+    return get_live_catalog(path).current()
@@ -0,0 +1,138 @@
+""" Thin client of the invoice daemon: sends orders over its Unix domain socket. Imports nothing beyond the standard library. """
+import json
+import socket
+import sys
+import time
+
+SOCKET_PATH: str = 'invoice_daemon.sock'
+
+
+class DaemonClient:
+    """
+    One connection to `daemon.py`, reused for every request.
+    """
+
+    def __init__(self, path=SOCKET_PATH):
+        """
+        Args:
+        - `path` (str): The daemon's Unix domain socket.
+
+        Raises:
+        - `ConnectionError`: If no daemon is listening on `path`.
+        """
+
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._socket.connect(path)
+        except OSError as e:
+            self._socket.close()
+            raise ConnectionError(f'No invoice daemon on {path} (start it with: python daemon.py)') from e
+        self._file = self._socket.makefile('rwb')
+
+    def request(self, payload):
+        """
+        Sends one request and returns the daemon's response (see `InvoiceDaemon.handle_job()`).
+        """
+
+        self._file.write(json.dumps(payload).encode() + b'\n')
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError('The invoice daemon closed the connection')
+        return json.loads(line)
+
+    def invoice(self, order):
+        return self.request({'op': 'invoice', 'order': order})
+
+    def ping(self):
+        return self.request({'op': 'ping'})
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def parse_args(argv):
+    """
+    Parses `[orders] [--socket PATH] [--ping]` by hand, since importing `argparse` costs more than a
+    warm invoice. Help and malformed command lines fall back to `argparse` for its messages.
+
+    Returns:
+    - `orders` (str): The orders file, `-` for stdin.
+    - `socket_path` (str): The daemon socket.
+    - `ping` (bool): Whether to only check that the daemon is running.
+    """
+
+    orders, socket_path, ping = None, SOCKET_PATH, False
+    args = iter(argv)
+    for arg in args:
+        if arg == '--socket':
+            socket_path = next(args, None)
+        elif arg == '--ping':
+            ping = True
+        elif orders is None and (arg == '-' or not arg.startswith('-')):
+            orders = arg
+        else:
+            return _parse_args_slowly(argv)
+        if socket_path is None:
+            return _parse_args_slowly(argv)
+    return orders or '-', socket_path, ping
+
+
+def _parse_args_slowly(argv):
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description='Create invoices through the invoice daemon.')
+    arg_parser.add_argument('orders', nargs='?', default='-', help='JSONL file of orders in the batch.py format')
+    arg_parser.add_argument('--socket', default=SOCKET_PATH, help=f'the daemon socket (default: {SOCKET_PATH})')
+    arg_parser.add_argument('--ping', action='store_true', help='only check that the daemon is running')
+    args = arg_parser.parse_args(argv)
+    return args.orders, args.socket, args.ping
+
+
+def main():
+    """
+    Command line entry point: `python client.py orders.jsonl [--socket PATH]`, or `-` to read orders from stdin.
+    """
+
+    orders, socket_path, ping = parse_args(sys.argv[1:])
+
+    try:
+        client = DaemonClient(socket_path)
+    except ConnectionError as e:
+        print(f'❌ {e}')
+        raise SystemExit(2)
+
+    failed = 0
+    with client:
+        if ping:
+            print(client.ping())
+            return
+        file = sys.stdin if orders == '-' else open(orders)
+        with file:
+            for line_no, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                start = time.perf_counter()
+                try:
+                    response = client.invoice(json.loads(line))
+                except ValueError as e:
+                    response = {'ok': False, 'error': str(e)}
+                elapsed = (time.perf_counter() - start) * 1000
+                if response['ok']:
+                    print(f"✅ Invoice {response['invoice_number']} ($ {response['total']}) "
+                          f"{response['location']} in {elapsed:.1f} ms")
+                else:
+                    failed += 1
+                    print(f"❌ Order on line {line_no}: {response['error']}")
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+""" Customer directory (SQLite) with prefix lookup by name and postal code, filled from checkouts and past sales. """
+import argparse
+import ast
+import csv
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from tabulate import tabulate
+
+CUSTOMERS_PATH: str = 'customers.db'
+SEARCH_LIMIT: int = 9
+_directories = threading.local()  # SQLite connections can only be used by the thread that opened them
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS customers (
+    id INTEGER PRIMARY KEY,
+    cx_name TEXT NOT NULL,
+    cx_address TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    visits INTEGER NOT NULL,
+    last_visit TEXT NOT NULL,
+    UNIQUE (name_key, cx_address)
+);
+CREATE TABLE IF NOT EXISTS search_keys (
+    key TEXT NOT NULL,
+    customer_id INTEGER NOT NULL,
+    PRIMARY KEY (key, customer_id)
+) WITHOUT ROWID;
+'''
+
+
+def name_key(cx_name):
+    """
+    Normalizes a customer name for lookups: lower case with single spaces.
+    """
+
+    return ' '.join(cx_name.lower().split())
+
+
+def postal_key(cx_postal):
+    """
+    Normalizes a postal code for lookups: upper case without spaces, e.g. 'a1b 2c3' -> 'A1B2C3'.
+    """
+
+    return ''.join(cx_postal.upper().split())
+
+
+def search_keys(cx_name, cx_address):
+    """
+    Returns the prefix-searchable keys of a customer: the full name, each later word of the name (so
+    'Smit Patel' is found by 'pat') and the postal code. Names are stored lower case and postal codes
+    upper case, so the two never collide.
+    """
+
+    name = name_key(cx_name)
+    keys = {name}
+    keys.update(name.split()[1:])
+    postal = postal_key(cx_address.get('cx_postal', ''))
+    if postal:
+        keys.add(postal)
+    return keys
+
+
+class CustomerDirectory:
+    """
+    Every customer seen at checkout, one row per name and address, with a visit count. Customers are
+    found by a prefix of their name, of any word of their name, or of their postal code, through a
+    single B-tree index of search keys, so a lookup reads only the first matching index entries
+    however many customers there are.
+    """
+
+    def __init__(self, path=CUSTOMERS_PATH):
+        """
+        Args:
+        - `path` (str): Path to the SQLite database, created if missing.
+        """
+
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+
+    def remember(self, cx_name, cx_address, date_time=''):
+        """
+        Adds a customer, or counts one more visit of a customer already known under the same name and address.
+
+        Args:
+        - `cx_name` (str): The customer's name.
+        - `cx_address` (dict): The customer's address details.
+        - `date_time` (str): The date and time of the visit.
+        """
+
+        with self.connection:
+            self._remember(cx_name, cx_address, date_time)
+
+    def remember_many(self, visits):
+        """
+        Remembers several visits in one transaction.
+
+        Args:
+        - `visits` (iterable): `(cx_name, cx_address, date_time)` tuples.
+        """
+
+        with self.connection:
+            for cx_name, cx_address, date_time in visits:
+                self._remember(cx_name, cx_address, date_time)
+
+    def _remember(self, cx_name, cx_address, date_time):
+        address = json.dumps(cx_address, sort_keys=True)
+        key = name_key(cx_name)
+        cursor = self.connection.execute(
+            'INSERT OR IGNORE INTO customers (cx_name, cx_address, name_key, visits, last_visit) VALUES (?, ?, ?, 1, ?)',
+            (cx_name, address, key, date_time))
+        if cursor.rowcount:
+            self.connection.executemany('INSERT OR IGNORE INTO search_keys VALUES (?, ?)',
+                                        [(search_key, cursor.lastrowid) for search_key in search_keys(cx_name, cx_address)])
+        else:
+            self.connection.execute(
+                'UPDATE customers SET visits = visits + 1, last_visit = ? WHERE name_key = ? AND cx_address = ?',
+                (date_time, key, address))
+
+    def search(self, prefix, limit=SEARCH_LIMIT):
+        """
+        Finds customers whose name, a word of their name, or postal code starts with `prefix`
+        (ignoring case and spaces in postal codes). Name matches come first, each group in
+        alphabetical order of the matching key.
+
+        Args:
+        - `prefix` (str): What the cashier typed, e.g. 'smi' or 'a1b 2'.
+        - `limit` (int): The maximum number of customers returned.
+
+        Returns:
+        - `customers` (list): Dicts with `cx_name`, `cx_address` (dict), `visits` and `last_visit`.
+        """
+
+        ordered = []
+        for key_prefix in dict.fromkeys((name_key(prefix), postal_key(prefix))):
+            if not key_prefix or len(ordered) == limit:
+                continue
+            rows = self.connection.execute(
+                'SELECT customer_id FROM search_keys WHERE key >= ? AND key < ? ORDER BY key LIMIT ?',
+                (key_prefix, _prefix_end(key_prefix), limit * 2))
+            for customer_id, in rows:
+                if customer_id not in ordered and len(ordered) < limit:
+                    ordered.append(customer_id)
+        if not ordered:
+            return []
+
+        rows = self.connection.execute(
+            f'SELECT id, cx_name, cx_address, visits, last_visit FROM customers WHERE id IN ({",".join("?" * len(ordered))})',
+            ordered)
+        customers = {customer_id: {'cx_name': cx_name, 'cx_address': json.loads(cx_address), 'visits': visits,
+                                   'last_visit': last_visit}
+                     for customer_id, cx_name, cx_address, visits, last_visit in rows}
+        return [customers[customer_id] for customer_id in ordered]
+
+    def import_sales(self, path):
+        """
+        Adds the customer of every past sale, from the sales ledger (`.db`) or a `sales_data.csv` file,
+        counting one visit per sale. Meant to be run once on an empty directory.
+
+        Returns:
+        - `count` (int): The number of sales read.
+        """
+
+        if os.path.splitext(path)[1].lower() == '.db':
+            source = sqlite3.connect(path)
+            sales = source.execute('SELECT cx_name, cx_address, date_time FROM invoices ORDER BY sold_at')
+            sales = ((cx_name, json.loads(cx_address), date_time) for cx_name, cx_address, date_time in sales)
+        else:
+            source = open(path, 'r', newline='')
+            sales = ((row['cx_name'], ast.literal_eval(row['cx_address']), row['date_time'])
+                     for row in csv.DictReader(source))
+
+        count = 0
+        try:
+            with self.connection:
+                for cx_name, cx_address, date_time in sales:
+                    self._remember(cx_name, cx_address, date_time)
+                    count += 1
+        finally:
+            source.close()
+        return count
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM customers').fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+def _prefix_end(prefix):
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def get_directory(path=CUSTOMERS_PATH):
+    """
+    Returns the customer directory at `path`, opened once per thread.
+    """
+
+    path = os.path.abspath(path)
+    if not hasattr(_directories, 'by_path'):
+        _directories.by_path = {}
+    if path not in _directories.by_path:
+        _directories.by_path[path] = CustomerDirectory(path)
+    return _directories.by_path[path]
+
+
+def format_customers(customers):
+    """
+    Returns a numbered table of customers for the console.
+    """
+
+    rows = []
+    for number, customer in enumerate(customers, start=1):
+        address = customer['cx_address']
+        street = f"{address['cx_unit']} - {address['cx_street']}" if 'cx_unit' in address else address['cx_street']
+        rows.append([number, customer['cx_name'], f"{street}, {address['cx_city']}, {address['cx_province']}",
+                     address['cx_postal'], customer['visits']])
+    return tabulate(rows, headers=['#', 'Name', 'Address', 'Postal Code', 'Visits'], tablefmt='heavy_grid',
+                    disable_numparse=True)
+
+
+def main():
+    """
+    Command line entry point:
+    - `python customers.py import [sales_data.db|sales_data.csv]`
+    - `python customers.py search smi`
+    """
+
+    arg_parser = argparse.ArgumentParser(description='Find customers, or fill the directory from past sales.')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+    import_parser = commands.add_parser('import', help='add the customers of past sales')
+    import_parser.add_argument('path', nargs='?', default='sales_data.db')
+    search_parser = commands.add_parser('search', help='find customers by name or postal code prefix')
+    search_parser.add_argument('prefix')
+    args = arg_parser.parse_args()
+
+    directory = get_directory()
+    if args.command == 'import':
+        count = directory.import_sales(args.path)
+        print(f'Imported {count} sales; {len(directory)} customers in {directory.path}')
+    else:
+        start = time.perf_counter()
+        customers = directory.search(args.prefix)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(format_customers(customers) if customers else 'No customers found.')
+        print(f'({elapsed:.2f} ms)')
+
+
+if __name__ == "__main__":
+    main()
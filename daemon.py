@@ -0,0 +1,158 @@
+""" Warm invoice daemon: keeps libraries, catalog and template loaded and creates invoices sent over a Unix domain socket. """
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import time
+from configparser import ConfigParser
+
+from batch import build_order
+from catalog import get_catalog
+from project import create_invoice
+from renderers import TEMPLATE_PATH, get_renderer
+from sinks import INVOICES_DIR, open_sink
+from template import get_template
+
+SOCKET_PATH: str = 'invoice_daemon.sock'
+
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    """
+    Answers one JSON request per line with one JSON response per line, until the client disconnects.
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                response = self.server.handle_job(json.loads(line))
+            except ValueError as e:
+                response = {'ok': False, 'error': str(e)}
+            self.wfile.write(json.dumps(response).encode() + b'\n')
+            self.wfile.flush()
+
+
+class InvoiceDaemon(socketserver.UnixStreamServer):
+    """
+    A long-lived process that loads everything `create_invoice()` needs once (python-docx and the other
+    libraries, the service catalog, the compiled template and the renderer) and then creates invoices
+    for `client.py`. Requests are handled one at a time, in arrival order, so invoice numbers and sales
+    records stay in order.
+
+    Requests are JSON objects:
+    - `{"op": "invoice", "order": {...}}`: creates an invoice for an order in the `batch.py` JSONL format.
+    - `{"op": "ping"}`: checks the daemon is up.
+    """
+
+    def __init__(self, path=SOCKET_PATH, output=INVOICES_DIR):
+        """
+        Args:
+        - `path` (str): The Unix domain socket to listen on.
+        - `output` (str): Directory or `.zip` / `.tar` archive where invoices are stored.
+
+        Raises:
+        - `RuntimeError`: If another daemon is already listening on `path`.
+        """
+
+        parser = ConfigParser()
+        parser.read('./config.ini')
+        renderer = get_renderer(parser.get('settings', 'renderer', fallback='pdf'))
+        if hasattr(renderer, 'logo'):
+            renderer.logo()
+        get_template(TEMPLATE_PATH)
+        get_catalog()  # loaded now, then reloaded in the background when services_list.csv changes
+        self.sink = open_sink(output)
+        self.started = time.time()
+        self.invoices = 0
+
+        _remove_stale_socket(path)
+        super().__init__(path, DaemonHandler)
+
+    def handle_job(self, request):
+        """
+        Runs one request and returns the response.
+
+        Returns:
+        - `response` (dict): `{"ok": true, ...}` with the invoice number, balance due and location for an
+          invoice, or `{"ok": false, "error": "..."}`.
+        """
+
+        op = request.get('op') if isinstance(request, dict) else None
+        if op == 'ping':
+            return {'ok': True, 'pid': os.getpid(), 'uptime': round(time.time() - self.started, 1),
+                    'invoices': self.invoices}
+        if op != 'invoice':
+            return {'ok': False, 'error': f'unknown op {op!r}'}
+
+        start = time.perf_counter()
+        try:
+            cx_name, cx_address, cart = build_order(request.get('order') or {}, get_catalog())
+            invoice_number = create_invoice(cx_name, cx_address, cart, self.sink)
+        except Exception as e:
+            return {'ok': False, 'error': str(e)}
+        self.invoices += 1
+        return {'ok': True, 'invoice_number': invoice_number, 'total': cart.total,
+                'location': os.path.abspath(self._location(invoice_number)),
+                'seconds': round(time.perf_counter() - start, 6)}
+
+    def _location(self, invoice_number):
+        directory = getattr(self.sink, 'directory', None)
+        if directory is None:
+            return f'{self.sink.path}:{invoice_number}.pdf'
+        return os.path.join(directory, f'{invoice_number}.pdf')
+
+    def server_close(self):
+        super().server_close()
+        self.sink.close()
+        try:
+            os.remove(self.server_address)
+        except OSError:
+            pass
+
+
+def _remove_stale_socket(path):
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.remove(path)
+    else:
+        raise RuntimeError(f'An invoice daemon is already listening on {path}')
+    finally:
+        probe.close()
+
+
+def _stop(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main():
+    """
+    Command line entry point: `python daemon.py [--socket PATH] [--output DIR|FILE.zip]`.
+    """
+
+    arg_parser = argparse.ArgumentParser(description='Keep the invoice pipeline warm and serve client.py.')
+    arg_parser.add_argument('--socket', default=SOCKET_PATH, help=f'Unix domain socket (default: {SOCKET_PATH})')
+    arg_parser.add_argument('--output', default=INVOICES_DIR,
+                            help=f'directory, .zip or .tar archive for the invoices (default: {INVOICES_DIR}/)')
+    args = arg_parser.parse_args()
+
+    start = time.perf_counter()
+    daemon = InvoiceDaemon(args.socket, args.output)
+    signal.signal(signal.SIGTERM, _stop)
+    print(f'Invoice daemon ready on {args.socket} in {time.perf_counter() - start:.2f}s', flush=True)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.server_close()
+
+
+if __name__ == "__main__":
+    main()
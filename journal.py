@@ -0,0 +1,473 @@
+""" Write-ahead checkout journal: completed sales are made durable in groups, then applied to the sales records. """
+import atexit
+import csv
+import json
+import os
+import threading
+import time
+import zlib
+
+import metrics
+from allocator import CONFIG_PATH, FileLock, _read, _write_number
+from customers import CUSTOMERS_PATH, CustomerDirectory
+from ledger import LEDGER_PATH, Ledger
+from pdf import is_complete
+from sinks import INVOICES_DIR, write_durably
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+JOURNAL_DIR: str = 'journal'
+SALES_CSV: str = 'sales_data.csv'
+SALES_FIELDS: list = ['invoice_number', 'date_time', 'cx_name', 'cx_address', 'cart', 'total']
+COMMIT_INTERVAL: float = 0.002
+GROUP_SIZE: int = 256
+SEGMENT_LIMIT: int = 4 << 20
+_journals: dict = {}
+_journals_lock = threading.Lock()
+
+
+def sale_record(invoice_number, date_time, cx_name, cx_address, cart, total, pdf=None):
+    """
+    Returns the journal record of a sale. Takes the same arguments as `post_data()`.
+    """
+
+    record = {'invoice_number': invoice_number, 'date_time': date_time, 'cx_name': cx_name,
+              'cx_address': dict(cx_address), 'cart': [list(item) for item in cart], 'total': total}
+    if pdf is not None:
+        record['pdf'] = pdf
+    return record
+
+
+def encode(record):
+    """
+    Encodes a record as one journal line: a CRC-32 of the JSON, then the JSON.
+    """
+
+    body = json.dumps(record, separators=(',', ':'), ensure_ascii=False).encode()
+    return b'%08x %s\n' % (zlib.crc32(body), body)
+
+
+def read_segment(path):
+    """
+    Reads the records of a journal segment, up to the first incomplete or damaged line (a write cut
+    short by a crash).
+
+    Returns:
+    - `records` (list): The records.
+    - `torn` (bool): Whether the segment ended with an incomplete or damaged line.
+    """
+
+    with open(path, 'rb') as file:
+        lines = file.read().split(b'\n')
+    records = []
+    for line in lines[:-1]:
+        crc, _, body = line.partition(b' ')
+        try:
+            intact = int(crc, 16) == zlib.crc32(body)
+        except ValueError:
+            intact = False
+        if not intact:
+            return records, True
+        records.append(json.loads(body))
+    return records, bool(lines[-1])
+
+
+def apply_sales(sales, sales_csv, ledger, directory):
+    """
+    Appends sales to `sales_csv`, records them in the ledger and remembers their customers, each in
+    one write.
+    """
+
+    new_file = not os.path.isfile(sales_csv)
+    with open(sales_csv, 'a', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=SALES_FIELDS, extrasaction='ignore')
+        if new_file:
+            writer.writeheader()
+        writer.writerows(sales)
+    ledger.record_many(sales)
+    directory.remember_many((sale['cx_name'], sale['cx_address'], sale['date_time']) for sale in sales)
+
+
+class CheckoutJournal:
+    """
+    This process's write-ahead journal of completed sales, committed in groups.
+
+    `commit()` appends a sale and waits until it is durable. The first checkout to wait leads the next
+    group commit: it writes every queued sale with one `write()` and one `fsync()`, then applies the
+    group to `sales_data.csv`, the ledger and the customer directory with one append and one
+    transaction each, and wakes the checkouts it committed for. Checkouts that arrive meanwhile queue
+    up for the next group, so concurrent checkouts share the cost of a commit. Before committing, the
+    leader waits for as many sales as the previous group had, but never longer than `commit_interval`
+    after the oldest queued sale: a lone cashier is not delayed, and under load groups fill up. The
+    journal starts no thread of its own; each thread that leads a commit uses its own ledger and
+    directory connections.
+
+    Each process writes its own segment in `directory` and holds an OS lock on it until it exits, so
+    `recover()` can tell the segments of crashed processes from those of running ones. A segment is
+    emptied once it grows past `SEGMENT_LIMIT` and removed by `close()`, both only when every sale in
+    it has been applied.
+    """
+
+    def __init__(self, directory=JOURNAL_DIR, commit_interval=COMMIT_INTERVAL, group_size=GROUP_SIZE,
+                 sales_csv=SALES_CSV, ledger_path=LEDGER_PATH, customers_path=CUSTOMERS_PATH):
+        """
+        Args:
+        - `directory` (str): The journal directory, created if missing.
+        - `commit_interval` (float): The longest a sale waits for others to share its commit, in seconds.
+        - `group_size` (int): The most sales committed together.
+        - `sales_csv` (str): Path to `sales_data.csv`.
+        - `ledger_path` (str): Path to the sales ledger.
+        - `customers_path` (str): Path to the customer directory.
+        """
+
+        self.directory = os.path.abspath(directory)
+        self.commit_interval = commit_interval
+        self.group_size = max(1, group_size)
+        self.sales_csv = os.path.abspath(sales_csv)
+        self.ledger_path = os.path.abspath(ledger_path)
+        self.customers_path = os.path.abspath(customers_path)
+        self.pid = os.getpid()
+        self.groups = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f'{self.pid}-{time.time_ns()}.log')
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, 'O_BINARY', 0))
+        _try_lock(self._fd)
+        self._pending = []
+        self._appended = 0
+        self._done = 0
+        self._failures = []
+        self._leading = False
+        self._expected = 1
+        self._closing = False
+        self._condition = threading.Condition()
+        self._connections = threading.local()
+
+    def append(self, record):
+        """
+        Queues a sale for the next group commit without waiting for it. The sale is committed by the
+        next `wait()` or `commit()`.
+
+        Args:
+        - `record` (dict): The sale, from `sale_record()`.
+
+        Returns:
+        - `sequence` (int): The sale's position in this journal, for `wait()`.
+        """
+
+        with self._condition:
+            if self._closing:
+                raise RuntimeError(f'The checkout journal {self.path} is closed')
+            self._pending.append((record, time.monotonic()))
+            self._appended += 1
+            self._condition.notify_all()
+            return self._appended
+
+    def wait(self, sequence=None):
+        """
+        Waits until the sale at `sequence`, or every sale appended so far, is durable and applied,
+        leading group commits while no other thread does.
+
+        Raises:
+        - The error of the group commit that failed, if the sale was part of one. The sale stays in the
+          segment and is applied by `recover()` when the process has stopped.
+        """
+
+        with self._condition:
+            sequence = self._appended if sequence is None else sequence
+            while self._done < sequence:
+                if self._leading:
+                    self._condition.wait()
+                    continue
+                self._leading = True
+                try:
+                    group = self._next_group()
+                    self._condition.release()
+                    try:
+                        error = self._commit_group(group)
+                    finally:
+                        self._condition.acquire()
+                    if error is not None:
+                        self._failures.append((self._done + 1, self._done + len(group), error))
+                    self._done += len(group)
+                    self.groups += 1
+                finally:
+                    self._leading = False
+                    self._condition.notify_all()
+            for first, last, error in self._failures:
+                if first <= sequence <= last:
+                    raise error
+
+    def commit(self, record):
+        """
+        Appends a sale and waits until it is durable and applied.
+        """
+
+        self.wait(self.append(record))
+
+    def close(self):
+        """
+        Commits the queued sales and removes the segment.
+        """
+
+        with self._condition:
+            if self._closing or os.getpid() != self.pid:
+                return
+            self._closing = True
+        try:
+            self.wait()
+        except Exception:
+            pass  # the failed sales stay in the segment for recover()
+        _sync_file(self.sales_csv)
+        os.close(self._fd)
+        if not self._failures:
+            os.remove(self.path)
+
+    def _next_group(self):
+        # Called by the leader with the condition held: waits for the group to fill, then takes it
+        deadline = self._pending[0][1] + self.commit_interval
+        while len(self._pending) < min(self._expected, self.group_size) and not self._closing:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._condition.wait(remaining)
+        group = [record for record, _ in self._pending[:self.group_size]]
+        del self._pending[:self.group_size]
+        self._expected = len(group)
+        return group
+
+    def _commit_group(self, group):
+        # Called by the leader without the condition held; returns the error that stopped the commit, if any
+        start = time.perf_counter()
+        error = None
+        try:
+            data = b''.join(encode(record) for record in group)
+            while data:
+                data = data[os.write(self._fd, data):]
+            os.fsync(self._fd)
+            if not hasattr(self._connections, 'ledger'):
+                self._connections.ledger = Ledger(self.ledger_path)
+                self._connections.ledger.connection.execute('PRAGMA synchronous=FULL')
+                self._connections.directory = CustomerDirectory(self.customers_path)
+            apply_sales(group, self.sales_csv, self._connections.ledger, self._connections.directory)
+            if not self._failures and os.fstat(self._fd).st_size > SEGMENT_LIMIT:
+                _sync_file(self.sales_csv)
+                os.ftruncate(self._fd, 0)
+                os.fsync(self._fd)
+        except Exception as e:
+            error = e
+            metrics.count_error('journal_commit')
+        metrics.observe('journal_commit', time.perf_counter() - start)
+        metrics.count('journal_groups')
+        metrics.count('journal_records', len(group))
+        return error
+
+
+def recover(directory=JOURNAL_DIR, sales_csv=SALES_CSV, ledger_path=LEDGER_PATH, customers_path=CUSTOMERS_PATH,
+            config_path=CONFIG_PATH, invoices_dir=INVOICES_DIR):
+    """
+    Finishes the checkouts of processes that stopped without closing their journal (a crash, a kill
+    or a power cut) and reconciles the invoices directory, the ledger and the invoice counter:
+    - sales missing from the ledger or `sales_data.csv` are added (the customer visit with them);
+    - PDFs missing from the invoices directory, empty or cut short are rendered again from the journal;
+    - PDFs in the invoices directory with no sale in the ledger are reported;
+    - the invoice counter is moved past the highest recorded invoice number, so no number is reused.
+
+    Segments of running processes are locked and left alone.
+
+    Returns:
+    - `report` (dict): `segments` recovered, sales `replayed`, PDFs `rendered`, damaged records
+      dropped (`torn`), `orphans` (PDF names) and `counter` (`(old, new)` if it was moved, else None).
+    """
+
+    report = {'segments': 0, 'replayed': 0, 'rendered': 0, 'torn': 0, 'orphans': [], 'counter': None}
+    segments = []
+    if os.path.isdir(directory):
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith('.log'):
+                continue
+            fd = os.open(os.path.join(directory, name), os.O_RDWR | getattr(os, 'O_BINARY', 0))
+            if _try_lock(fd):
+                segments.append((os.path.join(directory, name), fd))
+            else:
+                os.close(fd)
+
+    ledger = Ledger(ledger_path)
+    try:
+        if segments:
+            ledger.connection.execute('PRAGMA synchronous=FULL')
+            records = []
+            for path, _ in segments:
+                segment_records, torn = read_segment(path)
+                records.extend(segment_records)
+                report['torn'] += torn
+            _replay(records, sales_csv, ledger, customers_path, report)
+            report['orphans'] = _orphans(invoices_dir, ledger)
+            for path, fd in segments:
+                os.close(fd)
+                os.remove(path)
+            report['segments'] = len(segments)
+
+        last = ledger.connection.execute(
+            'SELECT invoice_number FROM invoices ORDER BY invoice_number DESC LIMIT 1').fetchone()
+        if last is not None and last[0].isdigit():
+            report['counter'] = _advance_counter(config_path, int(last[0]) + 1)
+    finally:
+        ledger.close()
+    return report
+
+
+def _replay(records, sales_csv, ledger, customers_path, report):
+    in_csv = set()
+    if os.path.isfile(sales_csv):
+        with open(sales_csv, 'r', newline='') as file:
+            in_csv = {row['invoice_number'] for row in csv.DictReader(file)}
+    missing_csv = [record for record in records if record['invoice_number'] not in in_csv]
+    missing_ledger = [record for record in records if ledger.get(record['invoice_number']) is None]
+
+    if missing_csv:
+        new_file = not os.path.isfile(sales_csv)
+        with open(sales_csv, 'a', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=SALES_FIELDS, extrasaction='ignore')
+            if new_file:
+                writer.writeheader()
+            writer.writerows(missing_csv)
+            file.flush()
+            os.fsync(file.fileno())
+    if missing_ledger:
+        ledger.record_many(missing_ledger)
+        directory = CustomerDirectory(customers_path)
+        directory.remember_many((sale['cx_name'], sale['cx_address'], sale['date_time']) for sale in missing_ledger)
+        directory.close()
+    report['replayed'] = len({record['invoice_number'] for record in missing_csv + missing_ledger})
+
+    for record in records:
+        path = record.get('pdf', {}).get('path')
+        if path and not _is_whole(path):
+            _render_again(record)
+            report['rendered'] += 1
+
+
+def _render_again(record):
+    from project import build_invoice  # project.py records its sales through this module
+    from renderers import get_renderer
+
+    pdf = record['pdf']
+    invoice = build_invoice(record['invoice_number'], record['date_time'], pdf['business'], record['cx_name'],
+                            record['cx_address'], record['cart'])
+    data = get_renderer(pdf['renderer']).render_bytes(invoice)
+    os.makedirs(os.path.dirname(pdf['path']), exist_ok=True)
+    write_durably(pdf['path'], data)
+
+
+def _is_whole(path):
+    # A PDF written before the sink flushed it to disk can be missing, empty or cut short by a power cut
+    try:
+        with open(path, 'rb') as file:
+            return is_complete(file.read())
+    except FileNotFoundError:
+        return False
+
+
+def _orphans(invoices_dir, ledger):
+    if not os.path.isdir(invoices_dir):
+        return []
+    numbers = sorted(name[:-4] for name in os.listdir(invoices_dir) if name.endswith('.pdf') and name[:-4].isdigit())
+    recorded = set()
+    for start in range(0, len(numbers), 500):
+        chunk = numbers[start:start + 500]
+        recorded.update(number for number, in ledger.connection.execute(
+            f'SELECT invoice_number FROM invoices WHERE invoice_number IN ({",".join("?" * len(chunk))})', chunk))
+    return [f'{number}.pdf' for number in numbers if number not in recorded]
+
+
+def _advance_counter(config_path, minimum):
+    if not os.path.isfile(config_path):
+        return None
+    with FileLock(config_path):
+        parser = _read(config_path)
+        current = int(parser.get('settings', 'invoice_number'))
+        if current >= minimum:
+            return None
+        _write_number(config_path, parser, minimum)
+    return current, minimum
+
+
+def _sync_file(path):
+    if os.path.isfile(path):
+        with open(path, 'ab') as file:
+            os.fsync(file.fileno())
+
+
+def _try_lock(fd):
+    """
+    Locks a journal segment until the process exits, when the OS releases it. Returns False if
+    another process holds the lock.
+    """
+
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def format_report(report):
+    """
+    Returns a one-line summary of a `recover()` report.
+    """
+
+    text = (f"♻️ Recovered {report['segments']} journal segment(s): {report['replayed']} sale(s) replayed, "
+            f"{report['rendered']} PDF(s) rendered again, {report['torn']} damaged record(s) dropped")
+    if report['orphans']:
+        text += f"; PDFs with no recorded sale: {', '.join(report['orphans'])}"
+    if report['counter']:
+        text += f"; invoice counter moved from {report['counter'][0]:06d} to {report['counter'][1]:06d}"
+    return text
+
+
+def get_journal(directory=JOURNAL_DIR):
+    """
+    Returns this process's checkout journal in `directory`. The first call recovers the segments left
+    by processes that stopped without closing theirs (see `recover()`).
+    """
+
+    directory = os.path.abspath(directory)
+    with _journals_lock:
+        if directory not in _journals:
+            report = recover(directory)
+            if report['segments'] or report['counter']:
+                print(format_report(report))
+            _journals[directory] = CheckoutJournal(directory)
+        return _journals[directory]
+
+
+@atexit.register
+def close_journals():
+    """
+    Closes every journal of the process; registered to run at exit.
+    """
+
+    while _journals:
+        _journals.popitem()[1].close()
+
+
+def main():
+    """
+    Command line entry point: `python journal.py` recovers the segments of stopped processes and reports.
+    """
+
+    report = recover()
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+""" Indexed sales ledger (SQLite) with lookups by invoice number, customer and date. """
+import argparse
+import ast
+import csv
+import datetime as dt
+import json
+import os
+import sqlite3
+from decimal import Decimal
+
+LEDGER_PATH: str = 'sales_data.db'
+DATE_FORMAT: str = '%m-%d-%Y %I:%M %p'
+_ledgers: dict = {}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS invoices (
+    invoice_number TEXT PRIMARY KEY,
+    date_time TEXT NOT NULL,
+    sold_at TEXT NOT NULL,
+    cx_name TEXT NOT NULL,
+    cx_address TEXT NOT NULL,
+    total_cents INTEGER NOT NULL,
+    business TEXT,
+    renderer TEXT
+);
+CREATE INDEX IF NOT EXISTS invoices_cx_name ON invoices (cx_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS invoices_cx_name_sold_at ON invoices (cx_name COLLATE NOCASE, sold_at);
+CREATE INDEX IF NOT EXISTS invoices_sold_at ON invoices (sold_at);
+CREATE TABLE IF NOT EXISTS line_items (
+    invoice_number TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    service TEXT NOT NULL,
+    unit_cents INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    price TEXT,
+    PRIMARY KEY (invoice_number, position)
+) WITHOUT ROWID;
+'''
+# Columns added since the first version of the schema, added to older ledgers when they are opened
+ADDED_COLUMNS: list = [('invoices', 'business', 'TEXT'), ('invoices', 'renderer', 'TEXT'),
+                       ('line_items', 'price', 'TEXT')]
+
+
+def to_cents(amount):
+    """
+    Converts a money string as stored in the sales data (e.g. ' 20.52' or '$ 198.72') to integer cents.
+
+    Args:
+    - `amount` (str): The amount.
+
+    Returns:
+    - `cents` (int): The amount in cents.
+    """
+
+    return int((Decimal(str(amount).replace('$', '').strip()) * 100).to_integral_value())
+
+
+def format_cents(cents):
+    """
+    Formats integer cents as a price string, e.g. 2052 -> '20.52'.
+    """
+
+    return f'{cents // 100}.{cents % 100:02d}'
+
+
+def iso_date_time(date_time):
+    """
+    Converts the invoice date format ('02-24-2025 07:09 PM') to a sortable ISO string ('2025-02-24 19:09').
+    """
+
+    return dt.datetime.strptime(date_time, DATE_FORMAT).strftime('%Y-%m-%d %H:%M')
+
+
+class Ledger:
+    """
+    The sales ledger: one row per invoice plus structured line items, indexed by invoice number,
+    customer name and date. Each sale keeps the prices as they were sold and, when known, the
+    business data and renderer its invoice was rendered with, so the invoice can be rendered again
+    exactly as it was issued.
+    """
+
+    def __init__(self, path=LEDGER_PATH):
+        """
+        Args:
+        - `path` (str): Path to the SQLite database, created if missing.
+        """
+
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        for table, column, column_type in ADDED_COLUMNS:
+            if column not in {row[1] for row in self.connection.execute(f'PRAGMA table_info({table})')}:
+                self.connection.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+
+    def record(self, invoice_number, date_time, cx_name, cx_address, cart, total, pdf=None):
+        """
+        Records a sale. Takes the same arguments as `post_data()`.
+        """
+
+        with self.connection:
+            self._insert(invoice_number, date_time, cx_name, cx_address, cart, total, pdf)
+
+    def record_many(self, sales):
+        """
+        Records several sales in one transaction.
+
+        Args:
+        - `sales` (list): Dicts with the arguments of `record()` as keys, like the rows of `sales_data.csv`
+          or the records of the checkout journal.
+        """
+
+        with self.connection:
+            for sale in sales:
+                self._insert(sale['invoice_number'], sale['date_time'], sale['cx_name'], sale['cx_address'],
+                             sale['cart'], sale['total'], sale.get('pdf'))
+
+    def _insert(self, invoice_number, date_time, cx_name, cx_address, cart, total, pdf):
+        pdf = pdf or {}
+        business = pdf.get('business')
+        self.connection.execute(
+            'INSERT OR REPLACE INTO invoices VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (invoice_number, date_time, iso_date_time(date_time), cx_name, json.dumps(cx_address), to_cents(total),
+             json.dumps(business) if business is not None else None, pdf.get('renderer')))
+        self.connection.execute('DELETE FROM line_items WHERE invoice_number = ?', (invoice_number,))
+        self.connection.executemany(
+            'INSERT INTO line_items VALUES (?, ?, ?, ?, ?, ?)',
+            [(invoice_number, position, item[0], to_cents(item[1]), int(item[2]), str(item[1]))
+             for position, item in enumerate(cart)])
+
+    def get(self, invoice_number):
+        """
+        Returns the sale recorded under `invoice_number`, or None.
+
+        Returns:
+        - `sale` (dict): `invoice_number`, `date_time`, `cx_name`, `cx_address` (dict), `cart`
+          (list of `[service, price, quantity]`, with the prices as sold) and `total`, like the columns
+          of `sales_data.csv`, plus the `business` data (dict) and `renderer` the invoice was rendered
+          with, or None for sales recorded without them.
+        """
+
+        sales = self._select('WHERE invoices.invoice_number = ? ORDER BY invoices.invoice_number', (invoice_number,))
+        return sales[0] if sales else None
+
+    def by_customer(self, cx_name):
+        """
+        Returns every sale to the customer named `cx_name` (case-insensitive), oldest first.
+        """
+
+        return self._select('WHERE cx_name = ? COLLATE NOCASE ORDER BY sold_at, invoices.invoice_number', (cx_name,))
+
+    def by_date(self, start, end):
+        """
+        Returns every sale from `start` to `end` (inclusive), oldest first.
+
+        Args:
+        - `start` (datetime.date): The first day.
+        - `end` (datetime.date): The last day.
+        """
+
+        return self._select('WHERE sold_at >= ? AND sold_at < ? ORDER BY sold_at, invoices.invoice_number',
+                            (start.isoformat(), (end + dt.timedelta(days=1)).isoformat()))
+
+    def iter_customer(self, cx_name, start, end):
+        """
+        Yields the sales to the customer named `cx_name` (case-insensitive) from `start` to `end`
+        (inclusive), oldest first, one at a time as they are read, so any number of sales can be
+        processed in constant memory.
+
+        Args:
+        - `cx_name` (str): The customer's name.
+        - `start` (datetime.date): The first day.
+        - `end` (datetime.date): The last day.
+        """
+
+        return self._iter_select(
+            'WHERE cx_name = ? COLLATE NOCASE AND sold_at >= ? AND sold_at < ? ORDER BY sold_at, invoices.invoice_number',
+            (cx_name, start.isoformat(), (end + dt.timedelta(days=1)).isoformat()))
+
+    def _select(self, where, parameters):
+        return list(self._iter_select(where, parameters))
+
+    def _iter_select(self, where, parameters):
+        rows = self.connection.execute(
+            'SELECT invoices.invoice_number, date_time, cx_name, cx_address, total_cents, business, renderer, service, '
+            'unit_cents, quantity, price '
+            'FROM invoices LEFT JOIN line_items ON line_items.invoice_number = invoices.invoice_number '
+            f'{where}, position', parameters)
+        sale = None
+        for (invoice_number, date_time, cx_name, cx_address, total_cents, business, renderer, service, unit_cents,
+             quantity, price) in rows:
+            if sale is None or sale['invoice_number'] != invoice_number:
+                if sale is not None:
+                    yield sale
+                sale = {
+                    'invoice_number': invoice_number,
+                    'date_time': date_time,
+                    'cx_name': cx_name,
+                    'cx_address': json.loads(cx_address),
+                    'cart': [],
+                    'total': f'$ {format_cents(total_cents)}',
+                    'business': json.loads(business) if business is not None else None,
+                    'renderer': renderer
+                }
+            if service is not None:
+                sale['cart'].append([service, price if price is not None else format_cents(unit_cents), quantity])
+        if sale is not None:
+            yield sale
+
+    def migrate_csv(self, csv_path='sales_data.csv'):
+        """
+        Imports every row of a `sales_data.csv` file written by `post_data()`. Rows already in the
+        ledger are replaced, so the migration can be re-run.
+
+        Returns:
+        - `count` (int): The number of sales imported.
+        """
+
+        count = 0
+        with open(csv_path, 'r', newline='') as file, self.connection:
+            for row in csv.DictReader(file):
+                self._insert(row['invoice_number'], row['date_time'], row['cx_name'],
+                             ast.literal_eval(row['cx_address']), ast.literal_eval(row['cart']), row['total'], None)
+                count += 1
+        return count
+
+    def close(self):
+        self.connection.close()
+
+
+def get_ledger(path=LEDGER_PATH):
+    """
+    Returns the ledger at `path`, opened once per process.
+    """
+
+    path = os.path.abspath(path)
+    if path not in _ledgers:
+        _ledgers[path] = Ledger(path)
+    return _ledgers[path]
+
+
+def _print_sales(sales):
+    for sale in sales:
+        items = ', '.join(f'{service} x{quantity}' for service, _, quantity in sale['cart'])
+        print(f"{sale['invoice_number']}  {sale['date_time']}  {sale['cx_name']:<20} {sale['total']:>12}  {items}")
+    if not sales:
+        print('No sales found.')
+
+
+def main():
+    """
+    Command line entry point:
+    - `python ledger.py migrate [sales_data.csv]`
+    - `python ledger.py invoice 000001`
+    - `python ledger.py customer "Smit"`
+    - `python ledger.py dates 2025-02-01 2025-02-28`
+    """
+
+    arg_parser = argparse.ArgumentParser(description='Query the sales ledger.')
+    arg_parser.add_argument('--ledger', default=LEDGER_PATH, help=f'ledger database (default: {LEDGER_PATH})')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('migrate').add_argument('csv', nargs='?', default='sales_data.csv')
+    commands.add_parser('invoice').add_argument('invoice_number')
+    commands.add_parser('customer').add_argument('cx_name')
+    dates = commands.add_parser('dates')
+    dates.add_argument('start', type=dt.date.fromisoformat)
+    dates.add_argument('end', type=dt.date.fromisoformat)
+    args = arg_parser.parse_args()
+
+    ledger = get_ledger(args.ledger)
+    match args.command:
+        case 'migrate':
+            if not os.path.isfile(args.csv):
+                raise SystemExit(f'{args.csv} not found')
+            print(f'Imported {ledger.migrate_csv(args.csv)} sales into {args.ledger}')
+        case 'invoice':
+            sale = ledger.get(args.invoice_number)
+            _print_sales([sale] if sale else [])
+        case 'customer':
+            _print_sales(ledger.by_customer(args.cx_name))
+        case 'dates':
+            _print_sales(ledger.by_date(args.start, args.end))
+
+
+if __name__ == "__main__":
+    main()
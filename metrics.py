@@ -0,0 +1,298 @@
+""" Opt-in instrumentation of the invoice pipeline: stage timings, counters and peak memory, exported for Prometheus or as JSON. """
+import atexit
+import bisect
+import contextlib
+import cProfile
+import datetime as dt
+import functools
+import heapq
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+BUCKETS: tuple = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                  1.0, 2.5, 5.0, 10.0)
+METRICS_ENV: str = 'INVOICE_METRICS'
+_NO_PROFILE = contextlib.nullcontext()
+
+_enabled: bool = False
+_histograms: dict = {}
+_counters: dict = {}
+_errors: dict = {}
+_profile_slowest: int = 0
+_profiles: list = []
+_profile_order = itertools.count()
+_lock = threading.Lock()  # recording happens on service, batch and session worker threads
+
+
+class Histogram:
+    """
+    Durations of one stage, counted in the fixed `BUCKETS` (upper bounds in seconds) like a Prometheus
+    histogram, plus their sum and maximum.
+    """
+
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def cumulative(self):
+        """
+        Returns `(upper_bound, count)` pairs with the number of durations up to each bound, ending with
+        `('+Inf', count)`.
+        """
+
+        bounds = [f'{bound:g}' for bound in BUCKETS] + ['+Inf']
+        return list(zip(bounds, itertools.accumulate(self.counts)))
+
+
+def enable(profile_slowest=0):
+    """
+    Starts recording. Until then every instrumented function runs with a single flag check of overhead.
+
+    Args:
+    - `profile_slowest` (int): Number of slowest invoices to keep a cProfile trace of (0 for none).
+      Profiling slows every invoice down, so only ask for it when looking for a bottleneck.
+    """
+
+    global _enabled, _profile_slowest
+    _enabled = True
+    _profile_slowest = max(0, profile_slowest)
+
+
+def disable():
+    """
+    Stops recording and profiling. What was recorded so far is kept.
+    """
+
+    global _enabled, _profile_slowest
+    _enabled = False
+    _profile_slowest = 0
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """
+    Forgets everything recorded so far.
+    """
+
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _errors.clear()
+        _profiles.clear()
+
+
+def observe(stage, seconds):
+    """
+    Records one duration of `stage`, in seconds.
+    """
+
+    if _enabled:
+        with _lock:
+            histogram = _histograms.get(stage)
+            if histogram is None:
+                histogram = _histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+
+def count(name, amount=1):
+    """
+    Adds `amount` to the counter `name`, e.g. 'invoices' or 'lines'.
+    """
+
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + amount
+
+
+def count_error(stage):
+    """
+    Counts one failure of `stage`.
+    """
+
+    if _enabled:
+        with _lock:
+            _errors[stage] = _errors.get(stage, 0) + 1
+
+
+def timed(stage):
+    """
+    Decorator recording the duration of every call under `stage`, and a failure for every call that raises.
+    Calls go straight through while recording is disabled.
+
+    Args:
+    - `stage` (str): The stage name, e.g. 'render'.
+    """
+
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            except Exception:
+                count_error(stage)
+                raise
+            finally:
+                observe(stage, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorate
+
+
+def profile(key):
+    """
+    Returns a context manager tracing the block with cProfile when the slowest invoices are profiled (see
+    `enable()`), and a no-op otherwise. Only the `profile_slowest` slowest traces are kept.
+
+    Args:
+    - `key` (str): What the block is, e.g. the invoice number; names the trace file.
+    """
+
+    if not _profile_slowest:
+        return _NO_PROFILE
+    return _profiled(key)
+
+
+@contextlib.contextmanager
+def _profiled(key):
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        entry = (time.perf_counter() - start, next(_profile_order), str(key), profiler)
+        with _lock:
+            if len(_profiles) < _profile_slowest:
+                heapq.heappush(_profiles, entry)
+            elif entry[0] > _profiles[0][0]:
+                heapq.heapreplace(_profiles, entry)
+
+
+def dump_profiles(directory='profiles'):
+    """
+    Writes the kept cProfile traces, slowest first, as `<key>.prof` files readable with `pstats` or snakeviz.
+
+    Returns:
+    - `traces` (list): `(path, seconds)` pairs.
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    traces = []
+    with _lock:
+        profiles = sorted(_profiles, reverse=True)
+    for seconds, _, key, profiler in profiles:
+        path = os.path.join(directory, f'{key}.prof')
+        profiler.dump_stats(path)
+        traces.append((path, seconds))
+    return traces
+
+
+def peak_memory():
+    """
+    Returns the peak resident memory of this process in bytes, or None where the platform does not report it.
+    """
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def snapshot():
+    """
+    Returns everything recorded so far as a JSON-ready dict: per stage the count, sum, mean, maximum and
+    cumulative bucket counts, then the counters, failures per stage and peak memory.
+    """
+
+    with _lock:
+        return {
+            'created': dt.datetime.now().isoformat(timespec='seconds'),
+            'stages': {
+                stage: {'count': histogram.count, 'sum': histogram.sum, 'mean': histogram.sum / histogram.count,
+                        'max': histogram.max, 'buckets': dict(histogram.cumulative())}
+                for stage, histogram in sorted(_histograms.items())
+            },
+            'counters': dict(sorted(_counters.items())),
+            'errors': dict(sorted(_errors.items())),
+            'peak_memory_bytes': peak_memory()
+        }
+
+
+def prometheus():
+    """
+    Returns everything recorded so far in the Prometheus text exposition format.
+    """
+
+    lines = ['# HELP invoice_stage_seconds Time spent in each stage of the invoice pipeline.',
+             '# TYPE invoice_stage_seconds histogram']
+    with _lock:
+        for stage, histogram in sorted(_histograms.items()):
+            for bound, total in histogram.cumulative():
+                lines.append(f'invoice_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {total}')
+            lines.append(f'invoice_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'invoice_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        for name, value in sorted(_counters.items()):
+            lines.append(f'# TYPE invoice_{name}_total counter')
+            lines.append(f'invoice_{name}_total {value}')
+        lines.append('# TYPE invoice_errors_total counter')
+        for stage, value in sorted(_errors.items()):
+            lines.append(f'invoice_errors_total{{stage="{stage}"}} {value}')
+    peak = peak_memory()
+    if peak is not None:
+        lines.append('# TYPE invoice_peak_memory_bytes gauge')
+        lines.append(f'invoice_peak_memory_bytes {peak}')
+    return '\n'.join(lines) + '\n'
+
+
+def write(path):
+    """
+    Writes everything recorded so far to `path`: JSON for a `.json` file, the Prometheus text format
+    otherwise (e.g. a `.prom` file for the node exporter's textfile collector). The file is replaced
+    atomically, so a scraper never reads it half-written.
+    """
+
+    if os.path.splitext(path)[1].lower() == '.json':
+        content = json.dumps(snapshot(), indent=2)
+    else:
+        content = prometheus()
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as file:
+        file.write(content)
+    os.replace(temp_path, path)
+
+
+def enable_from_env():
+    """
+    Turns recording on when the `INVOICE_METRICS` environment variable names an output file, and writes
+    the metrics there when the process exits. Used by the interactive program, which has no options.
+    """
+
+    path = os.environ.get(METRICS_ENV)
+    if path and not _enabled:
+        enable()
+        atexit.register(write, path)
@@ -0,0 +1,767 @@
+""" Minimal pure-Python PDF writer used by the native invoice renderer, plus a streaming writer that merges PDFs. """
+import hashlib
+import re
+import struct
+import zlib
+
+PAGE_WIDTH: float = 612.0
+PAGE_HEIGHT: float = 792.0
+
+FONTS: dict = {
+    'regular': ('F1', 'Helvetica'),
+    'bold': ('F2', 'Helvetica-Bold'),
+    'italic': ('F3', 'Helvetica-Oblique'),
+}
+
+# Advance widths (1/1000 em) of the standard 14 fonts for the printable ASCII range, ' ' to '~'.
+_HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+_HELVETICA_BOLD_WIDTHS = [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+]
+_WIDTHS = {'regular': _HELVETICA_WIDTHS, 'bold': _HELVETICA_BOLD_WIDTHS, 'italic': _HELVETICA_WIDTHS}
+
+
+def text_width(text, size, font='regular'):
+    """
+    Returns the width of `text` in points when set in `font` at `size`.
+
+    Args:
+    - `text` (str): The text to measure.
+    - `size` (float): The font size in points.
+    - `font` (str): One of the keys of `FONTS`.
+    """
+
+    widths = _WIDTHS[font]
+    total = 0
+    for char in text:
+        code = ord(char) - 32
+        total += widths[code] if 0 <= code < len(widths) else 556
+    return total * size / 1000
+
+
+def is_complete(data):
+    """
+    Returns True if `data` looks like a whole PDF file: it starts with the `%PDF-` header and has the
+    `%%EOF` marker in its last kilobyte, so a file cut short by a crash is not taken for an invoice.
+    """
+
+    return data.startswith(b'%PDF-') and b'%%EOF' in data[-1024:]
+
+
+def _escape(text):
+    raw = text.encode('cp1252', errors='replace')
+    return raw.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def _color(rgb):
+    return ' '.join(f'{channel / 255:.3f}' for channel in rgb).encode()
+
+
+def _short(value, digits=2):
+    # The shortest form of a number at the given precision: 12.50 -> 12.5, 0.690 -> .69, 1.000 -> 1
+    text = b'%.*f' % (digits, value)
+    text = text.rstrip(b'0').rstrip(b'.') or b'0'
+    if text == b'-0':
+        return b'0'
+    return text[1:] if text.startswith(b'0.') else b'-' + text[2:] if text.startswith(b'-0.') else text
+
+
+def _stream(data, extra=b''):
+    return b'<< /Length %d /Filter /FlateDecode %s>>\nstream\n%s\nendstream' % (len(data), extra, data)
+
+
+def _font(base_font):
+    return b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % base_font.encode()
+
+
+def _image(data, width, height, color_space, smask=b''):
+    return _stream(data, b'/Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace %s /BitsPerComponent 8 %s'
+                   % (width, height, color_space, smask))
+
+
+def _page(content, fonts, images):
+    fonts = b' '.join(b'/%s %d 0 R' % (name.encode(), number) for name, number in fonts.items())
+    images = b' '.join(b'/%s %d 0 R' % (name.encode(), number) for name, number in sorted(images.items()))
+    return (b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R '
+            b'/Resources << /Font << %s >> /XObject << %s >> >> >>' % (PAGE_WIDTH, PAGE_HEIGHT, content, fonts, images))
+
+
+class Canvas:
+    """
+    Collects the drawing operators of one page. Coordinates are in points with the origin at the
+    top-left corner of the page, like the template's layout, and are flipped when written.
+    A compact canvas writes numbers in their shortest form and leaves out colors, line widths and
+    fonts already in effect, for a smaller content stream that draws the same page.
+    """
+
+    def __init__(self, compact=False):
+        self._ops = []
+        self.images = set()
+        self.compact = compact
+        self._state = {}
+
+    def _numbers(self, *values):
+        if self.compact:
+            return b' '.join(_short(value) for value in values)
+        return b' '.join(b'%.2f' % value for value in values)
+
+    def _set(self, key, operator):
+        # The operator that sets graphics state `key`, or nothing if a compact canvas has it set already
+        if self.compact:
+            if self._state.get(key) == operator:
+                return b''
+            self._state[key] = operator
+        return operator
+
+    def _rgb(self, rgb, operator):
+        if self.compact:
+            return self._set(operator, b'%s %s ' % (b' '.join(_short(channel / 255, 3) for channel in rgb), operator))
+        return b'%s %s ' % (_color(rgb), operator)
+
+    def rect(self, x, top, width, height, fill):
+        """
+        Draws a filled rectangle.
+        """
+
+        self._ops.append(b'%s%s re f\n' % (
+            self._rgb(fill, b'rg'), self._numbers(x, PAGE_HEIGHT - top - height, width, height)))
+
+    def line(self, x1, y1, x2, y2, color=(0, 0, 0), width=0.75):
+        """
+        Draws a straight line.
+        """
+
+        self._ops.append(b'%s%s%s m %s l S\n' % (
+            self._rgb(color, b'RG'), self._set(b'w', b'%s w ' % self._numbers(width)),
+            self._numbers(x1, PAGE_HEIGHT - y1), self._numbers(x2, PAGE_HEIGHT - y2)))
+
+    def text(self, x, baseline, text, size=11, font='regular', color=(0, 0, 0), align='left'):
+        """
+        Draws a line of text. With `align` set to 'right' or 'center', `x` is the right edge or the center.
+        """
+
+        if align == 'right':
+            x -= text_width(text, size, font)
+        elif align == 'center':
+            x -= text_width(text, size, font) / 2
+        self._ops.append(b'BT %s%s%s Td (%s) Tj ET\n' % (
+            self._rgb(color, b'rg'), self._set(b'Tf', b'/%s %s Tf ' % (FONTS[font][0].encode(), self._numbers(size))),
+            self._numbers(x, PAGE_HEIGHT - baseline), _escape(text)))
+
+    def image(self, name, x, top, width, height):
+        """
+        Draws the image XObject registered under `name` with `PdfWriter.add_image()`.
+        """
+
+        self.images.add(name)
+        self._ops.append(b'q %s 0 0 %s %s cm /%s Do Q\n' % (
+            self._numbers(width), self._numbers(height), self._numbers(x, PAGE_HEIGHT - top - height), name.encode()))
+
+    def content(self):
+        """
+        Returns the page content stream.
+        """
+
+        return b''.join(self._ops)
+
+
+class PdfWriter:
+    """
+    Assembles pages into a PDF file. Fonts are the standard 14 fonts, so nothing is embedded,
+    and content and image streams are Flate-compressed.
+
+    A compact writer compresses harder, stores identical objects once and writes a PDF 1.5 file
+    whose dictionaries are packed into one compressed object stream, indexed by a compressed
+    cross-reference stream. Readers from Acrobat 6 (2003) on open it.
+    """
+
+    def __init__(self, compact=False):
+        self.compact = compact
+        self._objects = [None, None, None]
+        self._pages = []
+        self._images = {}
+        self._fonts = {}
+        self._bodies = {}
+        for name, base_font in FONTS.values():
+            self._fonts[name] = self._add(_font(base_font))
+
+    def _add(self, body):
+        if self.compact:
+            if body in self._bodies:
+                return self._bodies[body]
+            self._bodies[body] = len(self._objects)
+        self._objects.append(body)
+        return len(self._objects) - 1
+
+    def add_image(self, name, image):
+        """
+        Registers an image returned by `decode_png()` as an XObject named `name`.
+        """
+
+        width, height, colors, pixels, alpha = image
+        smask = b''
+        if alpha is not None:
+            smask = b'/SMask %d 0 R ' % self._add(_image(alpha, width, height, b'/DeviceGray'))
+        self._images[name] = self._add(
+            _image(pixels, width, height, b'/DeviceRGB' if colors == 3 else b'/DeviceGray', smask))
+
+    def add_page(self, canvas):
+        """
+        Adds a page drawn on `canvas`.
+        """
+
+        content = self._add(_stream(zlib.compress(canvas.content(), 9 if self.compact else -1)))
+        self._pages.append(self._add(_page(content, self._fonts, {name: self._images[name] for name in canvas.images})))
+
+    def tobytes(self):
+        """
+        Returns the finished PDF file.
+        """
+
+        kids = b' '.join(b'%d 0 R' % page for page in self._pages)
+        self._objects[1] = b'<< /Type /Catalog /Pages 2 0 R >>'
+        self._objects[2] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self._pages))
+        if self.compact:
+            return self._compact_bytes()
+
+        out = [b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n']
+        offsets = []
+        position = len(out[0])
+        for number in range(1, len(self._objects)):
+            chunk = b'%d 0 obj\n%s\nendobj\n' % (number, self._objects[number])
+            offsets.append(position)
+            out.append(chunk)
+            position += len(chunk)
+
+        xref = [b'xref\n0 %d\n0000000000 65535 f \n' % (len(offsets) + 1)]
+        xref.extend(b'%010d 00000 n \n' % offset for offset in offsets)
+        out.extend(xref)
+        out.append(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(offsets) + 1, position))
+        return b''.join(out)
+
+    def _compact_bytes(self):
+        # Streams stay top-level objects; every other object goes into one object stream (PDF 1.5, 7.5.7)
+        packed = [number for number in range(1, len(self._objects)) if not self._objects[number].endswith(b'endstream')]
+        object_stream, xref_stream = len(self._objects), len(self._objects) + 1
+        entries = {0: (0, 0, 0xFFFF)}
+        header, bodies, position = [], [], 0
+        for index, number in enumerate(packed):
+            header.append(b'%d %d' % (number, position))
+            bodies.append(self._objects[number])
+            position += len(bodies[-1]) + 1
+            entries[number] = (2, object_stream, index)
+        header = b' '.join(header) + b'\n'
+        packed_data = zlib.compress(header + b'\n'.join(bodies), 9)
+
+        out = [b'%PDF-1.5\n%\xe2\xe3\xcf\xd3\n']
+        position = len(out[0])
+        top_level = [(number, self._objects[number]) for number in range(1, len(self._objects)) if number not in entries]
+        top_level.append((object_stream, _stream(packed_data, b'/Type /ObjStm /N %d /First %d '
+                                                 % (len(packed), len(header)))))
+        for number, body in top_level:
+            chunk = b'%d 0 obj\n%s\nendobj\n' % (number, body)
+            entries[number] = (1, position, 0)
+            out.append(chunk)
+            position += len(chunk)
+        entries[xref_stream] = (1, position, 0)
+
+        width = max(1, (position.bit_length() + 7) // 8)
+        rows = b''.join(struct.pack('>B', kind) + value.to_bytes(width, 'big') + struct.pack('>H', generation)
+                        for kind, value, generation in (entries[number] for number in range(xref_stream + 1)))
+        out.append(b'%d 0 obj\n%s\nendobj\n' % (xref_stream, _stream(
+            zlib.compress(rows, 9), b'/Type /XRef /Size %d /W [1 %d 2] /Root 1 0 R ' % (xref_stream + 1, width))))
+        out.append(b'startxref\n%d\n%%%%EOF\n' % position)
+        return b''.join(out)
+
+
+_REFERENCE = re.compile(rb'(\d+)\s+(\d+)\s+R\b')
+_OBJECT = re.compile(rb'\s*(\d+)\s+(\d+)\s+obj\b\s*')
+_INHERITED = (b'/Resources', b'/MediaBox', b'/CropBox', b'/Rotate')
+
+
+def _value(head, key):
+    # The raw value of `key` in a dictionary: a nested dictionary, an array, a reference or a single token
+    match = re.search(re.escape(key) + rb'(?![A-Za-z0-9])\s*', head)
+    if match is None:
+        return None
+    start = position = match.end()
+    if head.startswith((b'<<', b'['), start):
+        opening, closing = (b'<<', b'>>') if head.startswith(b'<<', start) else (b'[', b']')
+        depth = 0
+        while position < len(head):
+            if head.startswith(opening, position):
+                depth += 1
+                position += len(opening)
+            elif head.startswith(closing, position):
+                depth -= 1
+                position += len(closing)
+                if depth == 0:
+                    return head[start:position]
+            else:
+                position += 1
+        return None
+    token = re.match(rb'\d+\s+\d+\s+R\b|/?[^\s/<>\[\]]+', head[start:])
+    return token.group(0) if token else None
+
+
+class PdfReader:
+    """
+    Reads the objects and pages of a PDF, such as those written by `PdfWriter`: classic
+    cross-reference tables as well as the cross-reference and object streams of PDF 1.5. Only what
+    merging needs is parsed: dictionaries are kept as raw bytes.
+    """
+
+    def __init__(self, data):
+        """
+        Args:
+        - `data` (bytes): The PDF file contents.
+
+        Raises:
+        - `ValueError`: If the file is not a PDF this reader handles, e.g. one with encrypted or LZW-compressed streams.
+        """
+
+        self.data = data
+        self.page_tree = set()
+        self._offsets = {}
+        self._compressed = {}
+        self._object_streams = {}
+        start = data.rfind(b'startxref')
+        if start < 0:
+            raise ValueError('not a PDF file')
+        position = int(data[start + 9:start + 40].split()[0])
+        root = None
+        visited = set()
+        while position is not None and position not in visited:
+            visited.add(position)
+            if data.startswith(b'xref', position):
+                trailer_at = data.index(b'trailer', position)
+                self._read_table(data[position + 4:trailer_at].split())
+                trailer = data[trailer_at:data.find(b'startxref', trailer_at)]
+            else:
+                trailer = self._read_stream(position)
+            root = root or _value(trailer, b'/Root')
+            previous = _value(trailer, b'/Prev')
+            position = int(previous) if previous else None
+        if root is None:
+            raise ValueError('PDF without a document catalog')
+        self.root = int(root.split()[0])
+
+    def _read_table(self, tokens):
+        index = 0
+        while index + 1 < len(tokens):
+            first, count = int(tokens[index]), int(tokens[index + 1])
+            index += 2
+            for number in range(first, first + count):
+                offset, _, kind = tokens[index:index + 3]
+                index += 3
+                if kind == b'n' and number not in self._compressed:
+                    self._offsets.setdefault(number, int(offset))  # the newest update comes first
+
+    def _read_stream(self, position):
+        # A cross-reference stream (PDF 1.5, 7.5.8): its dictionary is the trailer
+        match = _OBJECT.match(self.data, position)
+        if match is None:
+            raise ValueError('cross-reference table not found')
+        self._offsets.setdefault(int(match.group(1)), position)
+        head, stream = self.object(int(match.group(1)))
+        if re.search(rb'/Type\s*/XRef\b', head) is None:
+            raise ValueError('cross-reference table not found')
+        widths = [int(width) for width in _value(head, b'/W')[1:-1].split()]
+        ranges = [int(value) for value in (_value(head, b'/Index') or b'[0 %s]' % _value(head, b'/Size'))[1:-1].split()]
+        rows = decode_stream(head, stream)
+        if len(rows) < sum(widths) * sum(ranges[1::2]):
+            raise ValueError('truncated cross-reference stream')
+        position = 0
+        for first, count in zip(ranges[::2], ranges[1::2]):
+            for number in range(first, first + count):
+                fields = []
+                for width in widths:
+                    fields.append(int.from_bytes(rows[position:position + width], 'big'))
+                    position += width
+                kind = fields[0] if widths[0] else 1
+                if number in self._offsets or number in self._compressed:
+                    continue  # the newest update comes first
+                if kind == 1:
+                    self._offsets[number] = fields[1]
+                elif kind == 2:
+                    self._compressed[number] = (fields[1], fields[2])
+        return head
+
+    def span(self, number):
+        """
+        Returns the position `(start, end)` of the body of top-level object `number` in the file: from
+        after `N 0 obj` up to `endobj`, stream included.
+        """
+
+        if number not in self._offsets:
+            raise ValueError(f'PDF object {number} is missing or inside an object stream')
+        match = _OBJECT.match(self.data, self._offsets[number])
+        if match is None or int(match.group(1)) != number:
+            raise ValueError(f'PDF object {number} is not where the cross-reference table says')
+        start = match.end()
+        end = self.data.index(b'endobj', start)
+        keyword = self.data.find(b'stream', start, end)
+        if keyword >= 0:
+            end = self.data.index(b'endobj', self._stream_start(self.data[start:keyword].strip(), keyword)[1])
+        return start, end
+
+    def spans(self):
+        """
+        Returns the positions `(start, end)` of the bodies of all top-level objects (see `span()`), by object number.
+        """
+
+        return {number: self.span(number) for number in self._offsets}
+
+    def _stream_start(self, head, keyword):
+        # Where the data of a stream starts, and where it ends according to /Length
+        length = _value(head, b'/Length')
+        length = int(self.object(int(length.split()[0]))[0]) if length.endswith(b'R') else int(length)
+        data_start = keyword + 6 + (2 if self.data.startswith(b'\r\n', keyword + 6) else 1)
+        return data_start, data_start + length
+
+    def object(self, number):
+        """
+        Returns object `number` as `(head, stream)`: the raw object (the dictionary of a stream) and the
+        raw stream data, or None if the object is not a stream.
+        """
+
+        if number in self._compressed:
+            return self._packed_object(*self._compressed[number]), None
+        start, end = self.span(number)
+        keyword = self.data.find(b'stream', start, end)
+        if keyword < 0:
+            return self.data[start:end].strip(), None
+        head = self.data[start:keyword].strip()
+        data_start, data_end = self._stream_start(head, keyword)
+        return head, self.data[data_start:data_end]
+
+    def _packed_object(self, container, index):
+        # Object `index` of an object stream (PDF 1.5, 7.5.7), each object stream decoded once
+        if container not in self._object_streams:
+            head, stream = self.object(container)
+            data = decode_stream(head, stream)
+            first = int(_value(head, b'/First'))
+            numbers = data[:first].split()
+            offsets = [first + int(offset) for offset in numbers[1::2]]
+            self._object_streams[container] = [data[start:end].strip() for start, end
+                                               in zip(offsets, offsets[1:] + [len(data)])]
+        objects = self._object_streams[container]
+        if index >= len(objects):
+            raise ValueError(f'PDF object stream {container} has no object {index}')
+        return objects[index]
+
+    def pages(self):
+        """
+        Returns the pages in order as `(number, inherited)` pairs, `inherited` holding the page
+        attributes set on the page tree above the page (resources, media box...).
+        """
+
+        pages = []
+        stack = [(int(_value(self.object(self.root)[0], b'/Pages').split()[0]), {})]
+        while stack:
+            number, inherited = stack.pop()
+            head, _ = self.object(number)
+            if re.search(rb'/Type\s*/Pages\b', head) is None:
+                pages.append((number, inherited))
+                continue
+            self.page_tree.add(number)
+            inherited = dict(inherited)
+            for key in _INHERITED:
+                value = _value(head, key)
+                if value is not None:
+                    inherited[key] = value
+            kids = [int(kid) for kid, _ in _REFERENCE.findall(_value(head, b'/Kids') or b'')]
+            stack.extend((kid, inherited) for kid in reversed(kids))
+        return pages
+
+    def page_contents(self):
+        """
+        Returns the object numbers of the content streams of all pages.
+        """
+
+        return {int(reference) for number, _ in self.pages()
+                for reference, _ in _REFERENCE.findall(_value(self.object(number)[0], b'/Contents') or b'')}
+
+
+class StreamingPdfWriter:
+    """
+    Writes a PDF to a file as it is built: each object is written as soon as it is added, and only the
+    object offsets, the page list and the bookmarks are kept, so documents of any size are written in
+    bounded memory. Objects marked as shared, and every object copied from another PDF except pages,
+    are written once and reused when an identical object is added again: fonts and logos shared by
+    merged invoices are stored once.
+    """
+
+    def __init__(self, file):
+        """
+        Args:
+        - `file` (file): A file opened for writing in binary mode.
+        """
+
+        self.file = file
+        self.pages = []
+        self._offsets = [0, None, None]  # 1 and 2 are the catalog and the page tree, written by `close()`
+        self._position = 0
+        self._shared = {}
+        self._fonts = None
+        self._images = {}
+        self._outlines = []
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def _write(self, data):
+        self.file.write(data)
+        self._position += len(data)
+
+    def _allocate(self):
+        self._offsets.append(None)
+        return len(self._offsets) - 1
+
+    def _put(self, number, body):
+        self._offsets[number] = self._position
+        self._write(b'%d 0 obj\n%s\nendobj\n' % (number, body))
+
+    def add(self, body, shared=False):
+        """
+        Writes an object and returns its number. A shared object identical to one already written is
+        not written again; the earlier number is returned.
+        """
+
+        if shared:
+            digest = hashlib.blake2b(body, digest_size=16).digest()
+            if digest in self._shared:
+                return self._shared[digest]
+        number = self._allocate()
+        self._put(number, body)
+        if shared:
+            self._shared[digest] = number
+        return number
+
+    def add_image(self, name, image):
+        """
+        Registers an image returned by `decode_png()` as an XObject named `name` for `add_page()`.
+        """
+
+        width, height, colors, pixels, alpha = image
+        smask = b''
+        if alpha is not None:
+            smask = b'/SMask %d 0 R ' % self.add(_image(alpha, width, height, b'/DeviceGray'), shared=True)
+        self._images[name] = self.add(
+            _image(pixels, width, height, b'/DeviceRGB' if colors == 3 else b'/DeviceGray', smask), shared=True)
+
+    def add_page(self, canvas, index=None):
+        """
+        Adds a page drawn on `canvas` at position `index` of the document (by default, at the end).
+        Returns the page's object number.
+        """
+
+        if self._fonts is None:
+            self._fonts = {name: self.add(_font(base_font), shared=True) for name, base_font in FONTS.values()}
+        content = self.add(_stream(zlib.compress(canvas.content())))
+        page = self.add(_page(content, self._fonts, {name: self._images[name] for name in canvas.images}))
+        self.pages.insert(len(self.pages) if index is None else index, page)
+        return page
+
+    def copy_pages(self, data):
+        """
+        Appends the pages of another PDF (see `PdfReader`).
+
+        Returns:
+        - `pages` (list): The object numbers of the copied pages.
+
+        Raises:
+        - `ValueError`: If the PDF cannot be read. Nothing has been written then.
+        """
+
+        reader = PdfReader(data)
+        pages = reader.pages()
+        mapping = {node: 2 for node in reader.page_tree}
+        reserved = set()
+        for number, _ in pages:
+            mapping[number] = self._allocate()
+            reserved.add(number)
+        try:
+            for number, inherited in pages:
+                self._copy(reader, number, mapping, reserved, dict(inherited), set())
+        except ValueError:
+            for number in reserved:  # pages not written: leave them out of the cross-reference table
+                self._offsets[mapping[number]] = 0
+            raise
+        copied = [mapping[number] for number, _ in pages]
+        self.pages.extend(copied)
+        return copied
+
+    def _copy(self, reader, number, mapping, reserved, inherited, active):
+        # Copies object `number` after everything it references, so identical objects are found
+        # identical once renumbered. Pages and objects in reference cycles keep a number given in advance.
+        if number in active or (number in mapping and number not in reserved):
+            if number not in mapping:
+                mapping[number] = self._allocate()
+                reserved.add(number)
+            return mapping[number]
+        active.add(number)
+        head, stream = reader.object(number)
+        for key, value in inherited.items():
+            if _value(head, key) is None:
+                head = head.rstrip()[:-2] + b' %s %s >>' % (key, value)
+        for reference in dict.fromkeys(int(match.group(1)) for match in _REFERENCE.finditer(head)):
+            self._copy(reader, reference, mapping, reserved, {}, active)
+        head = _REFERENCE.sub(lambda match: b'%d 0 R' % mapping[int(match.group(1))], head)
+        body = head if stream is None else b'%s\nstream\n%s\nendstream' % (head, stream)
+        active.discard(number)
+        if number in reserved:
+            reserved.discard(number)
+            self._put(mapping[number], body)
+        else:
+            mapping[number] = self.add(body, shared=True)
+        return mapping[number]
+
+    def add_outline(self, title, page):
+        """
+        Adds a bookmark to the page with object number `page`.
+        """
+
+        self._outlines.append((title, page))
+
+    def close(self):
+        """
+        Writes the page tree, the bookmarks, the catalog and the cross-reference table. Does not close the file.
+        """
+
+        self._put(2, b'<< /Type /Pages /Kids [%s] /Count %d >>'
+                  % (b' '.join(b'%d 0 R' % page for page in self.pages), len(self.pages)))
+        catalog = b'<< /Type /Catalog /Pages 2 0 R >>'
+        if self._outlines:
+            root = self._allocate()
+            items = [self._allocate() for _ in self._outlines]
+            for index, (title, page) in enumerate(self._outlines):
+                links = b''.join(b' /%s %d 0 R' % (key, items[index + step]) for key, step in ((b'Prev', -1), (b'Next', 1))
+                                 if 0 <= index + step < len(items))
+                self._put(items[index], b'<< /Title (%s) /Parent %d 0 R%s /Dest [%d 0 R /Fit] >>'
+                          % (_escape(title), root, links, page))
+            self._put(root, b'<< /Type /Outlines /First %d 0 R /Last %d 0 R /Count %d >>'
+                      % (items[0], items[-1], len(items)))
+            catalog = b'<< /Type /Catalog /Pages 2 0 R /Outlines %d 0 R /PageMode /UseOutlines >>' % root
+        self._put(1, catalog)
+
+        start = self._position
+        self._write(b'xref\n0 %d\n0000000000 65535 f \n' % len(self._offsets))
+        for number in range(1, len(self._offsets)):
+            offset = self._offsets[number]
+            self._write(b'%010d 00000 n \n' % offset if offset else b'0000000000 65535 f \n')
+        self._write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(self._offsets), start))
+
+
+def _unfilter(raw, stride, bytes_per_pixel):
+    # Reverses the PNG row filters (PNG 9.2): each row is a filter type byte followed by `stride` bytes
+    previous = bytearray(stride)
+    rows = []
+    for start in range(0, len(raw) - stride, stride + 1):
+        kind = raw[start]
+        row = bytearray(raw[start + 1:start + 1 + stride])
+        for i in range(stride):
+            left = row[i - bytes_per_pixel] if i >= bytes_per_pixel else 0
+            up = previous[i]
+            if kind == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif kind == 2:
+                row[i] = (row[i] + up) & 0xFF
+            elif kind == 3:
+                row[i] = (row[i] + ((left + up) >> 1)) & 0xFF
+            elif kind == 4:
+                upper_left = previous[i - bytes_per_pixel] if i >= bytes_per_pixel else 0
+                estimate = left + up - upper_left
+                distances = abs(estimate - left), abs(estimate - up), abs(estimate - upper_left)
+                predictor = left if distances[0] <= distances[1] and distances[0] <= distances[2] else (
+                    up if distances[1] <= distances[2] else upper_left)
+                row[i] = (row[i] + predictor) & 0xFF
+        rows.append(row)
+        previous = row
+    return b''.join(rows)
+
+
+def decode_stream(head, stream):
+    """
+    Decodes the data of a stream read by `PdfReader.object()`.
+
+    Args:
+    - `head` (bytes): The stream dictionary.
+    - `stream` (bytes): The raw stream data.
+
+    Returns:
+    - `data` (bytes): The decoded data.
+
+    Raises:
+    - `ValueError`: If the stream uses a filter other than Flate, or a predictor other than PNG's.
+    """
+
+    filters = re.findall(rb'/(\w+)', _value(head, b'/Filter') or b'')
+    if filters not in ([], [b'FlateDecode']):
+        raise ValueError(f'unsupported PDF stream filter: {b" ".join(filters).decode()}')
+    data = zlib.decompress(stream) if filters else stream
+    parameters = _value(head, b'/DecodeParms') or b''
+    predictor = int(_value(parameters, b'/Predictor') or 1)
+    if predictor == 1:
+        return data
+    if predictor < 10:
+        raise ValueError(f'unsupported PDF stream predictor: {predictor}')
+    bytes_per_pixel = max(1, int(_value(parameters, b'/Colors') or 1)
+                          * int(_value(parameters, b'/BitsPerComponent') or 8) // 8)
+    return _unfilter(data, int(_value(parameters, b'/Columns') or 1) * bytes_per_pixel, bytes_per_pixel)
+
+
+def decode_png(blob, level=-1):
+    """
+    Decodes a non-interlaced 8-bit PNG into compressed pixel and alpha planes for `PdfWriter.add_image()`.
+
+    Args:
+    - `blob` (bytes): The PNG file contents.
+    - `level` (int): The zlib compression level of the planes, 9 for the smallest.
+
+    Returns:
+    - `image` (tuple): `(width, height, colors, pixels, alpha)` where `pixels` and `alpha` are
+      Flate-compressed and `alpha` is None for images without an alpha channel.
+
+    Raises:
+    - `ValueError`: If the PNG uses a format this decoder does not handle.
+    """
+
+    if blob[:8] != b'\x89PNG\r\n\x1a\n':
+        raise ValueError('not a PNG image')
+    position = 8
+    idat = []
+    width = height = color_type = None
+    while position < len(blob):
+        length, kind = struct.unpack('>I4s', blob[position:position + 8])
+        data = blob[position + 8:position + 8 + length]
+        if kind == b'IHDR':
+            width, height, depth, color_type, _, _, interlace = struct.unpack('>IIBBBBB', data)
+            if depth != 8 or interlace or color_type not in (0, 2, 4, 6):
+                raise ValueError('unsupported PNG format')
+        elif kind == b'IDAT':
+            idat.append(data)
+        elif kind == b'IEND':
+            break
+        position += 12 + length
+
+    channels = {0: 1, 2: 3, 4: 2, 6: 4}[color_type]
+    pixels = _unfilter(zlib.decompress(b''.join(idat)), width * channels, channels)
+    colors = 3 if color_type in (2, 6) else 1
+    if color_type in (4, 6):
+        color = bytearray(width * height * colors)
+        for i in range(colors):
+            color[i::colors] = pixels[i::channels]
+        alpha = pixels[colors::channels]
+        return width, height, colors, zlib.compress(bytes(color), level), zlib.compress(alpha, level)
+    return width, height, colors, zlib.compress(pixels, level), None
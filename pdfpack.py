@@ -0,0 +1,144 @@
+""" Invoice packs: zip archives of invoice PDFs that store the objects invoices share, such as the logo, once. """
+import argparse
+import hashlib
+import json
+import os
+import sys
+import zipfile
+
+from pdf import PdfReader
+
+SHARED_MIN: int = 512
+RESOURCES_DIR: str = 'resources/'
+_MAGIC = b'%PDFPACK1 '
+
+
+def split_pdf(data):
+    """
+    Cuts the large objects out of a PDF, so that a pack stores them once for all its invoices: images,
+    embedded fonts... but not the page contents, which are the invoice's own. Only the object bodies are
+    cut, so the PDF is rebuilt byte for byte by `join_pdf()`.
+
+    Args:
+    - `data` (bytes): The PDF file contents.
+
+    Returns:
+    - `part` (bytes): The PDF without its large objects, behind a header that says where they go.
+    - `resources` (dict): The bodies cut out, by digest.
+    """
+
+    try:
+        reader = PdfReader(data)
+        contents = reader.page_contents()
+        spans = sorted(span for number, span in reader.spans().items() if number not in contents)
+    except (ValueError, IndexError):
+        spans = []  # not a PDF this reader handles: stored whole
+    resources, places, pieces, position, removed = {}, [], [], 0, 0
+    for start, end in spans:
+        if end - start < SHARED_MIN or start < position:
+            continue
+        digest = hashlib.blake2b(data[start:end], digest_size=20).hexdigest()
+        resources[digest] = data[start:end]
+        pieces.append(data[position:start])
+        places.append([start - removed, digest])
+        removed += end - start
+        position = end
+    pieces.append(data[position:])
+    return _MAGIC + json.dumps(places, separators=(',', ':')).encode() + b'\n' + b''.join(pieces), resources
+
+
+def join_pdf(part, resource):
+    """
+    Rebuilds a PDF cut by `split_pdf()`.
+
+    Args:
+    - `part` (bytes): The PDF without its large objects.
+    - `resource` (callable): Returns the body of a large object from its digest.
+
+    Returns:
+    - `data` (bytes): The PDF file contents.
+    """
+
+    if not part.startswith(_MAGIC):
+        return part
+    header_end = part.index(b'\n')
+    places = json.loads(part[len(_MAGIC):header_end])
+    data = part[header_end + 1:]
+    pieces, position = [], 0
+    for offset, digest in places:
+        pieces.append(data[position:offset])
+        pieces.append(resource(digest))
+        position = offset
+    pieces.append(data[position:])
+    return b''.join(pieces)
+
+
+class PackReader:
+    """
+    Reads the invoices of a pack written by `sinks.PackSink`. Each shared object is read once.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._archive = zipfile.ZipFile(path)
+        self._resources = {}
+
+    def names(self):
+        """
+        Returns the names of the invoices in the pack, in the order they were added.
+        """
+
+        return [name for name in self._archive.namelist() if not name.startswith(RESOURCES_DIR)]
+
+    def _resource(self, digest):
+        if digest not in self._resources:
+            self._resources[digest] = self._archive.read(RESOURCES_DIR + digest)
+        return self._resources[digest]
+
+    def read(self, name):
+        """
+        Returns the PDF file contents of invoice `name`.
+
+        Raises:
+        - `KeyError`: If the pack has no invoice `name`.
+        """
+
+        return join_pdf(self._archive.read(name), self._resource)
+
+    def close(self):
+        self._archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='List or extract the invoices of an invoice pack.')
+    arg_parser.add_argument('pack', help='the .pdfpack file')
+    arg_parser.add_argument('names', nargs='*', help='the invoices to extract (default: all)')
+    arg_parser.add_argument('--output', default='.', help='where to extract the invoices')
+    arg_parser.add_argument('--list', action='store_true', help='list the invoices instead of extracting them')
+    args = arg_parser.parse_args()
+
+    with PackReader(args.pack) as pack:
+        names = args.names or pack.names()
+        if args.list:
+            for name in names:
+                print(name)
+            return
+        os.makedirs(args.output, exist_ok=True)
+        for name in names:
+            try:
+                data = pack.read(name)
+            except KeyError:
+                sys.exit(f'{args.pack} has no invoice {name}')
+            with open(os.path.join(args.output, os.path.basename(name)), 'wb') as file:
+                file.write(data)
+        print(f'Extracted {len(names)} invoice(s) to {args.output}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+""" Invoice renderers: turn the invoice data built by `build_invoice()` into PDF bytes. """
+import os
+import tempfile
+import zipfile
+
+import metrics
+from pdf import Canvas, PdfWriter, decode_png
+from template import ITEM_TABLE_INDEX, break_page_before, fill_placeholders, get_template, repeat_header_row
+
+TEMPLATE_PATH: str = 'invoice_template.docx'
+_renderers: dict = {}
+
+
+def invoice_replacements(invoice):
+    """
+    Maps the template placeholders to their values for an invoice.
+
+    Args:
+    - `invoice` (dict): The invoice data built by `build_invoice()`.
+
+    Returns:
+    - `replacements` (dict): The value for each placeholder of `invoice_template.docx`.
+    """
+
+    business = invoice['business']
+    return {
+        "[Business Name]": business['business_name'],
+        "[Business Address]": business['business_street_address'],
+        "[Business City Province]": business['business_city_province'],
+        "[Business Email]": business['business_email_address'],
+        "[Business Contact]": business['business_contact'],
+        "[Date]": invoice['date_time'],
+        "[Partner]": invoice['cx_name'],
+        "[Partner Street]": invoice['cx_street'],
+        "[Partner City]": invoice['cx_city'],
+        "[Partner Province]": invoice['cx_province'],
+        "[Partner Postal]": invoice['cx_postal'],
+        "[Invoice Number]": invoice['invoice_number'],
+        "[Tax]": invoice['tax_rate'],
+        "[Recipient]": business['business_payment_recipient'],
+        "[Bank]": business['business_payment_bank'],
+        "[IBAN]": business['business_payment_iban'],
+        "[BIC]": business['business_payment_bic'],
+        "[Subtotal]": invoice['subtotal'],
+        "[Total Tax]": invoice['total_tax'],
+        "[Balance Due]": invoice['balance_due']
+    }
+
+
+class DocxRenderer:
+    """
+    Fills `invoice_template.docx` and converts it to PDF with `docx2pdf`, which needs Microsoft Word.
+    Long item tables are split into pages like the native renderer does: the header row repeats on
+    every page and each full page ends with the subtotal carried forward.
+    """
+
+    name = 'docx'
+
+    def __init__(self, template_path=TEMPLATE_PATH):
+        self.template_path = template_path
+
+    def render(self, invoice, path):
+        """
+        Renders `invoice` to the PDF file at `path`.
+
+        Args:
+        - `invoice` (dict): The invoice data built by `build_invoice()`.
+        - `path` (str): Where to write the PDF.
+        """
+
+        with open(path, 'wb') as file:
+            file.write(self.render_bytes(invoice))
+
+    @metrics.timed('render')
+    def render_bytes(self, invoice):
+        """
+        Renders `invoice` and returns the PDF file contents. `docx2pdf` only converts files, so the
+        filled document goes through a private temporary directory that is removed afterwards;
+        concurrent renders never share a file name.
+
+        Args:
+        - `invoice` (dict): The invoice data built by `build_invoice()`.
+        """
+
+        with tempfile.TemporaryDirectory(prefix='invoice-') as temp_dir:
+            docx_path = os.path.join(temp_dir, 'invoice.docx')
+            pdf_path = os.path.join(temp_dir, 'invoice.pdf')
+            self.build_document(invoice).save(docx_path)
+            convert_to_pdf(docx_path, pdf_path)
+            with open(pdf_path, 'rb') as file:
+                return file.read()
+
+    def build_document(self, invoice):
+        """
+        Fills a copy of the template with `invoice`, item rows first (see `add_item_rows()`), then
+        the placeholders.
+
+        Args:
+        - `invoice` (dict): The invoice data built by `build_invoice()`.
+
+        Returns:
+        - `doc` (docx.Document): The filled document.
+        """
+
+        template = get_template(self.template_path)
+        doc = template.new_document()
+        paragraphs = template.placeholder_paragraphs(doc)
+        add_item_rows(template, doc.tables[ITEM_TABLE_INDEX], invoice)
+        fill_placeholders(paragraphs, invoice_replacements(invoice))
+        return doc
+
+
+@metrics.timed('convert')
+def convert_to_pdf(docx_path, pdf_path):
+    """
+    Converts the .docx file at `docx_path` to PDF at `pdf_path` with `docx2pdf` (Microsoft Word).
+    """
+
+    from docx2pdf import convert
+
+    convert(docx_path, pdf_path)
+
+
+def add_item_rows(template, table, invoice):
+    """
+    Adds the line items of `invoice` to the item table of a document built from `template`, in a single
+    pass and in cart order, each row after the previous one. The header row repeats on every page and
+    each full page ends with the subtotal carried forward.
+
+    Args:
+    - `template` (CompiledTemplate): The template the document was built from.
+    - `table` (docx.table.Table): The item table of the document.
+    - `invoice` (dict): The invoice data built by `build_invoice()`.
+    """
+
+    previous = table.rows[0]._tr
+    repeat_header_row(previous)
+
+    page_rows = FIRST_PAGE_ROWS
+    for index, line in enumerate(invoice['lines']):
+        row = template.new_text_row(line)
+        if index == page_rows:
+            carried = template.new_text_row((CARRIED_FORWARD, '', '', invoice['running_subtotals'][index - 1]),
+                                            bold=True)
+            previous.addnext(carried)
+            previous = carried
+            break_page_before(row)
+            page_rows += PAGE_ROWS
+        previous.addnext(row)
+        previous = row
+
+
+# Layout of invoice_template.docx in points, measured from the top-left corner of a US Letter page.
+BLUE = (0, 176, 240)
+GREY = (242, 242, 242)
+RULE = (191, 191, 191)
+NAVY = (31, 56, 100)
+SLATE = (51, 63, 79)
+GREEN = (216, 232, 208)
+WHITE = (255, 255, 255)
+COLUMNS = (22.1, 169.9, 308.2, 446.4, 589.4)
+HEADINGS = ('DESCRIPTION', 'QUANTITY', 'AMOUNT', 'TOTAL')
+TABLE_TOP: float = 361.4
+CONTINUED_TABLE_TOP: float = 60.0
+HEADER_HEIGHT: float = 13.9
+ROW_HEIGHT: float = 14.9
+LAST_ROW_HEIGHT: float = 16.8
+TOTALS_HEIGHT: float = 232.0
+PAGE_BOTTOM: float = 715.0
+FOOTER_TOP: float = 729.6
+FIRST_PAGE_ROWS: int = int((PAGE_BOTTOM - TABLE_TOP - HEADER_HEIGHT) / ROW_HEIGHT) - 1
+PAGE_ROWS: int = int((PAGE_BOTTOM - CONTINUED_TABLE_TOP - HEADER_HEIGHT) / ROW_HEIGHT) - 1
+CARRIED_FORWARD: str = 'Subtotal carried forward'
+TOTALS = ('SUBTOTAL', 'DISCOUNT', 'SUBTOTAL LESS DISCOUNT', 'TAX RATE', 'TOTAL TAX', 'SHIPPING/HANDLING')
+
+
+class PdfRenderer:
+    """
+    Writes the invoice PDF directly from the invoice data, following the layout of
+    `invoice_template.docx`. Pure Python, so it runs anywhere without Microsoft Word.
+    Line items that do not fit on the first page continue on further pages with the
+    table header repeated, and each full page ends with the subtotal carried forward.
+    """
+
+    name = 'pdf'
+    compact = False
+
+    def __init__(self, template_path=TEMPLATE_PATH):
+        self.template_path = template_path
+        self._logo = None
+
+    def logo(self):
+        """
+        Returns the decoded logo of the template, read from the .docx once.
+        """
+
+        if self._logo is None:
+            with zipfile.ZipFile(self.template_path) as package:
+                images = sorted(name for name in package.namelist()
+                                if name.startswith('word/media/') and name.endswith('.png'))
+                self._logo = decode_png(package.read(images[0]), 9 if self.compact else -1) if images else False
+        return self._logo
+
+    def render(self, invoice, path):
+        """
+        Renders `invoice` to the PDF file at `path`.
+
+        Args:
+        - `invoice` (dict): The invoice data built by `build_invoice()`.
+        - `path` (str): Where to write the PDF.
+        """
+
+        with open(path, 'wb') as file:
+            file.write(self.render_bytes(invoice))
+
+    @metrics.timed('render')
+    def render_bytes(self, invoice):
+        """
+        Renders `invoice` and returns the PDF file contents.
+
+        Args:
+        - `invoice` (dict): The invoice data built by `build_invoice()`.
+        """
+
+        writer = PdfWriter(self.compact)
+        logo = self.logo()
+        if logo:
+            writer.add_image('Logo', logo)
+
+        canvas = Canvas(self.compact)
+        self._draw_header(canvas, invoice, bool(logo))
+        top = self._draw_table_header(canvas, TABLE_TOP)
+        page_rows = FIRST_PAGE_ROWS
+        for index, line in enumerate(invoice['lines']):
+            if index == page_rows:
+                carried = (CARRIED_FORWARD, '', '', invoice['running_subtotals'][index - 1])
+                self._draw_row(canvas, top, ROW_HEIGHT, carried, font='bold')
+                writer.add_page(canvas)
+                canvas = self._continued_page()
+                top = self._draw_table_header(canvas, CONTINUED_TABLE_TOP)
+                page_rows += PAGE_ROWS
+            top = self._draw_row(canvas, top, ROW_HEIGHT, line)
+        top = self._draw_row(canvas, top, LAST_ROW_HEIGHT, ('', '', '', ''))
+
+        if top + TOTALS_HEIGHT > FOOTER_TOP:
+            writer.add_page(canvas)
+            canvas = self._continued_page()
+            top = CONTINUED_TABLE_TOP
+        self._draw_totals(canvas, top, invoice)
+        writer.add_page(canvas)
+        return writer.tobytes()
+
+    def _continued_page(self):
+        canvas = Canvas(self.compact)
+        canvas.rect(22.1, 19.7, 571.7, 14.9, BLUE)
+        canvas.rect(27.8, FOOTER_TOP, 575.2, 15.4, BLUE)
+        return canvas
+
+    @staticmethod
+    def _draw_header(canvas, invoice, logo):
+        business = invoice['business']
+        canvas.rect(22.1, 19.7, 571.7, 14.9, BLUE)
+        canvas.rect(22.1, 34.6, 571.7, 181.4, GREY)
+        canvas.rect(27.8, FOOTER_TOP, 575.2, 15.4, BLUE)
+        if logo:
+            canvas.image('Logo', 45.6, 69.6, 53.0, 53.0)
+
+        canvas.text(99.4, 64.8, business['business_name'])
+        canvas.text(99.4, 85.0, business['business_street_address'])
+        canvas.text(99.4, 99.4, business['business_city_province'])
+        canvas.text(99.4, 123.8, business['business_email_address'])
+        canvas.text(99.4, 138.7, business['business_contact'])
+
+        canvas.text(501.0, 104.2, 'INVOICE', size=20, align='center')
+        canvas.rect(421.4, 143.0, 159.4, 3.9, WHITE)
+        canvas.text(423.4, 159.4, f"DATE: {invoice['date_time']}")
+        canvas.line(421.4, 164.6, 580.8, 164.6, RULE)
+        canvas.text(423.4, 193.4, f"INVOICE NO. {invoice['invoice_number']}")
+        canvas.line(421.4, 198.7, 580.8, 198.7, RULE)
+
+        canvas.text(579.4, 242.4, '*Payment due in 10 days', size=9, font='italic', color=(64, 64, 64), align='right')
+        canvas.text(24.0, 260.2, 'BILL TO', size=9, font='bold', color=NAVY)
+        canvas.line(22.1, 265.4, 260.6, 265.4, RULE)
+        canvas.text(285.1, 260.2, 'Payment Details', size=9, font='bold', color=NAVY)
+        canvas.line(283.2, 265.4, 589.0, 265.4, RULE)
+
+        canvas.text(24.0, 277.0, invoice['cx_name'])
+        canvas.text(24.0, 292.3, invoice['cx_street'])
+        canvas.text(24.0, 307.2, f"{invoice['cx_city']}, {invoice['cx_province']} {invoice['cx_postal']}")
+        for baseline, key in zip((278.0, 292.3, 307.2, 321.6), ('business_payment_recipient', 'business_payment_bank',
+                                                               'business_payment_iban', 'business_payment_bic')):
+            canvas.text(285.1, baseline, business[key])
+
+    @staticmethod
+    def _draw_table_header(canvas, top):
+        canvas.rect(COLUMNS[0], top, COLUMNS[-1] - COLUMNS[0], HEADER_HEIGHT, BLUE)
+        for left, right, heading in zip(COLUMNS, COLUMNS[1:], HEADINGS):
+            canvas.text((left + right) / 2, top + 9.2, heading, size=9, font='bold', color=WHITE, align='center')
+        for x in COLUMNS:
+            canvas.line(x, top, x, top + HEADER_HEIGHT, width=0.5)
+        canvas.line(COLUMNS[0], top, COLUMNS[-1], top, width=0.5)
+        canvas.line(COLUMNS[0], top + HEADER_HEIGHT, COLUMNS[-1], top + HEADER_HEIGHT, width=0.5)
+        return top + HEADER_HEIGHT
+
+    @staticmethod
+    def _draw_row(canvas, top, height, line, font='regular'):
+        bottom = top + height
+        for left, value in zip(COLUMNS, line):
+            canvas.text(left + 5.8, top + 11.0, value, font=font)
+        for x in COLUMNS:
+            canvas.line(x, top, x, bottom, width=0.5)
+        canvas.line(COLUMNS[0], bottom, COLUMNS[-1], bottom, width=0.5)
+        return bottom
+
+    @staticmethod
+    def _draw_totals(canvas, top, invoice):
+        values = (invoice['subtotal'], '0.00', invoice['subtotal'], f"{invoice['tax_rate']}%",
+                  invoice['total_tax'], '0.00')
+        canvas.text(47.5, top + 59.0, 'Remarks / Payment Instructions:', size=10)
+        for index, (label, value) in enumerate(zip(TOTALS, values)):
+            baseline = top + 51.4 + index * 26.9
+            canvas.text(434.4, baseline, label, size=8, font='bold', color=SLATE, align='right')
+            canvas.text(587.5, baseline, value, align='right')
+            if index < 5:
+                canvas.line(436.8, top + 64.8 + index * 26.9, 589.4, top + 64.8 + index * 26.9, RULE)
+
+        canvas.rect(436.8, top + 199.7, 152.6, 31.7, GREEN)
+        canvas.line(330.7, top + 199.7, 589.4, top + 199.7, (38, 38, 38), width=1)
+        canvas.line(436.8, top + 231.4, 589.4, top + 231.4, (38, 38, 38), width=1)
+        canvas.text(434.4, top + 218.4, 'Balance Due', size=13, font='bold', color=SLATE, align='right')
+        canvas.text(587.5, top + 218.4, invoice['balance_due'], align='right')
+
+
+class CompactPdfRenderer(PdfRenderer):
+    """
+    The native renderer writing compact PDF 1.5 files (see `PdfWriter`): the same pages in about a
+    tenth less space. Most of an invoice is the template's logo, which an invoice pack (`.pdfpack`
+    output, see `pdfpack.py`) stores once for all invoices.
+    """
+
+    name = 'pdf-compact'
+    compact = True
+
+
+RENDERERS: dict = {'pdf': PdfRenderer, 'pdf-compact': CompactPdfRenderer, 'docx': DocxRenderer}
+
+
+def get_renderer(name='pdf'):
+    """
+    Returns the renderer registered under `name`, created once per process.
+
+    Args:
+    - `name` (str): 'pdf' for the native renderer, 'pdf-compact' for its compact output, or 'docx' for the
+      Word template with `docx2pdf`.
+
+    Raises:
+    - `ValueError`: If no renderer is registered under `name`.
+    """
+
+    if name not in RENDERERS:
+        raise ValueError(f'Unknown renderer "{name}" (choose from: {", ".join(RENDERERS)})')
+    if name not in _renderers:
+        _renderers[name] = RENDERERS[name]()
+    return _renderers[name]
@@ -0,0 +1,196 @@
+""" Streaming sales reports over the sales ledger or sales_data.csv. """
+import argparse
+import ast
+import csv
+import os
+import sqlite3
+import time
+from collections import Counter
+
+from tabulate import tabulate
+
+from ledger import LEDGER_PATH, format_cents
+
+BATCH_SIZE: int = 5000
+
+
+def parse_cents(amount):
+    """
+    Converts a money string with two decimals (' 20.52', '$ 198.72') to integer cents without going
+    through float or Decimal.
+    """
+
+    whole, _, fraction = amount.replace('$', '').strip().partition('.')
+    return int(whole or 0) * 100 + int((fraction + '00')[:2])
+
+
+def read_csv_sales(path, batch_size=BATCH_SIZE):
+    """
+    Streams the sales of a `sales_data.csv` file in batches, decoding the repr-encoded `cx_address`
+    and `cart` columns.
+
+    Yields:
+    - `batch` (list): `(day, province, total_cents, lines)` tuples, where `day` is 'YYYY-MM-DD' and
+      `lines` holds `(service, unit_cents, quantity)` tuples.
+    """
+
+    with open(path, 'r', newline='') as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        batch = []
+        for _, date_time, _, cx_address, cart, total in reader:
+            day = f'{date_time[6:10]}-{date_time[0:2]}-{date_time[3:5]}'
+            province = ast.literal_eval(cx_address).get('cx_province', '')
+            lines = [(service, parse_cents(str(price)), int(quantity))
+                     for service, price, quantity in ast.literal_eval(cart)]
+            batch.append((day, province, parse_cents(total), lines))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def read_ledger_sales(path, batch_size=BATCH_SIZE):
+    """
+    Streams the sales of the SQLite ledger in batches, in the same shape as `read_csv_sales()`.
+    """
+
+    connection = sqlite3.connect(path)
+    try:
+        cursor = connection.execute(
+            "SELECT invoices.invoice_number, substr(sold_at, 1, 10), json_extract(cx_address, '$.cx_province'), "
+            'total_cents, service, unit_cents, quantity '
+            'FROM invoices LEFT JOIN line_items ON line_items.invoice_number = invoices.invoice_number '
+            'ORDER BY invoices.invoice_number, position')
+        batch = []
+        current = None
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for invoice_number, day, province, total_cents, service, unit_cents, quantity in rows:
+                if invoice_number != current:
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+                    current = invoice_number
+                    batch.append((day, province or '', total_cents, []))
+                if service is not None:
+                    batch[-1][3].append((service, unit_cents, quantity))
+        if batch:
+            yield batch
+    finally:
+        connection.close()
+
+
+class SalesReport:
+    """
+    Aggregates sales in integer cents. Memory use depends on the number of services, days and
+    provinces, not on the number of sales.
+    """
+
+    def __init__(self):
+        self.by_service = Counter()
+        self.by_day = Counter()
+        self.by_month = Counter()
+        self.by_province = Counter()
+        self.invoices = 0
+        self.items = 0
+        self.revenue = 0
+        self.tax = 0
+
+    def add_batch(self, batch):
+        """
+        Adds a batch of sales as yielded by `read_csv_sales()` or `read_ledger_sales()`.
+        """
+
+        by_service = {}
+        by_day = {}
+        by_province = {}
+        items = revenue = tax = 0
+        for day, province, total_cents, lines in batch:
+            subtotal = 0
+            for service, unit_cents, quantity in lines:
+                amount = unit_cents * quantity
+                subtotal += amount
+                items += quantity
+                by_service[service] = by_service.get(service, 0) + amount
+            revenue += subtotal
+            tax += total_cents - subtotal
+            by_day[day] = by_day.get(day, 0) + subtotal
+            by_province[province] = by_province.get(province, 0) + subtotal
+
+        self.by_service.update(by_service)
+        self.by_day.update(by_day)
+        self.by_province.update(by_province)
+        for day, amount in by_day.items():
+            self.by_month[day[:7]] += amount
+        self.invoices += len(batch)
+        self.items += items
+        self.revenue += revenue
+        self.tax += tax
+
+    def print(self, daily=False):
+        """
+        Prints the report tables.
+        """
+
+        def table(title, counter, key=None):
+            rows = sorted(counter.items(), key=key or (lambda row: row[0]))
+            print('')
+            print(tabulate([(name, format_cents(cents)) for name, cents in rows], [title, 'Revenue'],
+                           tablefmt='heavy_grid', colalign=('left', 'right'), disable_numparse=True))
+
+        table('Service', self.by_service, key=lambda row: -row[1])
+        table('Month', self.by_month)
+        if daily:
+            table('Day', self.by_day)
+        table('Province', self.by_province)
+
+        invoices = max(self.invoices, 1)
+        print('')
+        print(f'Invoices         : {self.invoices}')
+        print(f'Revenue          : $ {format_cents(self.revenue)}')
+        print(f'Tax collected    : $ {format_cents(self.tax)}')
+        print(f'Average cart     : {self.items / invoices:.2f} items, $ {format_cents(self.revenue // invoices)}')
+
+
+def run_report(source, daily=False, batch_size=BATCH_SIZE):
+    """
+    Builds and prints the sales report for `source` (a ledger database or a sales_data.csv file).
+
+    Returns:
+    - `report` (SalesReport): The aggregated report.
+    """
+
+    reader = read_csv_sales if source.lower().endswith('.csv') else read_ledger_sales
+    report = SalesReport()
+    start = time.perf_counter()
+    for batch in reader(source, batch_size):
+        report.add_batch(batch)
+    elapsed = time.perf_counter() - start
+
+    report.print(daily)
+    rate = report.invoices / elapsed if elapsed > 0 else 0.0
+    print(f'Processed        : {report.invoices} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)')
+    return report
+
+
+def main():
+    """
+    Command line entry point: `python reports.py [source] [--daily]`.
+    """
+
+    arg_parser = argparse.ArgumentParser(description='Sales reports by service, month, day and province.')
+    arg_parser.add_argument('source', nargs='?', default=None,
+                            help=f'ledger database or sales_data.csv (default: {LEDGER_PATH} if present)')
+    arg_parser.add_argument('--daily', action='store_true', help='include revenue by day')
+    args = arg_parser.parse_args()
+
+    source = args.source or (LEDGER_PATH if os.path.isfile(LEDGER_PATH) else 'sales_data.csv')
+    run_report(source, args.daily)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+""" Invoice reprints: the stored PDF, or one rendered again from the sales ledger through a cache of rendered PDFs. """
+import argparse
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from configparser import ConfigParser
+
+from ledger import LEDGER_PATH, get_ledger
+from pdf import is_complete
+from project import build_invoice
+from renderers import TEMPLATE_PATH, get_renderer
+from sinks import INVOICES_DIR, open_sink
+from template import get_template
+
+CACHE_DIR: str = 'reprint_cache'
+CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+_STATS_FILE: str = 'stats.json'
+
+
+def invoice_key(invoice, renderer_name, template_digest):
+    """
+    Returns the content address of a rendered invoice: a SHA-256 over everything the PDF depends on,
+    i.e. the template, the renderer and the invoice data (invoice number, business data, customer and
+    cart). Any change to one of them gives a new key, so stale PDFs are never served.
+
+    Args:
+    - `invoice` (dict): The invoice data built by `build_invoice()`.
+    - `renderer_name` (str): The renderer used.
+    - `template_digest` (str): The SHA-256 of the template file.
+    """
+
+    content = json.dumps([template_digest, renderer_name, invoice], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class ReprintCache:
+    """
+    Rendered PDFs stored under their content address in a directory, evicted least recently used
+    first once the cache grows beyond `max_bytes`. Recency is kept in the file modification times,
+    so it carries over between runs. Hits, misses and bytes served from the cache are kept in
+    `stats.json`.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        """
+        Args:
+        - `directory` (str): The cache directory, created if missing.
+        - `max_bytes` (int): The size limit of the cache.
+        """
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        entries = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith('.pdf'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, entry.name[:-4], stat.st_size))
+        self._entries = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self.size = sum(self._entries.values())
+
+        self.stats = {'hits': 0, 'misses': 0, 'bytes_saved': 0}
+        try:
+            with open(os.path.join(directory, _STATS_FILE)) as file:
+                self.stats.update(json.load(file))
+        except (OSError, ValueError):
+            pass
+
+    def get(self, key):
+        """
+        Returns the cached PDF for `key` and marks it as recently used, or None on a miss.
+        """
+
+        if key not in self._entries:
+            self.stats['misses'] += 1
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            self.size -= self._entries.pop(key)
+            self.stats['misses'] += 1
+            return None
+        os.utime(path)
+        self._entries.move_to_end(key)
+        self.stats['hits'] += 1
+        self.stats['bytes_saved'] += len(data)
+        return data
+
+    def put(self, key, data):
+        """
+        Stores a rendered PDF under `key`, then evicts the least recently used PDFs over the size limit.
+        """
+
+        temp_path = f'{self._path(key)}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, self._path(key))
+        self.size += len(data) - self._entries.pop(key, 0)
+        self._entries[key] = len(data)
+
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            old_key, old_size = self._entries.popitem(last=False)
+            try:
+                os.remove(self._path(old_key))
+            except FileNotFoundError:
+                pass
+            self.size -= old_size
+
+    def __len__(self):
+        return len(self._entries)
+
+    def hit_rate(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+    def save_stats(self):
+        with open(os.path.join(self.directory, _STATS_FILE), 'w') as file:
+            json.dump(self.stats, file)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.pdf')
+
+
+def reprint(invoice_number, cache, ledger_path=LEDGER_PATH, invoices_dir=INVOICES_DIR):
+    """
+    Returns the PDF of an invoice already issued. No new invoice number is used and nothing is recorded.
+
+    The PDF stored in `invoices_dir` when the sale was made is served as it is. If it is missing or
+    damaged, the invoice is rendered again from its ledger record, with the business data and renderer
+    recorded at the time of the sale, so later changes to `config.ini` do not change a reprint. Only
+    sales recorded without them fall back to the current `config.ini`. Rendered PDFs are served from
+    `cache` when the template and sale are unchanged, and cached otherwise.
+
+    Args:
+    - `invoice_number` (str): The invoice number, e.g. '000042'.
+    - `cache` (ReprintCache): The cache of rendered PDFs.
+    - `ledger_path` (str): The sales ledger.
+    - `invoices_dir` (str): The directory the invoices were written to.
+
+    Returns:
+    - `data` (bytes): The PDF file contents.
+    - `source` (str): 'stored', 'cache' or 'rendered'.
+
+    Raises:
+    - `KeyError`: If no sale is recorded under `invoice_number`.
+    """
+
+    sale = get_ledger(ledger_path).get(invoice_number)
+    if sale is None:
+        raise KeyError(f'Invoice {invoice_number} not found in {ledger_path}')
+    try:
+        with open(os.path.join(invoices_dir, f'{invoice_number}.pdf'), 'rb') as file:
+            data = file.read()
+        if is_complete(data):
+            return data, 'stored'
+    except OSError:
+        pass
+
+    business, renderer_name = sale['business'], sale['renderer']
+    if business is None or renderer_name is None:
+        parser = ConfigParser()
+        parser.read('./config.ini')
+        business = business or dict(parser['business_data'])
+        renderer_name = renderer_name or parser.get('settings', 'renderer', fallback='pdf')
+    invoice = build_invoice(sale['invoice_number'], sale['date_time'], business, sale['cx_name'], sale['cx_address'],
+                            sale['cart'])
+    key = invoice_key(invoice, renderer_name, get_template(TEMPLATE_PATH).digest)
+
+    data = cache.get(key)
+    if data is not None:
+        return data, 'cache'
+    data = get_renderer(renderer_name).render_bytes(invoice)
+    cache.put(key, data)
+    return data, 'rendered'
+
+
+def main():
+    """
+    Command line entry point: `python reprint.py 000042 [000043 ...] [--output DIR|FILE.zip]`.
+    """
+
+    arg_parser = argparse.ArgumentParser(description='Reprint invoices already issued.')
+    arg_parser.add_argument('invoice_numbers', nargs='+')
+    arg_parser.add_argument('--output', default='reprints',
+                            help='directory, .zip or .tar archive for the PDFs (default: reprints/)')
+    arg_parser.add_argument('--cache-mb', type=int, default=CACHE_MAX_BYTES // (1024 * 1024),
+                            help='size limit of the reprint cache in MB')
+    args = arg_parser.parse_args()
+
+    cache = ReprintCache(max_bytes=args.cache_mb * 1024 * 1024)
+    with open_sink(args.output) as sink:
+        for invoice_number in args.invoice_numbers:
+            try:
+                data, source = reprint(invoice_number.zfill(6), cache)
+            except KeyError as e:
+                print(f'❌ {e.args[0]}')
+                continue
+            location = sink.write(f'{invoice_number.zfill(6)}.pdf', data)
+            print(f'✅ {location} ({source})')
+    cache.save_stats()
+
+    print('')
+    print(f'Cache hit rate   : {cache.hit_rate():.1%} ({cache.stats["hits"]} hits, {cache.stats["misses"]} misses)')
+    print(f'Bytes saved      : {cache.stats["bytes_saved"]:,}')
+    print(f'Cache size       : {cache.size:,} of {cache.max_bytes:,} bytes, {len(cache)} PDFs')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,449 @@
+""" Local HTTP invoice service (stdlib asyncio) for POS terminals and the web shop. """
+import argparse
+import asyncio
+import collections
+import datetime as dt
+import json
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from configparser import ConfigParser
+from http import HTTPStatus
+
+import metrics
+from allocator import InvoiceNumberAllocator
+from batch import _init_worker, build_cart, build_order, render_job
+from catalog import get_catalog
+from journal import get_journal, sale_record
+from ledger import format_cents
+from sinks import INVOICES_DIR, DirectorySink, open_sink
+
+HOST: str = '127.0.0.1'
+PORT: int = 8080
+BATCH_SIZE: int = 16
+BATCH_WINDOW: float = 0.002
+MAX_BODY: int = 1 << 20
+
+
+class HttpError(Exception):
+    """
+    An error answered to the client with `status` and a JSON `{"error": message}` body.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def render_batch(jobs):
+    """
+    Renders a micro-batch of invoices in a worker process. Returns the `render_job()` result of each job.
+    """
+
+    return [render_job(job) for job in jobs]
+
+
+class InvoiceService:
+    """
+    Serves `POST /price` and `POST /invoice` over HTTP/1.1 with keep-alive, and `GET /metrics` in the
+    Prometheus text format when metrics are enabled (see `metrics.py`).
+
+    Prices are computed in the event loop. Invoices are validated in the event loop too, then queued:
+    concurrent requests are gathered into micro-batches of up to `batch_size` invoices, waiting at most
+    `batch_window` seconds for a batch to fill, and each batch is numbered and rendered by one task of
+    the worker pool. Up to one batch per worker is rendered at a time. Sales are appended to the
+    checkout journal in invoice-number order as batches complete; once a batch's sales are committed,
+    its PDFs are written to the sink, also in invoice-number order, and its requests answered.
+
+    Invoice numbers stay gap-free: requests cancelled before their batch is formed get no number, and
+    the numbers of invoices that fail to render go to the next invoices rendered, which are rendered
+    again with the lower number. Numbers left over when the service closes are given back.
+    """
+
+    def __init__(self, workers=None, batch_size=BATCH_SIZE, batch_window=BATCH_WINDOW, output=INVOICES_DIR):
+        """
+        Args:
+        - `workers` (int): Number of rendering processes (default: the number of CPUs).
+        - `batch_size` (int): The largest micro-batch sent to a worker.
+        - `batch_window` (float): How long to wait for a micro-batch to fill, in seconds.
+        - `output` (str): Directory or `.zip` / `.tar` archive where invoices are also stored, or None.
+        """
+
+        parser = ConfigParser()
+        parser.read('./config.ini')
+        self.business = dict(parser['business_data'])
+        self.renderer_name = parser.get('settings', 'renderer', fallback='pdf')
+        get_catalog()  # loaded now, then reloaded in the background when services_list.csv changes
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.allocator = InvoiceNumberAllocator(lease=batch_size * 4)
+        self.sink = open_sink(output) if output else None
+        self.journal = get_journal()
+        self.workers = workers or os.cpu_count()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        initargs=(self.renderer_name,))
+        self.server = None
+        self.batches = 0
+        self._queue = None
+        self._batcher = None
+        self._numbers = collections.deque()  # handed out by the allocator, not yet used by a sale
+
+    async def start(self, host=HOST, port=PORT):
+        """
+        Starts listening on `host:port` and returns the asyncio server.
+        """
+
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._run_batches())
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server
+
+    async def close(self):
+        """
+        Stops accepting connections, then releases the worker pool, the sink and unused invoice numbers.
+        """
+
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+        self.pool.shutdown()
+        if self.sink is not None:
+            self.sink.close()
+        self.allocator.give_back(len(self._numbers))
+        self._numbers.clear()
+        self.allocator.release()
+
+    def price(self, payload):
+        """
+        Prices a cart against the catalog.
+
+        Args:
+        - `payload` (dict): `{"cart": ["Service xQuantity", ...]}`.
+
+        Returns:
+        - `quote` (dict): The priced lines with the subtotal, tax and total.
+        """
+
+        try:
+            cart = build_cart(payload.get('cart') or [], get_catalog())
+        except ValueError as e:
+            raise HttpError(HTTPStatus.BAD_REQUEST, str(e))
+        return {
+            'lines': [{'service': item.service, 'price': item.price.strip(), 'quantity': item.quantity,
+                       'amount': format_cents(item.amount_cents)} for item in cart],
+            'subtotal': cart.subtotal,
+            'tax_rate': f'{cart.tax_rate:.2f}',
+            'tax': cart.tax,
+            'total': cart.total
+        }
+
+    async def invoice(self, payload):
+        """
+        Creates an invoice for an order, in the format of a `batch.py` JSONL line.
+
+        Returns:
+        - `invoice_number` (str): The invoice number.
+        - `total` (str): The balance due.
+        - `data` (bytes): The PDF file contents.
+        """
+
+        try:
+            cx_name, cx_address, cart = build_order(payload, get_catalog())
+        except ValueError as e:
+            raise HttpError(HTTPStatus.BAD_REQUEST, str(e))
+        date_time = dt.datetime.today().strftime('%m-%d-%Y') + ' ' + dt.datetime.now().strftime('%I:%M %p')
+        job = (None, date_time, self.business, cx_name, cx_address, cart, self.renderer_name)
+
+        done = asyncio.get_running_loop().create_future()
+        await self._queue.put((job, done))
+        return await done
+
+    async def _run_batches(self):
+        loop = asyncio.get_running_loop()
+        rendering = asyncio.Semaphore(self.workers)
+        tasks = set()
+        previous = None
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                deadline = loop.time() + self.batch_window
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), deadline - loop.time()))
+                    except TimeoutError:
+                        break
+                batch = [(job, done) for job, done in batch if not done.cancelled()]
+                if not batch:
+                    continue
+                batch = [((self.allocator.next(),) + job[1:], done) for job, done in batch]
+                self._numbers.extend(job[0] for job, _ in batch)
+
+                await rendering.acquire()
+                steps = (loop.create_future(), loop.create_future())
+                task = asyncio.create_task(self._run_batch(batch, rendering, previous, steps))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                previous = steps
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _run_batch(self, batch, rendering, previous, steps):
+        # Renders one batch while other batches render too. Its sales are numbered and journalled once
+        # the batch before it has journalled its own, and its PDFs written once that batch has written
+        # its own, so both happen in invoice-number order. As in `create_invoice()`, a sale is committed
+        # before its PDF is written, so a crash in between leaves a sale that recovery renders again.
+        loop = asyncio.get_running_loop()
+        appended, written = steps
+
+        async def render(items):
+            try:
+                results = await loop.run_in_executor(self.pool, render_batch, [job for job, _ in items])
+            except Exception as e:
+                results = [(None, 0.0, None, None, str(e))] * len(items)
+            for _, seconds, _, _, _ in results:
+                metrics.observe('invoice', seconds)
+            return zip(items, results)
+
+        try:
+            try:
+                try:
+                    pending = await render(batch)
+                finally:
+                    rendering.release()
+                self.batches += 1
+                if previous is not None:
+                    await asyncio.shield(previous[0])
+
+                # The invoices rendered take the lowest numbers not used yet, in order; those rendered
+                # with another number (after a failure) are rendered again, so the numbers stay gap-free
+                outcomes = []
+                ready = []
+                while pending:
+                    retry = []
+                    for (job, done), (_, _, total, data, error) in pending:
+                        if error is not None:
+                            outcomes.append((job, done, total, data, error, None))
+                            continue
+                        number = self._numbers[len(ready) + len(retry)]
+                        if retry or job[0] != number:
+                            retry.append(((number,) + job[1:], done))
+                        else:
+                            ready.append((job, done, total, data))
+                    pending = await render(retry) if retry else None
+
+                for job, done, total, data in ready:
+                    self._numbers.popleft()
+                    invoice_number, date_time, _, cx_name, cx_address, cart, _ = job
+                    sequence = error = None
+                    try:
+                        sequence = self.journal.append(sale_record(invoice_number, date_time, cx_name, cx_address,
+                                                                   cart, total, self._pdf(job)))
+                    except Exception as e:
+                        error = str(e)
+                    outcomes.append((job, done, total, data, error, sequence))
+            finally:
+                appended.set_result(None)
+
+            commit_errors = await loop.run_in_executor(None, self._committed, [outcome[5] for outcome in outcomes])
+            if previous is not None:
+                await asyncio.shield(previous[1])
+            answers = []
+            for (job, done, total, data, error, _), commit_error in zip(outcomes, commit_errors):
+                error = error or commit_error
+                if error is None:
+                    try:
+                        if self.sink is not None:
+                            self.sink.write(f'{job[0]}.pdf', data)
+                        metrics.count('invoices')
+                        metrics.count('lines', len(job[5]))
+                    except Exception as e:
+                        error = str(e)
+                answers.append((job[0], done, total, data, error))
+        finally:
+            written.set_result(None)
+
+        for invoice_number, done, total, data, error in answers:
+            if error is not None:
+                metrics.count_error('invoice')
+            if done.cancelled():
+                continue
+            if error is not None:
+                done.set_exception(HttpError(HTTPStatus.INTERNAL_SERVER_ERROR, error))
+            else:
+                done.set_result((invoice_number, total, data))
+
+    def _pdf(self, job):
+        # How a sale's PDF was rendered and where it is written, for reprints and `journal.recover()`
+        invoice_number, _, business, _, _, _, renderer_name = job
+        pdf = {'path': None, 'business': business, 'renderer': renderer_name}
+        if isinstance(self.sink, DirectorySink):
+            pdf['path'] = os.path.abspath(os.path.join(self.sink.directory, f'{invoice_number}.pdf'))
+        return pdf
+
+    def _committed(self, sequences):
+        # Runs in a thread: waits for the journal to commit each sale, returning the error of any that failed
+        errors = []
+        for sequence in sequences:
+            try:
+                if sequence is not None:
+                    self.journal.wait(sequence)
+                errors.append(None)
+            except Exception as e:
+                errors.append(str(e))
+        return errors
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    method, target, headers, body = request
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                    status, content_type, response, extra = await self._dispatch(method, target, body)
+                except HttpError as e:
+                    keep_alive = e.status < 500 and e.status != HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+                    status, content_type, extra = e.status, 'application/json', {}
+                    response = json.dumps({'error': str(e)}).encode()
+
+                write_response(writer, status, response, content_type, extra, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, target, body):
+        path = target.split('?', 1)[0]
+        match (method, path):
+            case ('GET', '/health'):
+                return HTTPStatus.OK, 'application/json', b'{"status": "ok"}', {}
+            case ('GET', '/metrics') if metrics.is_enabled():
+                return HTTPStatus.OK, 'text/plain; version=0.0.4', metrics.prometheus().encode(), {}
+            case ('POST', '/price'):
+                quote = self.price(_json(body))
+                return HTTPStatus.OK, 'application/json', json.dumps(quote).encode(), {}
+            case ('POST', '/invoice'):
+                invoice_number, total, data = await self.invoice(_json(body))
+                return HTTPStatus.OK, 'application/pdf', data, {'X-Invoice-Number': invoice_number,
+                                                                 'X-Balance-Due': total}
+            case (_, '/health' | '/price' | '/invoice'):
+                raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, f'{method} not allowed on {path}')
+            case _:
+                raise HttpError(HTTPStatus.NOT_FOUND, f'{path} not found')
+
+
+async def read_request(reader):
+    """
+    Reads one HTTP/1.1 request from `reader`.
+
+    Returns:
+    - `request` (tuple): `(method, target, headers, body)` with lower-case header names, or None at
+      the end of the connection.
+
+    Raises:
+    - `HttpError`: If the request is malformed or its body too large.
+    """
+
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode('latin-1').split()
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, 'malformed request line')
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, 'invalid Content-Length')
+    if length > MAX_BODY:
+        raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, 'request body too large')
+    body = await reader.readexactly(length) if length else b''
+    return method, target, headers, body
+
+
+def write_response(writer, status, body, content_type='application/json', headers=None, keep_alive=True):
+    """
+    Writes one HTTP/1.1 response to `writer`.
+    """
+
+    status = HTTPStatus(status)
+    lines = [f'HTTP/1.1 {status.value} {status.phrase}', f'Content-Type: {content_type}',
+             f'Content-Length: {len(body)}', f'Connection: {"keep-alive" if keep_alive else "close"}']
+    lines.extend(f'{name}: {value}' for name, value in (headers or {}).items())
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+
+
+def _json(body):
+    try:
+        payload = json.loads(body or b'{}')
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, 'body is not valid JSON')
+    if not isinstance(payload, dict):
+        raise HttpError(HTTPStatus.BAD_REQUEST, 'body must be a JSON object')
+    return payload
+
+
+async def serve(host, port, **options):
+    """
+    Runs the service until interrupted (Ctrl+C, or SIGTERM where supported), then shuts it down cleanly.
+    """
+
+    service = InvoiceService(**options)
+    await service.start(host, port)
+    stop = asyncio.Event()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    except NotImplementedError:
+        pass
+    print(f'Invoice service listening on http://{host}:{port}')
+    try:
+        await stop.wait()
+    finally:
+        await service.close()
+
+
+def main():
+    """
+    Command line entry point: `python service.py [--host HOST] [--port PORT] [--workers N]`.
+    """
+
+    arg_parser = argparse.ArgumentParser(description='Serve cart pricing and invoice rendering over HTTP.')
+    arg_parser.add_argument('--host', default=HOST, help=f'address to listen on (default: {HOST})')
+    arg_parser.add_argument('--port', type=int, default=PORT, help=f'port to listen on (default: {PORT})')
+    arg_parser.add_argument('--workers', type=int, default=None, help='rendering processes (default: CPU count)')
+    arg_parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='largest micro-batch per worker task')
+    arg_parser.add_argument('--batch-window', type=float, default=BATCH_WINDOW * 1000,
+                            help='milliseconds to wait for a micro-batch to fill')
+    arg_parser.add_argument('--output', default=INVOICES_DIR,
+                            help=f'directory, .zip or .tar archive to also store invoices in (default: {INVOICES_DIR}/)')
+    arg_parser.add_argument('--metrics', action='store_true', help='record metrics and serve them on GET /metrics')
+    args = arg_parser.parse_args()
+
+    if args.metrics:
+        metrics.enable()
+
+    try:
+        asyncio.run(serve(args.host, args.port, workers=args.workers, batch_size=args.batch_size,
+                          batch_window=args.batch_window / 1000, output=args.output))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
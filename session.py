@@ -0,0 +1,557 @@
+""" Cashier sessions as explicit state machines, driven from a terminal, a TCP socket or a script. """
+import argparse
+import asyncio
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from configparser import ConfigParser
+
+import metrics
+from cart import Cart
+from catalog import get_catalog
+from customers import format_customers, get_directory
+from project import CONSOLE_LENGTH, create_invoice, format_cart, format_services, parse_selection
+from validation import validate_city_province, validate_name, validate_postal, validate_street, validate_unit
+
+HOST: str = '127.0.0.1'
+PORT: int = 8090
+MAX_SESSIONS: int = 500
+SESSION_WORKERS: int = 4
+IDLE_TIMEOUT: float = 900.0
+MAX_LINE: int = 1024
+
+NAME: str = 'name'
+PICK_CUSTOMER: str = 'pick_customer'
+UNIT: str = 'unit'
+STREET: str = 'street'
+CITY_PROVINCE: str = 'city_province'
+POSTAL: str = 'postal'
+MENU: str = 'menu'
+SHOP: str = 'shop'
+ADD_MORE: str = 'add_more'
+REMOVE_ITEM: str = 'remove_item'
+REMOVE_QUANTITY: str = 'remove_quantity'
+CONFIRM: str = 'confirm'
+CONTINUE: str = 'continue'
+DONE: str = 'done'
+
+PROMPTS: dict = {
+    NAME: 'Name of Customer (/ to search): ',
+    PICK_CUSTOMER: 'Customer # (Enter to type a new customer): ',
+    UNIT: 'Unit/Apt: ',
+    STREET: 'Street: ',
+    CITY_PROVINCE: 'City, Province: ',
+    POSTAL: 'Postal Code: ',
+    MENU: 'Select your option (h for Help): ',
+    SHOP: 'Select Service : ',
+    ADD_MORE: 'Do you want to add service? (Y/N): ',
+    REMOVE_ITEM: 'Select the item you want to remove: ',
+    REMOVE_QUANTITY: 'How many you want to remove? : ',
+    CONFIRM: '{cx_name}, confirm checkout? (Y/N): ',
+    CONTINUE: 'Do you want to continue? (Y/N): ',
+    DONE: '',
+}
+HELP: str = '''
+┏━━━━━━┓
+┃ Menu ┃
+┣━━━━━━┻━━━━━━━━━━━━━━━━━━━━━┓
+┃ 1. Start/Continue Shopping ┃
+┃ 2. List Services Offered   ┃
+┃ 3. View Cart               ┃
+┃ 4. Proceed to Checkout     ┃
+┃ 5. Remove Item from Cart   ┃
+┃ 6. Exit                    ┃
+┗━━━━━━━━━━━━━━━━━━━━━━━━━━━━┛
+
+'''
+GOODBYE: str = 'Thanks for hanging out with us! Until next time, stay awesome! 🚀 Good Bye! 👋🏻'
+
+
+class Session:
+    """
+    One cashier session: customer details, shopping, checkout and the next customer, as a state machine.
+
+    The session does no I/O. `handle()` takes one line typed by the cashier, moves to the next state
+    and returns the text to show, and `prompt` is the question to ask next. Whatever drives it (a
+    terminal, a socket, a script) loops over lines, so the stack depth stays the same however long the
+    shift, and a session only holds its customer, cart and state, so one process can run many of them.
+    """
+
+    __slots__ = ('business_name', 'sink', 'state', 'cx_name', 'cx_address', 'cart', 'invoices', '_customers',
+                 '_unit', '_street', '_city_province', '_remove', '_output')
+
+    def __init__(self, business_name=None, sink=None):
+        """
+        Args:
+        - `business_name` (str): The name shown in the banner; read from `config.ini` if None.
+        - `sink` (Sink): Where to store invoices; the `invoices/` directory by default.
+        """
+
+        if business_name is None:
+            parser = ConfigParser()
+            parser.read('./config.ini')
+            business_name = parser.get('business_data', 'business_name')
+        self.business_name = business_name
+        self.sink = sink
+        self.state = NAME
+        self.cx_name = None
+        self.cx_address = None
+        self.cart = None
+        self.invoices = []
+        self._customers = None
+        self._unit = self._street = self._city_province = None
+        self._remove = None
+        self._output = []
+
+    @property
+    def prompt(self):
+        """
+        The question for the current state.
+        """
+
+        return PROMPTS[self.state].format(cx_name=self.cx_name)
+
+    @property
+    def done(self):
+        return self.state == DONE
+
+    def start(self):
+        """
+        Starts the session and returns the banner.
+        """
+
+        self._banner()
+        return self._flush()
+
+    def handle(self, line):
+        """
+        Handles one line typed by the cashier.
+
+        Args:
+        - `line` (str): The answer to `prompt`, without the line ending.
+
+        Returns:
+        - `output` (str): The text to show before the next prompt.
+        """
+
+        if self.state != DONE:
+            getattr(self, f'_on_{self.state}')(line)
+        return self._flush()
+
+    def _say(self, text=''):
+        self._output.append(f'{text}\n')
+
+    def _flush(self):
+        output = ''.join(self._output)
+        self._output.clear()
+        return output
+
+    def _banner(self):
+        self._say('*' * CONSOLE_LENGTH)
+        self._say(f'*{self.business_name: ^{CONSOLE_LENGTH - 2}}*')
+        self._say('*' * CONSOLE_LENGTH)
+        self._say(f'{'*' * (CONSOLE_LENGTH - 10)}{' Q. Quit '}*')
+
+    def _enter(self, state):
+        """
+        Moves to `state`, showing what the original menus printed before its prompt.
+        """
+
+        self.state = state
+        if state == MENU:
+            self._output.append(HELP)
+        elif state == SHOP:
+            self._say('\nL. List offered services')
+            self._say('Q. Quit to the main menu')
+            self._say('Format: "Service xQuantity"\n')
+        elif state == ADD_MORE:
+            self._say()
+        elif state == REMOVE_QUANTITY:
+            self._say(f'You have {self._remove.quantity} {self._remove.service}')
+
+    def _quit(self):
+        self._say(GOODBYE)
+        self.state = DONE
+
+    def _validated(self, line, validator, quit_on_q=True):
+        """
+        Returns `validator(line)`, or None after showing why the line is invalid (or quitting on Q).
+        """
+
+        if quit_on_q and line.strip().upper() == 'Q':
+            self._quit()
+            return None
+        try:
+            return validator(line)
+        except ValueError as e:
+            self._say(f'⚠️ {e}')
+            return None
+
+    def _welcome(self, cx_name, cx_address):
+        self.cx_name, self.cx_address = cx_name, cx_address
+        self.cart = Cart(catalog=get_catalog())
+        self._say(f'\nWelcome, {cx_name} 😎')
+        self._enter(MENU)
+
+    # Customer details
+
+    def _on_name(self, line):
+        value = line.strip()
+        if not value.startswith('/'):
+            cx_name = self._validated(line, validate_name)
+            if cx_name is not None:
+                self.cx_name = cx_name
+                self._say(f'{'Address of Customer':^{CONSOLE_LENGTH}}')
+                self.state = UNIT
+            return
+        customers = get_directory().search(value[1:])
+        if not customers:
+            self._say(f'⚠️ No customer found for "{value[1:]}"')
+            return
+        self._customers = customers
+        self._say(format_customers(customers))
+        self.state = PICK_CUSTOMER
+
+    def _on_pick_customer(self, line):
+        choice, customers = line.strip(), self._customers
+        self._customers = None
+        if not choice.isdigit() or not 1 <= int(choice) <= len(customers):
+            self._say('⚠️ No customer picked')
+            self.state = NAME
+            return
+        customer = customers[int(choice) - 1]
+        self._welcome(customer['cx_name'], customer['cx_address'])
+
+    def _on_unit(self, line):
+        self._unit = self._validated(line, validate_unit, quit_on_q=False)
+        if self._unit is not None:
+            self.state = STREET
+
+    def _on_street(self, line):
+        self._street = self._validated(line, validate_street)
+        if self._street is not None:
+            self.state = CITY_PROVINCE
+
+    def _on_city_province(self, line):
+        self._city_province = self._validated(line, validate_city_province)
+        if self._city_province is not None:
+            self.state = POSTAL
+
+    def _on_postal(self, line):
+        cx_postal = self._validated(line, validate_postal)
+        if cx_postal is None:
+            return
+        cx_city, cx_province = self._city_province
+        cx_address = {'cx_street': self._street, 'cx_city': cx_city, 'cx_province': cx_province, 'cx_postal': cx_postal}
+        if self._unit:
+            cx_address = {'cx_unit': self._unit, **cx_address}
+        self._unit = self._street = self._city_province = None
+        self._welcome(self.cx_name, cx_address)
+
+    # Main menu
+
+    def _on_menu(self, line):
+        match line.strip():
+            case '1':
+                self._enter(SHOP)
+            case '2':
+                self._say(format_services(self.cart.catalog.rows))
+                self._enter(MENU)
+            case '3':
+                self._say(format_cart(self.cart))
+                self._enter(MENU)
+            case '4':
+                self._say(format_cart(self.cart))
+                self._enter(CONFIRM if len(self.cart) else MENU)
+            case '5':
+                self._say()
+                if len(self.cart) == 0:
+                    self._say('🔺Your 🛒 is Empty!')
+                    self._enter(MENU)
+                else:
+                    self.state = REMOVE_ITEM
+            case '6':
+                self._say()
+                self._quit()
+                self._say()
+            case _:
+                self._say('❌ Invalid Selection!')
+                self._enter(MENU)
+
+    def _on_shop(self, line):
+        selection = line.strip()
+        match selection.upper():
+            case 'L':
+                self._say(format_services(self.cart.catalog.rows))
+                self._enter(SHOP)
+            case 'Q':
+                self._enter(MENU)
+            case '':
+                self._say('\n⚠️ Empty Selection!')
+                self._enter(SHOP)
+            case _:
+                service, quantity = parse_selection(selection)
+                row = self.cart.catalog.find(service)
+                if row is None:
+                    suggestions = self.cart.catalog.suggest(service.title())
+                    if suggestions:
+                        self._say('Do you mean something like: ' + ', '.join(suggestions) + '?')
+                    else:
+                        self._say('Item not found!')
+                    self._enter(SHOP)
+                    return
+                name, price = row
+                found = self.cart.get(name) is not None
+                item = self.cart.add(name, price, quantity)
+                self._say(f'✅ {item.service} has been {"updated in" if found else "added to"} cart! '
+                          f'Quantity: {item.quantity}')
+                self._enter(ADD_MORE)
+
+    def _on_add_more(self, line):
+        match line.strip().upper():
+            case 'Y':
+                self._enter(SHOP)
+            case 'N':
+                self._enter(MENU)
+            case _:
+                self._say('❌ Invalid Input!')
+                self._enter(ADD_MORE)
+
+    def _on_remove_item(self, line):
+        item_name = line.strip().lower()
+        item = self.cart.get(item_name) if item_name else None
+        if not item_name:
+            self._say('❗Empty selection!')
+        elif item is None:
+            self._say(f'❗{item_name} not found in the cart.')
+        elif item.quantity > 1:
+            self._remove = item
+            self._enter(REMOVE_QUANTITY)
+            return
+        else:
+            self._remove_item(item, 1)
+        self._enter(MENU)
+
+    def _on_remove_quantity(self, line):
+        item = self._remove
+        try:
+            quantity = int(line.strip())
+        except ValueError:
+            quantity = -1
+        if quantity < 0:
+            self._say('❌ Invalid Quantity! (Only numbers)')
+        elif quantity > item.quantity:
+            self._say('❌ Incorrect Quantity!')
+        else:
+            self._remove = None
+            self._remove_item(item, quantity)
+            self._enter(MENU)
+            return
+        self._enter(REMOVE_QUANTITY)
+
+    def _remove_item(self, item, quantity):
+        self.cart.remove(item.service, quantity)
+        if item.quantity == 0:
+            self._say(f'✅ {item.service} has been removed from cart')
+        else:
+            self._say(f'✅ {item.service} has been updated! Quantity: {item.quantity}')
+
+    # Checkout
+
+    def _on_confirm(self, line):
+        match line.strip().upper():
+            case 'Y':
+                try:
+                    self.invoices.append(create_invoice(self.cx_name, self.cx_address, self.cart, self.sink))
+                except Exception as e:
+                    self._say(str(e))
+                    self._enter(MENU)
+                    return
+                self._say()
+                self._say('Thank you for shopping with us! 🛍️')
+                self._say()
+                self.state = CONTINUE
+            case 'N':
+                self._enter(MENU)
+            case _:
+                self._say('❌ Invalid Input!')
+                self._enter(MENU)
+
+    def _on_continue(self, line):
+        match line.strip().upper():
+            case 'Y':
+                self.cx_name = self.cx_address = self.cart = None
+                self._banner()
+                self.state = NAME
+            case 'N':
+                self._say()
+                self._quit()
+                self._say()
+            case _:
+                self._say('❌ Invalid Input!')
+
+
+def run_terminal(session):
+    """
+    Drives `session` from this terminal until the cashier quits or input ends.
+    """
+
+    print(session.start(), end='')
+    while not session.done:
+        try:
+            line = input(session.prompt)
+        except EOFError:
+            break
+        print(session.handle(line), end='')
+
+
+def run_script(lines, session=None):
+    """
+    Drives a session with scripted lines, e.g. for tests and load generation.
+
+    Args:
+    - `lines` (iterable): The lines typed by the cashier.
+    - `session` (Session): The session to drive; a new one by default.
+
+    Returns:
+    - `transcript` (str): Everything shown and typed, as on a terminal.
+    """
+
+    session = session or Session()
+    transcript = [session.start()]
+    for line in lines:
+        if session.done:
+            break
+        transcript.append(f'{session.prompt}{line}\n')
+        transcript.append(session.handle(line))
+    return ''.join(transcript)
+
+
+class SessionServer:
+    """
+    Serves cashier sessions over TCP, one session per connection (e.g. `nc 127.0.0.1 8090`), with the
+    same prompts as the terminal.
+
+    The event loop only reads and writes lines. Session steps run on a small pool of worker threads, so
+    a checkout that is rendering does not hold up reading and writing for the other sessions, and
+    checkouts of different sessions render and commit at the same time. The steps of one session still
+    run one after the other. Invoice numbers come from the allocator's file lock, the checkout journal
+    commits sales from any thread in groups, and each thread opens its own customer directory.
+    """
+
+    def __init__(self, max_sessions=MAX_SESSIONS, idle_timeout=IDLE_TIMEOUT, sink=None, workers=SESSION_WORKERS):
+        """
+        Args:
+        - `max_sessions` (int): Connections beyond this many are turned away.
+        - `idle_timeout` (float): Seconds without input after which a session is closed.
+        - `sink` (Sink): Where to store invoices; the `invoices/` directory by default.
+        - `workers` (int): Number of threads running session steps.
+        """
+
+        parser = ConfigParser()
+        parser.read('./config.ini')
+        self.business_name = parser.get('business_data', 'business_name')
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sink = sink
+        self.active = 0
+        self.sessions = 0
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='session')
+        self.server = None
+
+    async def start(self, host=HOST, port=PORT):
+        """
+        Starts listening on `host:port` and returns the asyncio server.
+        """
+
+        get_catalog()
+        self.server = await asyncio.start_server(self._serve, host, port, limit=MAX_LINE, backlog=self.max_sessions)
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown()
+
+    async def _serve(self, reader, writer):
+        if self.active >= self.max_sessions:
+            writer.write('Too many sessions, please try again later.\n'.encode())
+            writer.close()
+            return
+        self.active += 1
+        self.sessions += 1
+        loop = asyncio.get_running_loop()
+        session = Session(self.business_name, self.sink)
+        try:
+            output = session.start()
+            while not session.done:
+                writer.write(f'{output}{session.prompt}'.encode())
+                await writer.drain()
+                try:
+                    line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                except (asyncio.TimeoutError, ValueError):
+                    break
+                if not line:
+                    break
+                output = await loop.run_in_executor(self.executor, session.handle,
+                                                    line.decode(errors='replace').rstrip('\r\n'))
+            else:
+                writer.write(output.encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.active -= 1
+            writer.close()
+
+
+async def serve(host=HOST, port=PORT, max_sessions=MAX_SESSIONS, workers=SESSION_WORKERS):
+    """
+    Runs a `SessionServer` until interrupted.
+    """
+
+    session_server = SessionServer(max_sessions, workers=workers)
+    server = await session_server.start(host, port)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    print(f'Serving cashier sessions on {", ".join(str(s.getsockname()) for s in server.sockets)}')
+    try:
+        await stop.wait()
+    finally:
+        await session_server.close()
+
+
+def main():
+    """
+    Command line entry point:
+    - `python session.py`: one session on this terminal, like `python project.py`.
+    - `python session.py --serve [--host HOST] [--port PORT] [--max-sessions N] [--workers N]`: sessions over TCP.
+    - `python session.py --script FILE`: one session answering with the lines of `FILE`; prints the transcript.
+    """
+
+    arg_parser = argparse.ArgumentParser(description='Run cashier sessions.')
+    arg_parser.add_argument('--serve', action='store_true', help='serve sessions over TCP')
+    arg_parser.add_argument('--host', default=HOST)
+    arg_parser.add_argument('--port', type=int, default=PORT)
+    arg_parser.add_argument('--max-sessions', type=int, default=MAX_SESSIONS)
+    arg_parser.add_argument('--workers', type=int, default=SESSION_WORKERS, help='threads running session steps')
+    arg_parser.add_argument('--script', help='file with one answer per line')
+    args = arg_parser.parse_args()
+
+    metrics.enable_from_env()
+    if args.serve:
+        asyncio.run(serve(args.host, args.port, args.max_sessions, args.workers))
+    elif args.script:
+        with open(args.script, 'r') as file:
+            print(run_script(line.rstrip('\r\n') for line in file), end='')
+    else:
+        run_terminal(Session())
+
+
+if __name__ == "__main__":
+    main()
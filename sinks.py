@@ -0,0 +1,187 @@
+""" Invoice sinks: where rendered invoice PDFs are written. """
+import io
+import os
+import tarfile
+import threading
+import time
+import zipfile
+
+from pdfpack import RESOURCES_DIR, split_pdf
+
+INVOICES_DIR: str = 'invoices'
+
+
+class Sink:
+    """
+    Receives rendered invoices, one `write()` per invoice. Sinks can be written from several threads
+    at once; the archive sinks append one invoice at a time.
+    """
+
+    def write(self, name, data):
+        """
+        Stores one invoice.
+
+        Args:
+        - `name` (str): The file name, e.g. '000042.pdf'.
+        - `data` (bytes): The PDF file contents.
+
+        Returns:
+        - `location` (str): Where the invoice was stored.
+        """
+
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class DirectorySink(Sink):
+    """
+    Writes each invoice to its own file in a directory, `invoices/` by default.
+    """
+
+    def __init__(self, directory=INVOICES_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, name, data):
+        path = os.path.join(self.directory, name)
+        write_durably(path, data)
+        return path
+
+
+def write_durably(path, data):
+    """
+    Writes `data` to the file at `path` so that after a crash or a power cut the file is either missing
+    or whole: the data is written under a temporary name and flushed to disk, then renamed into place,
+    and the directory is flushed so the rename itself is on disk too.
+    """
+
+    with open(f'{path}.tmp', 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(f'{path}.tmp', path)
+    _sync_directory(os.path.dirname(path) or '.')
+
+
+class ZipSink(Sink):
+    """
+    Appends invoices to a zip archive as they are rendered. PDF streams are compressed already, so
+    entries are stored without further compression.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._archive = zipfile.ZipFile(path, 'a', compression=zipfile.ZIP_STORED)
+        self._lock = threading.Lock()
+
+    def write(self, name, data):
+        with self._lock:
+            self._archive.writestr(zipfile.ZipInfo(name, time.localtime()[:6]), data)
+        return f'{self.path}:{name}'
+
+    def close(self):
+        self._archive.close()
+
+
+class TarSink(Sink):
+    """
+    Appends invoices to an uncompressed tar archive as they are rendered.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._archive = tarfile.open(path, 'a')
+        self._lock = threading.Lock()
+
+    def write(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        with self._lock:
+            self._archive.addfile(info, io.BytesIO(data))
+        return f'{self.path}:{name}'
+
+    def close(self):
+        self._archive.close()
+
+
+class PackSink(Sink):
+    """
+    Appends invoices to an invoice pack (see `pdfpack.py`): a zip archive that stores the large objects
+    the invoices share, such as the template's logo, once. Read invoices back with `pdfpack.PackReader`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._archive = zipfile.ZipFile(path, 'a')
+        self._stored = set(self._archive.namelist())
+        self._lock = threading.Lock()
+
+    def write(self, name, data):
+        part, resources = split_pdf(data)
+        date_time = time.localtime()[:6]
+        with self._lock:
+            for digest, body in resources.items():
+                if RESOURCES_DIR + digest not in self._stored:
+                    # Shared objects are mostly compressed streams already
+                    self._archive.writestr(zipfile.ZipInfo(RESOURCES_DIR + digest, date_time), body)
+                    self._stored.add(RESOURCES_DIR + digest)
+            self._archive.writestr(zipfile.ZipInfo(name, date_time), part, compress_type=zipfile.ZIP_DEFLATED)
+            self._stored.add(name)
+        return f'{self.path}:{name}'
+
+    def close(self):
+        self._archive.close()
+
+
+class BytesSink(Sink):
+    """
+    Keeps invoices in memory for the caller, in `files` by name.
+    """
+
+    def __init__(self):
+        self.files = {}
+
+    def write(self, name, data):
+        self.files[name] = data
+        return name
+
+
+def open_sink(target=INVOICES_DIR):
+    """
+    Opens the sink for `target`: a `.zip`, `.tar` or `.pdfpack` archive, or else a directory.
+
+    Args:
+    - `target` (str): The archive path or directory.
+
+    Returns:
+    - `sink` (Sink): The sink. Close it (or use it in a `with` block) once all invoices are written.
+    """
+
+    extension = os.path.splitext(target)[1].lower()
+    if extension == '.zip':
+        return ZipSink(target)
+    if extension == '.tar':
+        return TarSink(target)
+    if extension == '.pdfpack':
+        return PackSink(target)
+    return DirectorySink(target)
+
+
+def _sync_directory(directory):
+    # Windows cannot open a directory, and NTFS journals the rename itself
+    if os.name == 'nt':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
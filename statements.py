@@ -0,0 +1,272 @@
+""" Customer statements: a summary of a customer's invoices for a period followed by every invoice, in one PDF. """
+import argparse
+import datetime as dt
+import os
+import time
+from configparser import ConfigParser
+
+from ledger import LEDGER_PATH, format_cents, get_ledger, to_cents
+from pdf import Canvas, StreamingPdfWriter
+from project import build_invoice
+from renderers import (BLUE, CONTINUED_TABLE_TOP, FOOTER_TOP, GREEN, GREY, HEADER_HEIGHT, NAVY, PAGE_BOTTOM, ROW_HEIGHT,
+                       RULE, SLATE, TABLE_TOP, WHITE, get_renderer)
+from sinks import INVOICES_DIR
+
+STATEMENTS_DIR: str = 'statements'
+COLUMNS = (22.1, 112.0, 252.0, 310.0, 400.0, 490.0, 589.4)
+HEADINGS = ('INVOICE NO.', 'DATE', 'ITEMS', 'SUBTOTAL', 'TAX', 'TOTAL')
+TOTALS_HEIGHT: float = 130.0
+
+
+class StatementSummary:
+    """
+    The summary pages at the front of a statement: one row per invoice, then the totals. Rows are drawn
+    as invoices stream past, and each full page is written at once, ahead of the invoices in page
+    order. The first page, which shows the totals in its header, is kept until `finish()`.
+    """
+
+    def __init__(self, writer, business, cx_name, start, end, logo):
+        """
+        Args:
+        - `writer` (StreamingPdfWriter): The statement being written.
+        - `business` (dict): The `business_data` section of the configuration file.
+        - `cx_name` (str): The customer's name.
+        - `start` (datetime.date): The first day of the statement.
+        - `end` (datetime.date): The last day of the statement.
+        - `logo` (bool): Whether the writer has a `Logo` image.
+        """
+
+        self.writer = writer
+        self.business = business
+        self.cx_name = cx_name
+        self.start = start
+        self.end = end
+        self.logo = logo
+        self.invoices = 0
+        self.subtotal_cents = 0
+        self.total_cents = 0
+        self.first_page = Canvas()
+        self.canvas = self.first_page
+        self.top = self._draw_table_header(TABLE_TOP)
+        self.written = 0
+        self.cx_address = None
+
+    def add(self, sale):
+        """
+        Adds the row of a sale (a ledger record) and counts it in the totals.
+        """
+
+        subtotal = sum(to_cents(price) * int(quantity) for _, price, quantity in sale['cart'])
+        total = to_cents(sale['total'])
+        self.invoices += 1
+        self.subtotal_cents += subtotal
+        self.total_cents += total
+        if self.cx_address is None:
+            self.cx_name, self.cx_address = sale['cx_name'], sale['cx_address']
+
+        if self.top + ROW_HEIGHT > PAGE_BOTTOM:
+            self._next_page()
+        row = (sale['invoice_number'], sale['date_time'], str(sum(int(quantity) for _, _, quantity in sale['cart'])),
+               format_cents(subtotal), format_cents(total - subtotal), format_cents(total))
+        self.top = self._draw_row(self.top, row)
+
+    def finish(self):
+        """
+        Draws the totals, writes the remaining summary pages and returns the first one's object number.
+        """
+
+        if self.top + TOTALS_HEIGHT > PAGE_BOTTOM:
+            self._next_page()
+        self._draw_totals(self.top + 20.0)
+        if self.canvas is not self.first_page:
+            self.writer.add_page(self.canvas, index=self.written)
+        self._draw_header()
+        return self.writer.add_page(self.first_page, index=0)
+
+    def _next_page(self):
+        if self.canvas is not self.first_page:
+            self.writer.add_page(self.canvas, index=self.written)
+            self.written += 1
+        self.canvas = Canvas()
+        self.canvas.rect(22.1, 19.7, 571.7, 14.9, BLUE)
+        self.canvas.rect(27.8, FOOTER_TOP, 575.2, 15.4, BLUE)
+        self.top = self._draw_table_header(CONTINUED_TABLE_TOP)
+
+    def _draw_header(self):
+        canvas, business = self.first_page, self.business
+        canvas.rect(22.1, 19.7, 571.7, 14.9, BLUE)
+        canvas.rect(22.1, 34.6, 571.7, 181.4, GREY)
+        canvas.rect(27.8, FOOTER_TOP, 575.2, 15.4, BLUE)
+        if self.logo:
+            canvas.image('Logo', 45.6, 69.6, 53.0, 53.0)
+        canvas.text(99.4, 64.8, business['business_name'])
+        canvas.text(99.4, 85.0, business['business_street_address'])
+        canvas.text(99.4, 99.4, business['business_city_province'])
+        canvas.text(99.4, 123.8, business['business_email_address'])
+        canvas.text(99.4, 138.7, business['business_contact'])
+
+        canvas.text(501.0, 104.2, 'STATEMENT', size=20, align='center')
+        canvas.rect(421.4, 143.0, 159.4, 3.9, WHITE)
+        canvas.text(423.4, 159.4, f'FROM: {self.start:%m-%d-%Y}')
+        canvas.line(421.4, 164.6, 580.8, 164.6, RULE)
+        canvas.text(423.4, 193.4, f'TO: {self.end:%m-%d-%Y}')
+        canvas.line(421.4, 198.7, 580.8, 198.7, RULE)
+
+        canvas.text(24.0, 260.2, 'STATEMENT FOR', size=9, font='bold', color=NAVY)
+        canvas.line(22.1, 265.4, 260.6, 265.4, RULE)
+        canvas.text(285.1, 260.2, 'Account Summary', size=9, font='bold', color=NAVY)
+        canvas.line(283.2, 265.4, 589.0, 265.4, RULE)
+        canvas.text(24.0, 277.0, self.cx_name)
+        if self.cx_address:
+            address = self.cx_address
+            street = f"{address['cx_unit']} - {address['cx_street']}" if 'cx_unit' in address else address['cx_street']
+            canvas.text(24.0, 292.3, street)
+            canvas.text(24.0, 307.2, f"{address['cx_city']}, {address['cx_province']} {address['cx_postal']}")
+        for baseline, (label, value) in zip((278.0, 292.3, 307.2), (
+                ('Invoices', str(self.invoices)), ('Tax', f'$ {format_cents(self.total_cents - self.subtotal_cents)}'),
+                ('Total', f'$ {format_cents(self.total_cents)}'))):
+            canvas.text(285.1, baseline, label)
+            canvas.text(587.5, baseline, value, align='right')
+
+    def _draw_table_header(self, top):
+        canvas = self.canvas
+        canvas.rect(COLUMNS[0], top, COLUMNS[-1] - COLUMNS[0], HEADER_HEIGHT, BLUE)
+        for left, right, heading in zip(COLUMNS, COLUMNS[1:], HEADINGS):
+            canvas.text((left + right) / 2, top + 9.2, heading, size=9, font='bold', color=WHITE, align='center')
+        for x in COLUMNS:
+            canvas.line(x, top, x, top + HEADER_HEIGHT, width=0.5)
+        canvas.line(COLUMNS[0], top, COLUMNS[-1], top, width=0.5)
+        canvas.line(COLUMNS[0], top + HEADER_HEIGHT, COLUMNS[-1], top + HEADER_HEIGHT, width=0.5)
+        return top + HEADER_HEIGHT
+
+    def _draw_row(self, top, row):
+        canvas = self.canvas
+        bottom = top + ROW_HEIGHT
+        for index, value in enumerate(row):
+            if index < 2:
+                canvas.text(COLUMNS[index] + 5.8, top + 11.0, value)
+            else:
+                canvas.text(COLUMNS[index + 1] - 5.8, top + 11.0, value, align='right')
+        for x in COLUMNS:
+            canvas.line(x, top, x, bottom, width=0.5)
+        canvas.line(COLUMNS[0], bottom, COLUMNS[-1], bottom, width=0.5)
+        return bottom
+
+    def _draw_totals(self, top):
+        canvas = self.canvas
+        values = (('INVOICES', str(self.invoices)), ('SUBTOTAL', format_cents(self.subtotal_cents)),
+                  ('TOTAL TAX', format_cents(self.total_cents - self.subtotal_cents)))
+        for index, (label, value) in enumerate(values):
+            baseline = top + 14.0 + index * 26.9
+            canvas.text(434.4, baseline, label, size=8, font='bold', color=SLATE, align='right')
+            canvas.text(587.5, baseline, value, align='right')
+            canvas.line(436.8, baseline + 13.4, 589.4, baseline + 13.4, RULE)
+        canvas.rect(436.8, top + 85.0, 152.6, 31.7, GREEN)
+        canvas.line(330.7, top + 85.0, 589.4, top + 85.0, (38, 38, 38), width=1)
+        canvas.line(436.8, top + 116.7, 589.4, top + 116.7, (38, 38, 38), width=1)
+        canvas.text(434.4, top + 103.7, 'Total', size=13, font='bold', color=SLATE, align='right')
+        canvas.text(587.5, top + 103.7, f'$ {format_cents(self.total_cents)}', align='right')
+
+
+def write_statement(cx_name, start, end, path, ledger_path=LEDGER_PATH, invoices_dir=INVOICES_DIR):
+    """
+    Writes the statement of a customer for a period: summary pages listing every invoice with its
+    subtotal, tax and total, then the pages of every invoice, oldest first, with a bookmark per invoice.
+
+    Sales are streamed from the ledger and each invoice PDF is read from `invoices_dir` (or rendered
+    again from the ledger with the native renderer when it is missing or cannot be merged), copied
+    into the statement and dropped before the next one, so memory use does not grow with the number
+    of invoices. Fonts and the logo are stored once for the whole statement.
+
+    Args:
+    - `cx_name` (str): The customer's name (case-insensitive).
+    - `start` (datetime.date): The first day.
+    - `end` (datetime.date): The last day.
+    - `path` (str): Where to write the PDF. It is written under a temporary name and renamed when complete.
+    - `ledger_path` (str): The sales ledger.
+    - `invoices_dir` (str): The directory of the invoice PDFs.
+
+    Returns:
+    - `report` (dict): `invoices`, `pages`, `rendered` (invoices rendered again), `total` and `bytes`.
+    """
+
+    parser = ConfigParser()
+    parser.read('./config.ini')
+    business = dict(parser['business_data'])
+    renderer = get_renderer('pdf')
+    rendered = 0
+
+    with open(f'{path}.tmp', 'wb') as file:
+        writer = StreamingPdfWriter(file)
+        logo = renderer.logo()
+        if logo:
+            writer.add_image('Logo', logo)
+        summary = StatementSummary(writer, business, cx_name, start, end, bool(logo))
+        bookmarks = []
+        for sale in get_ledger(ledger_path).iter_customer(cx_name, start, end):
+            summary.add(sale)
+            pages = None
+            try:
+                with open(os.path.join(invoices_dir, f"{sale['invoice_number']}.pdf"), 'rb') as invoice_file:
+                    pages = writer.copy_pages(invoice_file.read())
+            except (OSError, ValueError):
+                pass
+            if pages is None:
+                invoice = build_invoice(sale['invoice_number'], sale['date_time'], sale['business'] or business,
+                                        sale['cx_name'], sale['cx_address'], sale['cart'])
+                pages = writer.copy_pages(renderer.render_bytes(invoice))
+                rendered += 1
+            bookmarks.append((f"Invoice {sale['invoice_number']} ({sale['date_time']})", pages[0]))
+
+        writer.add_outline('Summary', summary.finish())
+        for title, page in bookmarks:
+            writer.add_outline(title, page)
+        writer.close()
+        size = file.tell()
+    os.replace(f'{path}.tmp', path)
+
+    return {'invoices': summary.invoices, 'pages': len(writer.pages), 'rendered': rendered,
+            'total': f'$ {format_cents(summary.total_cents)}', 'bytes': size}
+
+
+def month_range(month):
+    """
+    Returns the first and last day of a month given as 'YYYY-MM'.
+    """
+
+    start = dt.datetime.strptime(month, '%Y-%m').date()
+    end = (start.replace(day=28) + dt.timedelta(days=4)).replace(day=1) - dt.timedelta(days=1)
+    return start, end
+
+
+def main():
+    """
+    Command line entry point: `python statements.py "Smit" --month 2025-02 [--output FILE.pdf]`
+    or `--start 2025-02-01 --end 2025-03-31`.
+    """
+
+    arg_parser = argparse.ArgumentParser(description="Write a customer's statement: a summary and every invoice.")
+    arg_parser.add_argument('cx_name')
+    arg_parser.add_argument('--month', help='the month of the statement, YYYY-MM (default: last month)')
+    arg_parser.add_argument('--start', type=dt.date.fromisoformat, help='first day, YYYY-MM-DD')
+    arg_parser.add_argument('--end', type=dt.date.fromisoformat, help='last day, YYYY-MM-DD')
+    arg_parser.add_argument('--output', help=f'the PDF to write (default: {STATEMENTS_DIR}/<name>-<start>.pdf)')
+    args = arg_parser.parse_args()
+
+    if args.start and args.end:
+        start, end = args.start, args.end
+    else:
+        start, end = month_range(args.month or (dt.date.today().replace(day=1) - dt.timedelta(days=1)).strftime('%Y-%m'))
+    output = args.output
+    if output is None:
+        os.makedirs(STATEMENTS_DIR, exist_ok=True)
+        output = os.path.join(STATEMENTS_DIR, f"{'-'.join(args.cx_name.split())}-{start:%Y-%m-%d}.pdf")
+
+    began = time.perf_counter()
+    report = write_statement(args.cx_name, start, end, output)
+    print(f"✅ {output}: {report['invoices']} invoices, {report['pages']} pages, total {report['total']} "
+          f"({report['bytes']:,} bytes, {report['rendered']} rendered again, {time.perf_counter() - began:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
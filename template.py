@@ -0,0 +1,248 @@
+""" Compiled invoice template: the .docx is read and analysed once per process and copied in memory for every invoice. """
+import bisect
+import copy
+import hashlib
+import io
+import os
+import re
+
+import docx
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.table import _Row
+
+PLACEHOLDER_PATTERN = re.compile(r'\[[^\[\]]+\]')
+ITEM_TABLE_INDEX: int = 1
+_XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+_templates: dict = {}
+
+
+class CompiledTemplate:
+    """
+    An invoice template read and analysed once. Records the paragraphs holding `[Placeholder]` text
+    and the item-row prototype of the line-item table, and hands out fresh documents copied from the
+    template opened once, instead of re-reading and re-parsing the .docx file. Each document gets its
+    own copy of the main document part, so any number of them can be filled at once; the other parts
+    (styles, headers, footers, images) are shared and must not be changed.
+    """
+
+    def __init__(self, path, blob=None):
+        """
+        Args:
+        - `path` (str): Path to the .docx template.
+        - `blob` (bytes): The template file contents, read from `path` if not given.
+        """
+
+        if blob is None:
+            with open(path, 'rb') as file:
+                blob = file.read()
+        self.path = path
+        self.digest = hashlib.sha256(blob).hexdigest()
+        self.stat = _stat_key(path)
+
+        self._package = docx.Document(io.BytesIO(blob)).part.package
+        self._pristine = self._package.main_document_part.element
+
+        self.placeholders = {}
+        for index, paragraph in enumerate(self._pristine.iter(qn('w:p'))):
+            for placeholder in PLACEHOLDER_PATTERN.findall(_paragraph_text(paragraph)):
+                self.placeholders.setdefault(placeholder, []).append(index)
+        self.placeholder_indexes = sorted({index for indexes in self.placeholders.values() for index in indexes})
+
+        item_table = self._pristine.body.findall(qn('w:tbl'))[ITEM_TABLE_INDEX]
+        rows = item_table.findall(qn('w:tr'))
+        self.header_row = rows[0]
+        self.item_row = rows[-1]
+        self._text_rows = {bold: _with_runs(self.item_row, bold) for bold in (False, True)}
+
+    def new_document(self):
+        """
+        Returns a fresh `docx.Document` of the template: a deep copy of the parsed main document part,
+        in a package sharing the other parts of the template.
+        """
+
+        main = self._package.main_document_part
+        package = type(self._package)()
+        part = type(main)(main.partname, main.content_type, copy.deepcopy(main.element), package)
+        _copy_rels(main, part)
+        _copy_rels(self._package, package, {main: part})
+        package.after_unmarshal()
+        return part.document
+
+    def placeholder_paragraphs(self, document):
+        """
+        Returns the `w:p` elements of `document` that contain placeholders. Must be called before rows
+        are added, as it relies on the paragraph positions recorded at compile time.
+
+        Args:
+        - `document` (docx.Document): A document returned by `new_document()`.
+        """
+
+        wanted = self.placeholder_indexes
+        found = []
+        position = 0
+        for index, paragraph in enumerate(document.element.iter(qn('w:p'))):
+            if position == len(wanted):
+                break
+            if index == wanted[position]:
+                found.append(paragraph)
+                position += 1
+        return found
+
+    def new_item_row(self, table):
+        """
+        Returns a copy of the item-row prototype as a `_Row` of `table`, not yet inserted.
+
+        Args:
+        - `table` (docx.table.Table): The line-item table of the document being filled.
+        """
+
+        return _Row(copy.deepcopy(self.item_row), table)
+
+    def new_text_row(self, values, bold=False):
+        """
+        Returns a copy of the item-row prototype with `values` in its cells, as a `w:tr` element not yet
+        inserted. The cells already hold a run formatted like the cell's paragraph mark, so filling a row
+        only sets the text, whatever the size of the table.
+
+        Args:
+        - `values` (tuple): The text of each cell.
+        - `bold` (bool): Sets the text in bold.
+        """
+
+        row = copy.deepcopy(self._text_rows[bold])
+        for text, value in zip(row.iter(qn('w:t')), values):
+            text.text = value
+        return row
+
+
+def get_template(path='invoice_template.docx'):
+    """
+    Returns the compiled template for `path`, compiling it on first use and again whenever the file on
+    disk changes. The modification time is checked on every call; the file is only re-hashed when it
+    differs, and only recompiled when the contents did change.
+
+    Args:
+    - `path` (str): Path to the .docx template.
+
+    Returns:
+    - `template` (CompiledTemplate): The compiled template.
+    """
+
+    template = _templates.get(path)
+    stat = _stat_key(path)
+    if template is not None and template.stat == stat:
+        return template
+
+    with open(path, 'rb') as file:
+        blob = file.read()
+    if template is not None and template.digest == hashlib.sha256(blob).hexdigest():
+        template.stat = stat
+        return template
+
+    template = CompiledTemplate(path, blob)
+    _templates[path] = template
+    return template
+
+
+def fill_placeholders(paragraphs, replacements):
+    """
+    Replaces every placeholder in `paragraphs` in a single scan per paragraph. One compiled pattern
+    matches any `[Placeholder]` and its value is looked up in `replacements`, so the cost does not grow
+    with the number of placeholders. The value is written into the run where the placeholder starts,
+    so run formatting is kept even when Word split a placeholder over several runs.
+
+    Args:
+    - `paragraphs` (list): The `w:p` elements to fill, e.g. from `CompiledTemplate.placeholder_paragraphs()`.
+    - `replacements` (dict): Maps each placeholder (e.g. "[Date]") to its value.
+
+    Returns:
+    - `count` (int): The number of placeholders replaced.
+    """
+
+    count = 0
+    for paragraph in paragraphs:
+        texts = list(paragraph.iter(qn('w:t')))
+        if not texts:
+            continue
+        values = [text.text or '' for text in texts]
+        matches = [match for match in PLACEHOLDER_PATTERN.finditer(''.join(values)) if match.group() in replacements]
+        if not matches:
+            continue
+
+        starts = []
+        offset = 0
+        for value in values:
+            starts.append(offset)
+            offset += len(value)
+
+        for match in reversed(matches):
+            first = bisect.bisect_right(starts, match.start()) - 1
+            last = bisect.bisect_right(starts, match.end() - 1) - 1
+            head = values[first][:match.start() - starts[first]]
+            tail = values[last][match.end() - starts[last]:]
+            new_text = str(replacements[match.group()])
+            if first == last:
+                values[first] = head + new_text + tail
+            else:
+                values[first] = head + new_text
+                for index in range(first + 1, last):
+                    values[index] = ''
+                values[last] = tail
+            count += 1
+
+        for text, value in zip(texts, values):
+            if text.text != value:
+                text.text = value
+                text.set(_XML_SPACE, 'preserve')
+    return count
+
+
+def repeat_header_row(row):
+    """
+    Marks a table row as a header row, repeated by Word at the top of every page the table spans.
+    """
+
+    row.get_or_add_trPr().append(OxmlElement('w:tblHeader'))
+
+
+def break_page_before(row):
+    """
+    Makes a table row start on a new page.
+    """
+
+    row.find(qn('w:tc')).find(qn('w:p')).get_or_add_pPr().pageBreakBefore_val = True
+
+
+def _with_runs(row, bold):
+    row = copy.deepcopy(row)
+    for cell in row.findall(qn('w:tc')):
+        paragraph = cell.find(qn('w:p'))
+        run = OxmlElement('w:r')
+        mark = paragraph.find(f"{qn('w:pPr')}/{qn('w:rPr')}")
+        if mark is not None:
+            run.append(copy.deepcopy(mark))
+        if bold:
+            run.get_or_add_rPr().get_or_add_b()
+        text = OxmlElement('w:t')
+        text.set(_XML_SPACE, 'preserve')
+        run.append(text)
+        paragraph.append(run)
+    return row
+
+
+def _copy_rels(source, target, parts=None):
+    # Relates `target` to the parts `source` is related to, or to their replacement in `parts`
+    parts = parts or {}
+    for rel in source.rels.values():
+        related = rel.target_ref if rel.is_external else parts.get(rel.target_part, rel.target_part)
+        target.load_rel(rel.reltype, related, rel.rId, rel.is_external)
+
+
+def _stat_key(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _paragraph_text(paragraph):
+    return ''.join(text.text or '' for text in paragraph.iter(qn('w:t')))
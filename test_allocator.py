@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+import shutil
+import pytest
+from allocator import FileLock, InvoiceNumberAllocator
+
+PROCESSES = 8
+NUMBERS_PER_PROCESS = 25
+
+
+def _allocate(config_path, lease, count, queue):
+    allocator = InvoiceNumberAllocator(config_path, lease=lease)
+    numbers = [allocator.next() for _ in range(count)]
+    allocator.release()
+    queue.put(numbers)
+
+
+def _run(config_path, lease):
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_allocate, args=(config_path, lease, NUMBERS_PER_PROCESS, queue))
+                 for _ in range(PROCESSES)]
+    for process in processes:
+        process.start()
+    numbers = [number for _ in processes for number in queue.get(timeout=60)]
+    for process in processes:
+        process.join()
+    return numbers
+
+
+def test_no_duplicates_no_gaps(tmp_path):
+    config_path = str(tmp_path / 'config.ini')
+    shutil.copy('config.ini', config_path)
+    numbers = _run(config_path, lease=1)
+    assert sorted(numbers) == [str(n).zfill(6) for n in range(1, PROCESSES * NUMBERS_PER_PROCESS + 1)]
+    assert InvoiceNumberAllocator(config_path).next() == str(PROCESSES * NUMBERS_PER_PROCESS + 1).zfill(6)
+
+
+def test_leased_blocks(tmp_path):
+    config_path = str(tmp_path / 'config.ini')
+    shutil.copy('config.ini', config_path)
+    # A lock left behind by a crashed process, which every allocator finds stale at once
+    with open(config_path + '.lock', 'w') as file:
+        file.write('999999')
+    os.utime(config_path + '.lock', (0, 0))
+    numbers = _run(config_path, lease=5)
+    assert len(set(numbers)) == len(numbers) == PROCESSES * NUMBERS_PER_PROCESS
+    assert sorted(numbers) == [str(n).zfill(6) for n in range(1, PROCESSES * NUMBERS_PER_PROCESS + 1)]
+    assert all(numbers[i] < numbers[i + 1] for i in range(NUMBERS_PER_PROCESS - 1))
+    assert not os.path.exists(config_path + '.lock.break')
+
+
+def test_release(tmp_path):
+    config_path = str(tmp_path / 'config.ini')
+    shutil.copy('config.ini', config_path)
+    allocator = InvoiceNumberAllocator(config_path, lease=50)
+    assert allocator.next() == '000001'
+    assert allocator.release() == 49
+    assert InvoiceNumberAllocator(config_path).next() == '000002'
+
+    allocator = InvoiceNumberAllocator(config_path, lease=2)
+    assert [allocator.next() for _ in range(3)] == ['000003', '000004', '000005']
+    assert allocator.give_back(2) and not allocator.give_back(2)
+    assert allocator.next() == '000004'
+    assert allocator.release() == 2
+    assert InvoiceNumberAllocator(config_path).next() == '000005'
+
+    with FileLock(config_path):
+        assert (tmp_path / 'config.ini.lock').exists()
+    assert not (tmp_path / 'config.ini.lock').exists()
+
+
+def test_stale_lock(tmp_path):
+    config_path = str(tmp_path / 'config.ini')
+    lock_path = config_path + '.lock'
+    with open(lock_path, 'w') as file:
+        file.write('999999')
+    os.utime(lock_path, (0, 0))
+
+    # While another process is breaking the stale lock, it is left to that process
+    with open(lock_path + '.break', 'w'):
+        pass
+    with pytest.raises(TimeoutError):
+        with FileLock(config_path, timeout=0.05):
+            pass
+    assert os.path.exists(lock_path)
+
+    os.utime(lock_path + '.break', (0, 0))
+    with FileLock(config_path, timeout=0.05):
+        with open(lock_path) as file:
+            assert file.read() == str(os.getpid())
+    assert not os.path.exists(lock_path) and not os.path.exists(lock_path + '.break')
@@ -0,0 +1,140 @@
+import csv
+import json
+import os
+import shutil
+import subprocess
+import sys
+import pytest
+import batch
+from batch import read_orders, build_order, run_batch
+from catalog import ServiceCatalog
+from journal import recover
+from pdf import is_complete
+
+SERVICES = [{'service': 'Virus Removal', 'price': ' 20.52'}, {'service': 'RAM Upgrade', 'price': ' 75.25'}]
+CATALOG = ServiceCatalog(SERVICES)
+
+
+def test_read_orders(tmp_path):
+    jsonl = tmp_path / 'orders.jsonl'
+    jsonl.write_text('{"cx_name": "smit", "cart": ["Virus Removal x2"]}\n\nnot json\n')
+    orders = list(read_orders(str(jsonl)))
+    assert orders[0] == (1, {'cx_name': 'smit', 'cart': ['Virus Removal x2']})
+    assert orders[1][0] == 3 and isinstance(orders[1][1], ValueError)
+
+    csv_file = tmp_path / 'orders.csv'
+    csv_file.write_text('cx_name,cx_unit,cx_street,cx_city,cx_province,cx_postal,cart\n'
+                        'Smit,,Abc Street,Toronto,ON,A1B 2C3,Virus Removal x2; RAM Upgrade\n')
+    line_no, order = next(read_orders(str(csv_file)))
+    assert order['cx_city'] == 'Toronto'
+    assert order['cart'] == ['Virus Removal x2', ' RAM Upgrade']
+
+
+def test_build_order():
+    order = {'cx_name': 'smit', 'cx_street': 'Abc Street', 'cx_city': 'Toronto', 'cx_province': 'ON',
+             'cx_postal': 'A1B 2C3', 'cart': ['virus removal x2', 'RAM Upgrade', 'Virus Removal x1']}
+    cx_name, cx_address, cart = build_order(order, CATALOG)
+    assert cx_name == 'Smit'
+    assert 'cx_unit' not in cx_address
+    assert cart.to_list() == [['Virus Removal', ' 20.52', 3], ['RAM Upgrade', ' 75.25', 1]]
+
+    with pytest.raises(ValueError, match='Virus Removal'):
+        build_order(dict(order, cart=['Virus Remova']), CATALOG)
+    with pytest.raises(ValueError, match='cx_postal'):
+        build_order(dict(order, cx_postal=''), CATALOG)
+
+
+def test_run_batch(tmp_path, monkeypatch):
+    for name in ('config.ini', 'services_list.csv', 'invoice_template.docx'):
+        shutil.copy(name, tmp_path / name)
+    monkeypatch.chdir(tmp_path)
+    orders = tmp_path / 'orders.jsonl'
+    order = {'cx_name': 'Smit', 'cx_street': 'Abc Street', 'cx_city': 'Toronto', 'cx_province': 'ON',
+             'cx_postal': 'A1B 2C3', 'cart': ['Virus Removal x2']}
+    lines = [json.dumps(order)] * 5
+    lines[2] = json.dumps(dict(order, cart=['Virus Remova']))
+    orders.write_text('\n'.join(lines) + '\n')
+
+    created, failures = run_batch(str(orders), workers=2, chunk_size=1)
+    assert created == 4 and [line_no for line_no, _ in failures] == [3]
+    with open('sales_data.csv') as file:
+        assert [row['invoice_number'] for row in csv.DictReader(file)] == ['000001', '000002', '000003', '000004']
+    assert sorted(os.listdir('invoices')) == ['000001.pdf', '000002.pdf', '000003.pdf', '000004.pdf']
+    assert 'invoice_number = 000005' in (tmp_path / 'config.ini').read_text()
+
+
+def test_run_batch_render_failure(tmp_path, monkeypatch):
+    for name in ('config.ini', 'services_list.csv', 'invoice_template.docx'):
+        shutil.copy(name, tmp_path / name)
+    monkeypatch.chdir(tmp_path)
+    orders = tmp_path / 'orders.jsonl'
+    names = ['Smit', 'Broken', 'Jones', 'Broken', 'Lee']
+    orders.write_text(''.join(json.dumps({'cx_name': name, 'cx_street': 'Abc Street', 'cx_city': 'Toronto',
+                                          'cx_province': 'ON', 'cx_postal': 'A1B 2C3', 'cart': ['RAM Upgrade']}) + '\n'
+                              for name in names))
+    build_invoice = batch.build_invoice
+
+    def failing(invoice_number, date_time, business, cx_name, *args):
+        if cx_name == 'Broken':
+            raise RuntimeError('renderer crashed')
+        return build_invoice(invoice_number, date_time, business, cx_name, *args)
+
+    monkeypatch.setattr(batch, 'build_invoice', failing)
+    created, failures = run_batch(str(orders), chunk_size=1)  # blocks of 4 orders
+    assert created == 3 and failures == [(2, 'renderer crashed'), (4, 'renderer crashed')]
+    with open('sales_data.csv') as file:
+        assert [(row['invoice_number'], row['cx_name']) for row in csv.DictReader(file)] == [
+            ('000001', 'Smit'), ('000002', 'Jones'), ('000003', 'Lee')]
+    assert sorted(os.listdir('invoices')) == ['000001.pdf', '000002.pdf', '000003.pdf']
+    assert 'invoice_number = 000004' in (tmp_path / 'config.ini').read_text()
+
+
+# Runs a batch in a separate process that blocks when it is about to write the second PDF
+CRASHING_BATCH = """
+import sys, time
+sys.path.insert(0, {root!r})
+from batch import run_batch
+from sinks import DirectorySink
+
+write = DirectorySink.write
+
+def stall(sink, name, data):
+    if name == '000002.pdf':
+        print('writing', flush=True)
+        time.sleep(60)
+    return write(sink, name, data)
+
+DirectorySink.write = stall
+run_batch('orders.jsonl')
+"""
+
+
+def test_run_batch_crash_before_write(tmp_path, monkeypatch):
+    root = os.getcwd()
+    for name in ('config.ini', 'services_list.csv', 'invoice_template.docx'):
+        shutil.copy(name, tmp_path / name)
+    monkeypatch.chdir(tmp_path)
+    orders = tmp_path / 'orders.jsonl'
+    order = {'cx_name': 'Smit', 'cx_street': 'Abc Street', 'cx_city': 'Toronto', 'cx_province': 'ON',
+             'cx_postal': 'A1B 2C3', 'cart': ['Virus Removal x2']}
+    orders.write_text((json.dumps(order) + '\n') * 3)
+
+    process = subprocess.Popen([sys.executable, '-c', CRASHING_BATCH.format(root=root)], stdout=subprocess.PIPE)
+    try:
+        assert process.stdout.readline().strip() == b'writing'
+    finally:
+        process.kill()
+        process.wait()
+        process.stdout.close()
+    assert sorted(os.listdir('invoices')) == ['000001.pdf']
+    # A PDF the disk lost part of in a power cut is rendered again too
+    with open(os.path.join('invoices', '000001.pdf'), 'r+b') as file:
+        file.truncate(100)
+
+    report = recover()
+    assert report['segments'] == 1 and report['replayed'] == 0 and report['rendered'] == 3
+    assert report['orphans'] == []
+    assert sorted(os.listdir('invoices')) == ['000001.pdf', '000002.pdf', '000003.pdf']
+    for name in os.listdir('invoices'):
+        with open(os.path.join('invoices', name), 'rb') as file:
+            assert is_complete(file.read())
@@ -0,0 +1,42 @@
+import pickle
+import pytest
+from cart import Cart
+from catalog import ServiceCatalog
+
+
+def test_running_totals():
+    cart = Cart()
+    cart.add('Virus Removal', ' 20.52', 2)
+    cart.add('RAM Upgrade', ' 75.25', 1)
+    cart.add('virus removal', ' 20.52', 1)
+    assert len(cart) == 2
+    assert cart.get('VIRUS REMOVAL').quantity == 3
+    assert (cart.subtotal, cart.tax, cart.total) == ('136.81', '20.52', '157.33')
+
+    cart.remove('Virus Removal', 2)
+    assert cart.subtotal_cents == 9577
+    cart.remove('ram upgrade')
+    assert cart.to_list() == [['Virus Removal', ' 20.52', 1]]
+    assert (cart.subtotal_cents, cart.tax_cents, cart.total_cents) == (2052, 308, 2360)
+
+    with pytest.raises(ValueError):
+        cart.remove('Virus Removal', 5)
+    with pytest.raises(KeyError):
+        cart.remove('RAM Upgrade')
+    cart.clear()
+    assert len(cart) == 0 and cart.total_cents == 0
+
+
+def test_compatible_with_list_items():
+    cart = Cart.from_items([['Virus Removal', ' 20.52', 2]])
+    item = cart.get('Virus Removal')
+    assert (item[0], item[1], item[2]) == ('Virus Removal', ' 20.52', 2)
+    assert str(cart) == "[['Virus Removal', ' 20.52', 2]]"
+    assert pickle.loads(pickle.dumps(cart)).total == cart.total
+
+
+def test_catalog_snapshot_stays_behind_when_pickled():
+    cart = Cart(catalog=ServiceCatalog([{'service': 'Virus Removal', 'price': ' 20.52'}]))
+    cart.add('Virus Removal', ' 20.52', 1)
+    copy = pickle.loads(pickle.dumps(cart))
+    assert copy.catalog is None and copy.total == cart.total and len(cart.catalog) == 1
@@ -0,0 +1,60 @@
+import difflib
+import time
+import pytest
+import catalog
+from catalog import LiveCatalog, ServiceCatalog, get_catalog, normalize
+
+ROWS = [{'service': 'Virus Removal', 'price': ' 20.52'}, {'service': 'Screen Repair', 'price': ' 106.92'},
+        {'service': 'RAM Upgrade', 'price': ' 75.25'}]
+
+
+def test_find():
+    services = ServiceCatalog(ROWS)
+    assert normalize('  screen   REPAIR ') == 'screen repair'
+    assert services.find('screen  repair') == ('Screen Repair', ' 106.92')
+    assert services.find('ram upgrade') == ('RAM Upgrade', ' 75.25')
+    assert services.find('Screen') is None
+    with pytest.raises(TypeError):
+        services.find('ram upgrade')[1] = ' 0.00'
+
+
+def test_suggest_small_catalog_matches_difflib():
+    services = get_catalog('services_list.csv')
+    for item in ('Virus Remova', 'Scren Repair', 'Ram Upgrad', 'Data'):
+        assert services.suggest(item) == difflib.get_close_matches(item, services.names)
+
+
+def test_suggest_indexed(monkeypatch):
+    monkeypatch.setattr(catalog, 'SCAN_LIMIT', 0)
+    monkeypatch.setattr(catalog, 'COMMON_TRIGRAM', 1)
+    services = ServiceCatalog(ROWS)
+    assert services.suggest('Virus Remova') == ['Virus Removal']
+    assert services.suggest('Scren Repai') == ['Screen Repair']
+    assert services.suggest('Xyz') == []
+
+
+def test_live_catalog_reload(tmp_path):
+    path = tmp_path / 'services.csv'
+    path.write_text('Service,Price\nVirus Removal, 20.52\n')
+    live = LiveCatalog(str(path), check_interval=0)
+    cart_catalog = live.current()
+
+    path.write_text('Service,Price\nVirus Removal, 25.00\nRAM Upgrade, 75.25\n')
+    live.current()
+    live.wait()
+    assert live.reloads == 2
+    assert live.current().find('virus removal')[1] == ' 25.00'
+    assert cart_catalog.find('virus removal')[1] == ' 20.52' and cart_catalog.find('RAM Upgrade') is None
+
+    path.write_text('Service,Price\nVirus Removal, 25.00\nRAM Upgrade, 75.25\n')
+    assert not live.reload() and live.reloads == 2
+    path.unlink()
+    assert live.current().find('RAM Upgrade')[1] == ' 75.25'
+
+    # The cart's snapshot is freed on the reaper thread once the cart lets go of it
+    reaped = catalog._reaped
+    del cart_catalog
+    deadline = time.monotonic() + 5
+    while catalog._reaped == reaped and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert catalog._reaped == reaped + 1
@@ -0,0 +1,40 @@
+from customers import CustomerDirectory
+from ledger import Ledger
+
+ADDRESS = {'cx_street': 'Abc Street', 'cx_city': 'Toronto', 'cx_province': 'ON', 'cx_postal': 'A1B 2C3'}
+OTHER = {'cx_unit': '4', 'cx_street': 'Main Street', 'cx_city': 'Ottawa', 'cx_province': 'ON', 'cx_postal': 'K1A 0B1'}
+
+
+def test_remember_and_search(tmp_path):
+    directory = CustomerDirectory(str(tmp_path / 'customers.db'))
+    directory.remember('Smit Patel', ADDRESS, '02-24-2025 07:09 PM')
+    directory.remember('Smit Patel', ADDRESS, '03-01-2025 10:00 AM')
+    directory.remember('Smit Patel', OTHER, '03-02-2025 10:00 AM')
+    directory.remember('Keshav', OTHER, '03-03-2025 10:00 AM')
+    assert len(directory) == 3
+
+    found = directory.search('smi')
+    assert [(c['cx_name'], c['cx_address']['cx_postal'], c['visits']) for c in found] == [
+        ('Smit Patel', 'A1B 2C3', 2), ('Smit Patel', 'K1A 0B1', 1)]
+    assert found[0]['last_visit'] == '03-01-2025 10:00 AM'
+    assert [c['cx_name'] for c in directory.search('PAT')] == ['Smit Patel', 'Smit Patel']
+    assert [c['cx_name'] for c in directory.search('smit  p')] == ['Smit Patel', 'Smit Patel']
+    assert [c['cx_name'] for c in directory.search('k1a 0')] == ['Smit Patel', 'Keshav']
+    assert [c['cx_name'] for c in directory.search('k')] == ['Keshav', 'Smit Patel']
+    assert directory.search('k', limit=1) == directory.search('kesh')
+    assert directory.search('zz') == [] and directory.search('  ') == []
+
+
+def test_import_sales(tmp_path):
+    directory = CustomerDirectory(str(tmp_path / 'customers.db'))
+    assert directory.import_sales('sales_data.csv') == 1
+    assert directory.search('zxc')[0]['cx_address']['cx_postal'] == 'ZXC VBN'
+
+    ledger = Ledger(str(tmp_path / 'sales.db'))
+    ledger.record('000001', '02-24-2025 07:09 PM', 'Smit', ADDRESS, [['RAM Upgrade', ' 75.25', 1]], '$ 86.54')
+    ledger.record('000002', '02-25-2025 07:09 PM', 'Smit', ADDRESS, [['RAM Upgrade', ' 75.25', 1]], '$ 86.54')
+    ledger.close()
+    directory = CustomerDirectory(str(tmp_path / 'from_ledger.db'))
+    assert directory.import_sales(str(tmp_path / 'sales.db')) == 2
+    assert directory.search('smit') == [{'cx_name': 'Smit', 'cx_address': ADDRESS, 'visits': 2,
+                                         'last_visit': '02-25-2025 07:09 PM'}]
@@ -0,0 +1,51 @@
+import os
+import shutil
+import threading
+
+from client import DaemonClient
+from daemon import InvoiceDaemon
+from ledger import Ledger
+
+ORDER = {'cx_name': 'Smit', 'cx_street': 'Abc Street', 'cx_city': 'Toronto', 'cx_province': 'ON',
+         'cx_postal': 'A1B 2C3', 'cart': ['Virus Removal x2', 'RAM Upgrade']}
+
+
+def test_daemon(tmp_path, monkeypatch):
+    for name in ('config.ini', 'services_list.csv', 'invoice_template.docx'):
+        shutil.copy(name, tmp_path / name)
+    monkeypatch.chdir(tmp_path)
+
+    daemon = InvoiceDaemon('test.sock')
+    thread = threading.Thread(target=daemon.serve_forever)
+    thread.start()
+    try:
+        with DaemonClient('test.sock') as client:
+            assert client.ping()['ok']
+
+            first = client.invoice(ORDER)
+            second = client.invoice(ORDER)
+            assert first['ok'] and second['ok']
+            assert int(second['invoice_number']) == int(first['invoice_number']) + 1
+            assert first['total'] == '133.73'
+            assert os.path.isfile(first['location'])
+            ledger = Ledger()
+            assert ledger.get(first['invoice_number'])['cx_name'] == 'Smit'
+            ledger.close()
+
+            response = client.invoice(dict(ORDER, cart=['Virus Remova']))
+            assert not response['ok'] and 'Virus Removal' in response['error']
+            assert client.request({'op': 'shutdown'}) == {'ok': False, 'error': "unknown op 'shutdown'"}
+    finally:
+        daemon.shutdown()
+        daemon.server_close()
+        thread.join()
+    assert not os.path.exists('test.sock')
+
+
+def test_client_without_daemon(tmp_path):
+    try:
+        DaemonClient(str(tmp_path / 'missing.sock'))
+    except ConnectionError as e:
+        assert 'python daemon.py' in str(e)
+    else:
+        raise AssertionError('expected ConnectionError')
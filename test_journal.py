@@ -0,0 +1,59 @@
+import csv
+import os
+import shutil
+import threading
+from configparser import ConfigParser
+
+from journal import CheckoutJournal, encode, recover, sale_record
+from ledger import Ledger
+
+ADDRESS = {'cx_street': 'Abc Street', 'cx_city': 'Toronto', 'cx_province': 'ON', 'cx_postal': 'A1B 2C3'}
+CART = [['Virus Removal', ' 20.52', 2]]
+
+
+def sale(number, pdf=None):
+    return sale_record(f'{number:06d}', '02-24-2025 07:09 PM', 'Smit', ADDRESS, CART, '$ 47.20', pdf)
+
+
+def test_group_commit(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    journal = CheckoutJournal(commit_interval=0.05)
+    threads = [threading.Thread(target=journal.commit, args=(sale(number),)) for number in range(1, 21)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert journal.groups < 20
+    assert len(Ledger().by_customer('Smit')) == 20
+    journal.close()
+    assert os.listdir('journal') == []
+    with open('sales_data.csv', newline='') as file:
+        assert sorted(row['invoice_number'] for row in csv.DictReader(file)) == [f'{n:06d}' for n in range(1, 21)]
+
+
+def test_recover_crashed_segment(tmp_path, monkeypatch):
+    for name in ('config.ini', 'invoice_template.docx'):
+        shutil.copy(name, tmp_path / name)
+    monkeypatch.chdir(tmp_path)
+    live = CheckoutJournal()
+    live.commit(sale(1))
+
+    os.makedirs('invoices')
+    with open(os.path.join('invoices', '000099.pdf'), 'wb') as file:
+        file.write(b'%PDF')
+    parser = ConfigParser()
+    parser.read('config.ini')
+    pdf = {'path': os.path.abspath(os.path.join('invoices', '000042.pdf')), 'business': dict(parser['business_data']),
+           'renderer': 'pdf'}
+    with open(os.path.join('journal', '1-1.log'), 'wb') as file:
+        file.write(encode(sale(41)) + encode(sale(42, pdf)) + encode(sale(43))[:-9])
+
+    report = recover()
+    assert report['segments'] == 1 and report['replayed'] == 2 and report['rendered'] == 1 and report['torn'] == 1
+    assert report['orphans'] == ['000099.pdf'] and report['counter'] == (1, 43)
+    assert Ledger().get('000042')['total'] == '$ 47.20'
+    with open(os.path.join('invoices', '000042.pdf'), 'rb') as file:
+        assert file.read().startswith(b'%PDF')
+    assert os.listdir('journal') == [os.path.basename(live.path)]
+    assert recover()['replayed'] == 0
+    live.close()
@@ -0,0 +1,59 @@
+import datetime as dt
+import sqlite3
+from ledger import Ledger, to_cents
+
+CART = [['Virus Removal', ' 20.52', 2], ['RAM Upgrade', ' 75.25', 1]]
+ADDRESS = {'cx_street': 'Abc Street', 'cx_city': 'Toronto', 'cx_province': 'ON', 'cx_postal': 'A1B 2C3'}
+
+
+def test_to_cents():
+    assert to_cents(' 20.52') == 2052
+    assert to_cents('$ 198.72') == 19872
+    assert to_cents('0.1') == 10
+
+
+def test_ledger_lookups(tmp_path):
+    ledger = Ledger(str(tmp_path / 'sales.db'))
+    ledger.record('000001', '02-24-2025 07:09 PM', 'Smit', ADDRESS, CART, '$ 133.73')
+    ledger.record('000002', '02-25-2025 09:15 AM', 'Keshav', ADDRESS, CART[:1], '$ 47.20')
+    ledger.record('000003', '03-01-2025 11:59 PM', 'Smit', ADDRESS, CART[1:], '$ 86.54')
+
+    sale = ledger.get('000001')
+    assert sale['cart'] == CART and sale['business'] is None
+    assert sale['cx_address'] == ADDRESS and sale['total'] == '$ 133.73'
+    assert ledger.get('000009') is None
+    assert [s['invoice_number'] for s in ledger.by_customer('smit')] == ['000001', '000003']
+    assert [s['invoice_number'] for s in ledger.by_date(dt.date(2025, 2, 25), dt.date(2025, 3, 1))] == ['000002', '000003']
+
+
+def test_migrate_csv(tmp_path):
+    ledger = Ledger(str(tmp_path / 'sales.db'))
+    assert ledger.migrate_csv('sales_data.csv') == 1
+    assert ledger.migrate_csv('sales_data.csv') == 1
+    sale = ledger.get('000000')
+    assert sale['cx_address']['cx_postal'] == 'ZXC VBN'
+    assert len(sale['cart']) == 4 and sale['total'] == '$ 198.72'
+
+
+def test_older_ledger_gains_new_columns(tmp_path):
+    path = str(tmp_path / 'sales.db')
+    connection = sqlite3.connect(path)
+    connection.executescript('''
+        CREATE TABLE invoices (invoice_number TEXT PRIMARY KEY, date_time TEXT NOT NULL, sold_at TEXT NOT NULL,
+                               cx_name TEXT NOT NULL, cx_address TEXT NOT NULL, total_cents INTEGER NOT NULL);
+        CREATE TABLE line_items (invoice_number TEXT NOT NULL, position INTEGER NOT NULL, service TEXT NOT NULL,
+                                 unit_cents INTEGER NOT NULL, quantity INTEGER NOT NULL,
+                                 PRIMARY KEY (invoice_number, position)) WITHOUT ROWID;
+        INSERT INTO invoices VALUES ('000001', '02-24-2025 07:09 PM', '2025-02-24 19:09', 'Smit', '{}', 4720);
+        INSERT INTO line_items VALUES ('000001', 0, 'Virus Removal', 2052, 2);
+    ''')
+    connection.commit()
+    connection.close()
+
+    ledger = Ledger(path)
+    assert ledger.get('000001')['cart'] == [['Virus Removal', '20.52', 2]]
+    ledger.record('000002', '02-25-2025 09:15 AM', 'Keshav', ADDRESS, CART[:1], '$ 47.20',
+                  {'path': None, 'business': {'business_name': 'Keshav Tech'}, 'renderer': 'pdf'})
+    sale = ledger.get('000002')
+    assert sale['cart'] == CART[:1] and sale['business'] == {'business_name': 'Keshav Tech'}
+    assert sale['renderer'] == 'pdf'
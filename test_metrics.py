@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.disable()
+    metrics.reset()
+
+
+@metrics.timed('square')
+def square(value):
+    if value < 0:
+        raise ValueError(value)
+    return value * value
+
+
+def test_disabled_records_nothing():
+    assert square(3) == 9
+    metrics.count('invoices')
+    assert metrics.snapshot()['stages'] == {}
+    assert metrics.snapshot()['counters'] == {}
+
+
+def test_timed_and_counters():
+    metrics.enable()
+    assert square(3) == 9
+    with pytest.raises(ValueError):
+        square(-1)
+    metrics.count('invoices')
+    metrics.count('lines', 12)
+
+    snapshot = metrics.snapshot()
+    assert snapshot['stages']['square']['count'] == 2
+    assert snapshot['stages']['square']['buckets']['+Inf'] == 2
+    assert snapshot['counters'] == {'invoices': 1, 'lines': 12}
+    assert snapshot['errors'] == {'square': 1}
+
+    text = metrics.prometheus()
+    assert 'invoice_stage_seconds_count{stage="square"} 2' in text
+    assert 'invoice_stage_seconds_bucket{stage="square",le="+Inf"} 2' in text
+    assert 'invoice_lines_total 12' in text
+    assert 'invoice_errors_total{stage="square"} 1' in text
+
+
+def test_histogram_buckets():
+    histogram = metrics.Histogram()
+    for seconds in (0.00001, 0.003, 0.003, 60.0):
+        histogram.observe(seconds)
+    buckets = dict(histogram.cumulative())
+    assert buckets['1e-05'] == 1
+    assert buckets['0.0025'] == 1
+    assert buckets['0.005'] == 3
+    assert buckets['10'] == 3
+    assert buckets['+Inf'] == 4
+    assert histogram.max == 60.0
+
+
+def test_write(tmp_path):
+    metrics.enable()
+    square(2)
+    metrics.write(str(tmp_path / 'metrics.json'))
+    metrics.write(str(tmp_path / 'metrics.prom'))
+    with open(tmp_path / 'metrics.json') as file:
+        assert json.load(file)['stages']['square']['count'] == 1
+    with open(tmp_path / 'metrics.prom') as file:
+        assert '# TYPE invoice_stage_seconds histogram' in file.read()
+
+
+def test_profile_keeps_slowest(tmp_path):
+    with metrics.profile('000001'):
+        pass
+    metrics.enable(profile_slowest=2)
+    for key, size in (('000001', 10), ('000002', 100000), ('000003', 1), ('000004', 200000)):
+        with metrics.profile(key):
+            sum(range(size))
+    traces = metrics.dump_profiles(str(tmp_path))
+    assert [os.path.basename(path) for path, _ in traces] == ['000004.prof', '000002.prof']
+
+
+def test_threads_lose_no_updates():
+    metrics.enable()
+
+    def record():
+        for _ in range(2000):
+            metrics.count('invoices')
+            metrics.observe('render', 0.001)
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert metrics.snapshot()['counters']['invoices'] == 16000
+    assert metrics.snapshot()['stages']['render']['count'] == 16000
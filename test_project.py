@@ -1,5 +1,6 @@
-from project import suggest_item, add_to_cart, remove_from_cart
+from project import suggest_item, add_to_cart, remove_from_cart, build_invoice, get_cx_details
 from _pytest.monkeypatch import MonkeyPatch
+from customers import get_directory
 
 
 def test_suggest_item():
@@ -20,3 +21,35 @@ def test_remove_from_cart():
     assert remove_from_cart(item_name='apple', cart=[['apple', 2.39, 7]]) == [['apple', 2.39, 4]]
     # If item not in cart
     assert remove_from_cart(item_name='banana', cart=[['apple', 2.39, 7]]) == 0
+
+
+def test_build_invoice():
+    cart = [['Virus Removal', ' 20.52', 2], ['RAM Upgrade', ' 75.25', 1]]
+    address = {'cx_unit': '1', 'cx_street': 'Abc Street', 'cx_city': 'Toronto', 'cx_province': 'ON', 'cx_postal': 'A1B 2C3'}
+    invoice = build_invoice('000001', '02-24-2025 07:09 PM', {}, 'Smit', address, cart)
+    assert invoice['cx_street'] == '1 - Abc Street'
+    assert invoice['lines'] == [('Virus Removal', '2', '$  20.52', '$ 41.04'), ('RAM Upgrade', '1', '$  75.25', '$ 75.25')]
+    assert invoice['subtotal'] == '$ 116.29'
+    assert invoice['total_tax'] == '$ 17.44'
+    assert invoice['balance_due'] == '$ 133.73'
+
+
+def test_get_cx_details():
+    # Invalid answers are asked again, valid ones normalized
+    answers = iter(['smit 2', 'smit', '', 'abc street', 'toronto', 'toronto, on', 'a1b', 'a1b 2c3'])
+    monkeypatch = MonkeyPatch()
+    monkeypatch.setattr('builtins.input', lambda _: next(answers))
+    assert get_cx_details() == ('Smit', {'cx_street': 'Abc Street', 'cx_city': 'Toronto', 'cx_province': 'ON', 'cx_postal': 'A1B 2C3'})
+    monkeypatch.undo()
+
+
+def test_get_cx_details_returning_customer(tmp_path):
+    # A known customer is picked with /prefix instead of retyping the address
+    address = {'cx_street': 'Abc Street', 'cx_city': 'Toronto', 'cx_province': 'ON', 'cx_postal': 'A1B 2C3'}
+    monkeypatch = MonkeyPatch()
+    monkeypatch.chdir(tmp_path)
+    get_directory().remember('Smit', address, '02-24-2025 07:09 PM')
+    answers = iter(['/zz', '/smi', '1'])
+    monkeypatch.setattr('builtins.input', lambda _: next(answers))
+    assert get_cx_details() == ('Smit', address)
+    monkeypatch.undo()
@@ -0,0 +1,63 @@
+import pytest
+from pdf import PdfReader
+from renderers import CARRIED_FORWARD, FIRST_PAGE_ROWS, PAGE_ROWS, get_renderer, invoice_replacements
+from template import get_template
+
+BUSINESS = {'business_name': 'Keshav Tech', 'business_street_address': '123 Tech Street',
+            'business_city_province': 'Tech City, TP', 'business_email_address': 'contact@test.test',
+            'business_contact': '+1-123-456-7890', 'business_payment_recipient': 'Tech Ltd.',
+            'business_payment_bank': 'Tech Bank', 'business_payment_iban': 'XX1234567890',
+            'business_payment_bic': 'TCHBANKX'}
+INVOICE = {'invoice_number': '000042', 'date_time': '02-24-2025 07:09 PM', 'business': BUSINESS,
+           'cx_name': 'Smit', 'cx_street': '1 - Abc Street', 'cx_city': 'Toronto', 'cx_province': 'ON',
+           'cx_postal': 'A1B 2C3', 'lines': [('Virus Removal', '2', '$  20.52', '$ 41.04')],
+           'running_subtotals': ['$ 41.04'], 'tax_rate': '15.00',
+           'subtotal': '$ 41.04', 'total_tax': '$ 6.16', 'balance_due': '$ 47.20'}
+
+
+def test_invoice_replacements():
+    replacements = invoice_replacements(INVOICE)
+    assert set(get_template('invoice_template.docx').placeholders) <= set(replacements)
+    assert replacements['[IBAN]'] == 'XX1234567890'
+
+
+def test_pdf_renderer():
+    renderer = get_renderer('pdf')
+    assert get_renderer('pdf') is renderer
+    pdf = renderer.render_bytes(INVOICE)
+    assert pdf.startswith(b'%PDF-1.4') and pdf.endswith(b'%%EOF\n')
+    assert pdf.count(b'/Type /Page ') == 1
+
+    many_lines = dict(INVOICE, lines=INVOICE['lines'] * 100, running_subtotals=INVOICE['running_subtotals'] * 100)
+    assert renderer.render_bytes(many_lines).count(b'/Type /Page ') == 4
+
+
+def test_compact_pdf_renderer():
+    many_lines = dict(INVOICE, lines=INVOICE['lines'] * 100, running_subtotals=INVOICE['running_subtotals'] * 100)
+    for invoice, pages in ((INVOICE, 1), (many_lines, 4)):
+        pdf = get_renderer('pdf').render_bytes(invoice)
+        compact = get_renderer('pdf-compact').render_bytes(invoice)
+        assert compact.startswith(b'%PDF-1.5') and b'/Type /ObjStm' in compact and b'/Type /XRef' in compact
+        assert len(compact) < len(pdf)
+        reader = PdfReader(compact)
+        assert len(reader.pages()) == pages
+        assert reader.object(reader.root)[0] == b'<< /Type /Catalog /Pages 2 0 R >>'
+
+
+def test_docx_item_table():
+    count = FIRST_PAGE_ROWS + PAGE_ROWS + 5
+    lines = [(f'Service {i}', '1', '$  1.00', '$ 1.00') for i in range(count)]
+    running_subtotals = [f'$ {i + 1}.00' for i in range(count)]
+    doc = get_renderer('docx').build_document(dict(INVOICE, lines=lines, running_subtotals=running_subtotals))
+    rows = [[cell.text for cell in row.cells] for row in doc.tables[1].rows]
+    assert rows[0][0] == 'DESCRIPTION' and doc.tables[1].rows[0]._tr.trPr is not None
+    assert rows[1] == ['Service 0', '1', '$  1.00', '$ 1.00']
+    assert rows[FIRST_PAGE_ROWS + 1] == [CARRIED_FORWARD, '', '', f'$ {FIRST_PAGE_ROWS}.00']
+    assert rows[FIRST_PAGE_ROWS + 2][0] == f'Service {FIRST_PAGE_ROWS}'
+    assert [row[0] for row in rows].count(CARRIED_FORWARD) == 2
+    assert rows[-2][0] == f'Service {count - 1}' and rows[-1] == ['', '', '', '']
+
+
+def test_unknown_renderer():
+    with pytest.raises(ValueError):
+        get_renderer('latex')
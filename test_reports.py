@@ -0,0 +1,37 @@
+from ledger import Ledger
+from reports import SalesReport, parse_cents, read_csv_sales, read_ledger_sales
+
+ADDRESS = {'cx_street': 'Abc Street', 'cx_city': 'Toronto', 'cx_province': 'ON', 'cx_postal': 'A1B 2C3'}
+
+
+def test_parse_cents():
+    assert parse_cents('$ 198.72') == 19872
+    assert parse_cents(' 20.5') == 2050
+    assert parse_cents('7') == 700
+
+
+def test_csv_report():
+    report = SalesReport()
+    for batch in read_csv_sales('sales_data.csv'):
+        report.add_batch(batch)
+    assert report.invoices == 1 and report.items == 4
+    assert report.revenue == 17280 and report.tax == 2592
+    assert report.by_service['RAM Upgrade'] == 7525
+    assert report.by_month == {'2025-02': 17280}
+    assert report.by_province == {'QW': 17280}
+
+
+def test_ledger_report(tmp_path):
+    path = str(tmp_path / 'sales.db')
+    ledger = Ledger(path)
+    ledger.record('000001', '02-24-2025 07:09 PM', 'Smit', ADDRESS, [['Virus Removal', ' 20.52', 2]], '$ 47.20')
+    ledger.record('000002', '03-02-2025 10:00 AM', 'Smit', ADDRESS, [['RAM Upgrade', ' 75.25', 1]], '$ 86.54')
+    ledger.close()
+
+    report = SalesReport()
+    for batch in read_ledger_sales(path, batch_size=1):
+        assert len(batch) == 1
+        report.add_batch(batch)
+    assert report.revenue == 11629 and report.tax == 1745
+    assert report.by_day == {'2025-02-24': 4104, '2025-03-02': 7525}
+    assert report.by_month == {'2025-02': 4104, '2025-03': 7525}
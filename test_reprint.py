@@ -0,0 +1,50 @@
+import os
+import shutil
+import pytest
+from cart import Cart
+from ledger import get_ledger
+from project import create_invoice
+from reprint import ReprintCache, reprint
+
+ADDRESS = {'cx_street': 'Abc Street', 'cx_city': 'Toronto', 'cx_province': 'ON', 'cx_postal': 'A1B 2C3'}
+
+
+def test_reprint(tmp_path, monkeypatch):
+    for name in ('config.ini', 'invoice_template.docx'):
+        shutil.copy(name, tmp_path / name)
+    monkeypatch.chdir(tmp_path)
+    invoice_number = create_invoice('Smit', ADDRESS, Cart.from_items([['Virus Removal', ' 20.52', 2]]))
+    path = os.path.join('invoices', f'{invoice_number}.pdf')
+    with open(path, 'rb') as file:
+        issued = file.read()
+    sale = get_ledger().get(invoice_number)
+    assert sale['cart'] == [['Virus Removal', ' 20.52', 2]] and sale['business']['business_name'] == 'Keshav Tech'
+
+    config = tmp_path / 'config.ini'
+    config.write_text(config.read_text().replace('business_name = ', 'business_name = New '))
+    cache = ReprintCache()
+    assert reprint(invoice_number, cache) == (issued, 'stored')
+
+    # Without the stored PDF, the invoice is rendered again as it was issued, not with the new config.ini
+    os.remove(path)
+    data, source = reprint(invoice_number, cache)
+    assert source == 'rendered' and data == issued
+    assert reprint(invoice_number, cache) == (data, 'cache')
+    assert reprint(invoice_number, ReprintCache()) == (data, 'cache')
+    assert cache.hit_rate() == 0.5 and cache.stats['bytes_saved'] == len(data)
+
+    with open(path, 'wb') as file:
+        file.write(issued[:len(issued) // 2])
+    assert reprint(invoice_number, cache) == (data, 'cache')
+    with pytest.raises(KeyError):
+        reprint('000099', cache)
+
+
+def test_lru_eviction(tmp_path):
+    cache = ReprintCache(str(tmp_path), max_bytes=25)
+    cache.put('a', b'x' * 10)
+    cache.put('b', b'x' * 10)
+    assert cache.get('a') is not None
+    cache.put('c', b'x' * 10)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['a.pdf', 'c.pdf']
+    assert cache.size == 20 and len(ReprintCache(str(tmp_path))) == 2
@@ -0,0 +1,92 @@
+import asyncio
+import csv
+import json
+import shutil
+import batch
+from service import InvoiceService
+
+ORDER = {'cx_name': 'Smit', 'cx_street': 'Abc Street', 'cx_city': 'Toronto', 'cx_province': 'ON',
+         'cx_postal': 'A1B 2C3', 'cart': ['Virus Removal x2', 'RAM Upgrade']}
+
+
+async def request(port, method, path, payload=None):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    body = json.dumps(payload).encode() if payload is not None else b''
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n'
+                 f'Connection: close\r\n\r\n'.encode() + body)
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while (line := await reader.readline()) != b'\r\n':
+        name, _, value = line.decode().partition(':')
+        headers[name.lower()] = value.strip()
+    body = await reader.readexactly(int(headers['content-length']))
+    writer.close()
+    return status, headers, body
+
+
+def test_service(tmp_path, monkeypatch):
+    for name in ('config.ini', 'services_list.csv', 'invoice_template.docx'):
+        shutil.copy(name, tmp_path / name)
+    monkeypatch.chdir(tmp_path)
+
+    async def scenario():
+        service = InvoiceService(workers=2, batch_size=2)
+        server = await service.start('127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            status, _, body = await request(port, 'POST', '/price', {'cart': ['virus removal x2', 'RAM Upgrade']})
+            assert status == 200
+            assert json.loads(body)['subtotal'] == '116.29' and json.loads(body)['total'] == '133.73'
+
+            status, _, body = await request(port, 'POST', '/price', {'cart': ['Virus Remova']})
+            assert status == 400 and 'Virus Removal' in json.loads(body)['error']
+            assert (await request(port, 'GET', '/nowhere'))[0] == 404
+
+            results = await asyncio.gather(*(request(port, 'POST', '/invoice', ORDER) for _ in range(6)))
+            assert all(status == 200 and body.startswith(b'%PDF') for status, _, body in results)
+            numbers = sorted(headers['x-invoice-number'] for _, headers, _ in results)
+            assert numbers == ['000001', '000002', '000003', '000004', '000005', '000006']
+            assert service.batches < 6
+            return numbers
+        finally:
+            await service.close()
+
+    numbers = asyncio.run(scenario())
+    assert len(list((tmp_path / 'invoices').iterdir())) == 6
+    assert 'invoice_number = 000007' in (tmp_path / 'config.ini').read_text()
+    with open(tmp_path / 'sales_data.csv', newline='') as file:
+        assert [row['invoice_number'] for row in csv.DictReader(file)] == numbers
+
+
+def test_service_render_failure(tmp_path, monkeypatch):
+    for name in ('config.ini', 'services_list.csv', 'invoice_template.docx'):
+        shutil.copy(name, tmp_path / name)
+    monkeypatch.chdir(tmp_path)
+    build_invoice = batch.build_invoice
+
+    def failing(invoice_number, date_time, business, cx_name, *args):
+        if cx_name == 'Broken':
+            raise RuntimeError('renderer crashed')
+        return build_invoice(invoice_number, date_time, business, cx_name, *args)
+
+    monkeypatch.setattr(batch, 'build_invoice', failing)  # inherited by the forked workers
+
+    async def scenario():
+        service = InvoiceService(workers=2, batch_size=2)
+        server = await service.start('127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            names = ['Smit', 'Broken', 'Jones', 'Broken', 'Lee', 'Wong']
+            return await asyncio.gather(*(request(port, 'POST', '/invoice', dict(ORDER, cx_name=name))
+                                          for name in names))
+        finally:
+            await service.close()
+
+    results = asyncio.run(scenario())
+    assert [status for status, _, _ in results] == [200, 500, 200, 500, 200, 200]
+    numbers = sorted(headers['x-invoice-number'] for status, headers, _ in results if status == 200)
+    assert numbers == ['000001', '000002', '000003', '000004']
+    assert sorted(path.name for path in (tmp_path / 'invoices').iterdir()) == [f'{n}.pdf' for n in numbers]
+    assert 'invoice_number = 000005' in (tmp_path / 'config.ini').read_text()
+    with open(tmp_path / 'sales_data.csv', newline='') as file:
+        assert [row['invoice_number'] for row in csv.DictReader(file)] == numbers
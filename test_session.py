@@ -0,0 +1,77 @@
+import asyncio
+import csv
+import os
+import shutil
+
+from session import MENU, Session, SessionServer, run_script
+
+CUSTOMER = ['Smit', '', 'Abc Street', 'Toronto, ON', 'A1B 2C3']
+
+
+def copy_config(tmp_path, monkeypatch):
+    for name in ('config.ini', 'services_list.csv', 'invoice_template.docx'):
+        shutil.copy(name, tmp_path / name)
+    monkeypatch.chdir(tmp_path)
+
+
+def test_session_checkout(tmp_path, monkeypatch):
+    copy_config(tmp_path, monkeypatch)
+    session = Session('Keshav Tech')
+    transcript = run_script(CUSTOMER + ['1', 'Virus Removal x2', 'Y', 'Ram Upgrad', 'RAM Upgrade', 'N',
+                                        '5', 'virus removal', '3', '1', '4', 'Y', 'N'], session)
+    assert session.done and len(session.invoices) == 1
+    assert os.path.isfile(os.path.join('invoices', f'{session.invoices[0]}.pdf'))
+    assert 'Welcome, Smit 😎' in transcript
+    assert 'Do you mean something like: RAM Upgrade?' in transcript
+    assert 'You have 2 Virus Removal\nHow many you want to remove? : 3\n❌ Incorrect Quantity!' in transcript
+    assert '✅ Virus Removal has been updated! Quantity: 1' in transcript
+    assert 'Smit, confirm checkout? (Y/N): Y\n' in transcript and transcript.endswith('Good Bye! 👋🏻\n\n')
+
+    session = Session('Keshav Tech')
+    run_script(['/smi', '1', '4', '3', 'q'], session)
+    assert session.cx_address['cx_postal'] == 'A1B 2C3' and session.state == MENU
+
+
+def test_long_shift_keeps_a_flat_stack(tmp_path, monkeypatch):
+    copy_config(tmp_path, monkeypatch)
+    session = Session('Keshav Tech')
+    run_script(CUSTOMER + ['1', 'L', 'Q', '2', '7', '5'] * 2000, session)
+    assert session.state == MENU and len(session.cart) == 0
+
+
+def test_session_server(tmp_path, monkeypatch):
+    copy_config(tmp_path, monkeypatch)
+
+    async def cashier(port, lines):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        transcript = b''
+        for line in lines:
+            transcript += await reader.readuntil(b': ')
+            writer.write(f'{line}\r\n'.encode())
+        transcript += await reader.read()
+        writer.close()
+        return transcript.decode()
+
+    async def scenario():
+        session_server = SessionServer(max_sessions=6, workers=4)
+        server = await session_server.start('127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            first, second = await asyncio.gather(
+                cashier(port, CUSTOMER + ['1', 'Virus Removal', 'N', '4', 'Y', 'N']),
+                cashier(port, CUSTOMER + ['3', '6']))
+            assert 'Thank you for shopping with us!' in first and first.endswith('Good Bye! 👋🏻\n\n')
+            assert 'Your 🛒 is Empty!' in second and second.endswith('Good Bye! 👋🏻\n\n')
+            assert session_server.sessions == 2 and session_server.active == 0
+
+            # Returning customers, looked up and checked out by several sessions at once
+            lines = ['/smi', '1', '1', 'Virus Removal', 'N', '4', 'Y', 'N']
+            transcripts = await asyncio.gather(*(cashier(port, lines) for _ in range(6)))
+            assert all('Welcome, Smit 😎' in text and 'Thank you for shopping with us!' in text for text in transcripts)
+        finally:
+            await session_server.close()
+
+    asyncio.run(scenario())
+    with open('sales_data.csv', newline='') as file:
+        numbers = [row['invoice_number'] for row in csv.DictReader(file)]
+    assert sorted(numbers) == [str(n).zfill(6) for n in range(1, 8)]
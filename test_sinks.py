@@ -0,0 +1,71 @@
+import os
+import shutil
+import tarfile
+import zipfile
+from configparser import ConfigParser
+from cart import Cart
+from pdfpack import PackReader
+from project import build_invoice, render_invoice
+from renderers import get_renderer
+from sinks import BytesSink, DirectorySink, PackSink, TarSink, ZipSink, open_sink
+
+ADDRESS = {'cx_street': 'Abc Street', 'cx_city': 'Toronto', 'cx_province': 'ON', 'cx_postal': 'A1B 2C3'}
+
+
+def test_sinks(tmp_path):
+    directory = open_sink(str(tmp_path / 'out'))
+    assert isinstance(directory, DirectorySink)
+    assert directory.write('000001.pdf', b'%PDF') == str(tmp_path / 'out' / '000001.pdf')
+    assert (tmp_path / 'out' / '000001.pdf').read_bytes() == b'%PDF'
+
+    for run in range(2):
+        with open_sink(str(tmp_path / 'out.zip')) as sink:
+            assert isinstance(sink, ZipSink)
+            sink.write(f'00000{run}.pdf', b'%PDF')
+    assert zipfile.ZipFile(tmp_path / 'out.zip').namelist() == ['000000.pdf', '000001.pdf']
+
+    for run in range(2):
+        with open_sink(str(tmp_path / 'out.tar')) as sink:
+            assert isinstance(sink, TarSink)
+            sink.write(f'00000{run}.pdf', b'%PDF')
+    with tarfile.open(tmp_path / 'out.tar') as archive:
+        assert archive.getnames() == ['000000.pdf', '000001.pdf']
+        assert archive.extractfile('000001.pdf').read() == b'%PDF'
+
+
+def test_render_to_bytes(tmp_path, monkeypatch):
+    parser = ConfigParser()
+    parser.read('config.ini')
+    shutil.copy('invoice_template.docx', tmp_path / 'invoice_template.docx')
+    monkeypatch.chdir(tmp_path)
+
+    sink = BytesSink()
+    cart = Cart.from_items([['Virus Removal', ' 20.52', 2]])
+    invoice = render_invoice('000042', '02-24-2025 07:09 PM', dict(parser['business_data']), 'Smit', ADDRESS, cart,
+                             'pdf', sink)
+    assert invoice['balance_due'] == '$ 47.20'
+    assert list(sink.files) == ['000042.pdf'] and sink.files['000042.pdf'].startswith(b'%PDF')
+    assert os.listdir(tmp_path) == ['invoice_template.docx']
+
+
+def test_pack_sink(tmp_path):
+    parser = ConfigParser()
+    parser.read('config.ini')
+    invoices = {}
+    for number, name in enumerate(('pdf', 'pdf-compact', 'pdf', 'pdf-compact'), 1):
+        invoice = build_invoice(f'{number:06d}', '02-24-2025 07:09 PM', dict(parser['business_data']), 'Smit', ADDRESS,
+                                [['Virus Removal', ' 20.52', number]])
+        invoices[f'{number:06d}.pdf'] = get_renderer(name).render_bytes(invoice)
+    invoices['000005.pdf'] = b'%PDF'
+
+    for run, names in enumerate((list(invoices)[:2], list(invoices)[2:])):
+        with open_sink(str(tmp_path / 'out.pdfpack')) as sink:
+            assert isinstance(sink, PackSink)
+            for name in names:
+                sink.write(name, invoices[name])
+    resources = [name for name in zipfile.ZipFile(tmp_path / 'out.pdfpack').namelist() if name.startswith('resources/')]
+    assert len(resources) == 4  # the logo and its mask, once per renderer
+    with PackReader(str(tmp_path / 'out.pdfpack')) as pack:
+        assert pack.names() == list(invoices)
+        assert all(pack.read(name) == data for name, data in invoices.items())
+    assert os.path.getsize(tmp_path / 'out.pdfpack') < sum(map(len, invoices.values()))
@@ -0,0 +1,44 @@
+import datetime as dt
+import os
+import shutil
+from configparser import ConfigParser
+
+from ledger import Ledger
+from pdf import PdfReader
+from project import build_invoice
+from renderers import get_renderer
+from statements import month_range, write_statement
+
+ADDRESS = {'cx_street': 'Abc Street', 'cx_city': 'Toronto', 'cx_province': 'ON', 'cx_postal': 'A1B 2C3'}
+
+
+def test_write_statement(tmp_path, monkeypatch):
+    for name in ('config.ini', 'invoice_template.docx'):
+        shutil.copy(name, tmp_path / name)
+    monkeypatch.chdir(tmp_path)
+    parser = ConfigParser()
+    parser.read('config.ini')
+    ledger = Ledger()
+    os.makedirs('invoices')
+    for number, date_time, cx_name in (('000001', '01-31-2025 09:00 AM', 'Acme Corp'),
+                                       ('000002', '02-03-2025 10:15 AM', 'Acme Corp'),
+                                       ('000003', '02-04-2025 11:30 AM', 'Smit'),
+                                       ('000004', '02-28-2025 05:45 PM', 'ACME CORP')):
+        cart = [[f'Service {line}', ' 20.52', 2] for line in range(60 if number == '000004' else 1)]
+        invoice = build_invoice(number, date_time, dict(parser['business_data']), cx_name, ADDRESS, cart)
+        ledger.record(number, date_time, cx_name, ADDRESS, cart, invoice['balance_due'])
+        if number != '000004':
+            get_renderer('pdf').render(invoice, os.path.join('invoices', f'{number}.pdf'))
+
+    report = write_statement('acme corp', *month_range('2025-02'), 'statement.pdf')
+    assert report['invoices'] == 2 and report['rendered'] == 1 and report['total'] == '$ 2878.96'
+    with open('statement.pdf', 'rb') as file:
+        data = file.read()
+    assert len(PdfReader(data).pages()) == report['pages'] == 1 + 1 + 3
+    assert data.count(b'/Title (') == 3 and data.count(b'/Subtype /Image') == 2
+    assert not os.path.exists('statement.pdf.tmp')
+
+
+def test_month_range():
+    assert month_range('2024-02') == (dt.date(2024, 2, 1), dt.date(2024, 2, 29))
+    assert month_range('2025-12') == (dt.date(2025, 12, 1), dt.date(2025, 12, 31))
@@ -0,0 +1,72 @@
+import io
+import os
+import shutil
+import docx
+from docx.opc.pkgreader import PackageReader
+import template as template_module
+from template import fill_placeholders, get_template
+
+
+def test_compiled_template():
+    template = get_template('invoice_template.docx')
+    assert '[Invoice Number]' in template.placeholders
+    assert '[Partner Postal]' in template.placeholders
+    assert get_template('invoice_template.docx') is template
+
+    first = template.new_document()
+    first.tables[1].rows[0].cells[0].text = 'changed'
+    second = template.new_document()
+    assert second.tables[1].rows[0].cells[0].text == 'DESCRIPTION'
+    assert first.tables[1].rows[0].cells[0].text == 'changed'
+    assert len(template.placeholder_paragraphs(second)) == len(template.placeholder_indexes)
+
+
+def test_new_document_does_not_reparse(monkeypatch):
+    template = get_template('invoice_template.docx')
+
+    def reparse(*args):
+        raise AssertionError('the template was parsed again')
+
+    monkeypatch.setattr(template_module.docx, 'Document', reparse)
+    monkeypatch.setattr(PackageReader, 'from_file', reparse)
+    document = template.new_document()
+    document.tables[1].rows[0].cells[0].text = 'changed'
+    assert template.new_document().tables[1].rows[0].cells[0].text == 'DESCRIPTION'
+    buffer = io.BytesIO()
+    document.save(buffer)
+    monkeypatch.undo()
+
+    saved = docx.Document(buffer)
+    assert saved.tables[1].rows[0].cells[0].text == 'changed'
+    assert len(saved.part.package.parts) == len(template.new_document().part.package.parts)
+
+
+def test_template_invalidation(tmp_path):
+    path = str(tmp_path / 'template.docx')
+    shutil.copy('invoice_template.docx', path)
+    template = get_template(path)
+
+    os.utime(path, ns=(0, 0))
+    assert get_template(path) is template
+
+    document = template.new_document()
+    document.add_paragraph('[Footer Note]')
+    document.save(path)
+    recompiled = get_template(path)
+    assert recompiled is not template
+    assert '[Footer Note]' in recompiled.placeholders
+
+
+def test_fill_placeholders():
+    template = get_template('invoice_template.docx')
+    document = template.new_document()
+    paragraphs = template.placeholder_paragraphs(document)
+    replacements = {placeholder: placeholder.strip('[]').upper() for placeholder in template.placeholders}
+    replacements['[Partner City]'] = 'Toronto'
+    assert fill_placeholders(paragraphs, replacements) == sum(map(len, template.placeholders.values()))
+
+    texts = [cell.text for row in document.tables[0].rows for cell in row.cells]
+    assert 'Toronto, PARTNER PROVINCE PARTNER POSTAL' in '\n'.join(texts)
+    assert not any('[' in text for text in texts)
+    subtotal = document.tables[2].rows[0].cells[6].paragraphs[0]
+    assert subtotal.text == 'SUBTOTAL' and len(subtotal.runs) == 3
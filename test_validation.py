@@ -0,0 +1,67 @@
+import csv
+import json
+
+import pytest
+
+from validation import validate_city_province, validate_customer, validate_file, validate_postal, validate_unit
+
+
+def test_validators():
+    assert validate_city_province(' toronto , on ') == ('Toronto', 'ON')
+    assert validate_city_province('St Johns, Newfoundland') == ('St Johns', 'Newfoundland')
+    assert validate_unit(' 12b ') == '12B'
+    assert validate_unit('') == ''
+    assert validate_postal('a1b 2c3') == 'A1B 2C3'
+    for value in ('Toronto', 'Toronto, ON, CA', 'Toronto,', 'Toronto 1, ON'):
+        with pytest.raises(ValueError):
+            validate_city_province(value)
+    for value in ('A1B', 'A1B-2C3', 'A1B 2C3 4'):
+        with pytest.raises(ValueError):
+            validate_postal(value)
+
+
+def test_validate_customer():
+    record = {'cx_name': ' smit patel ', 'cx_unit': '', 'cx_street': 'abc street', 'cx_city': 'toronto',
+              'cx_province': 'on', 'cx_postal': 'a1b 2c3'}
+    assert validate_customer(record) == ('Smit Patel', {'cx_street': 'Abc Street', 'cx_city': 'Toronto',
+                                                        'cx_province': 'ON', 'cx_postal': 'A1B 2C3'})
+    nested = {'cx_name': 'Smit', 'cx_address': {'cx_unit': '1', 'cx_street': 'Abc Street',
+                                                'cx_city_province': 'Toronto, Ontario', 'cx_postal': 'A1B2C3'}}
+    assert validate_customer(nested)[1] == {'cx_unit': '1', 'cx_street': 'Abc Street', 'cx_city': 'Toronto',
+                                            'cx_province': 'Ontario', 'cx_postal': 'A1B2C3'}
+    with pytest.raises(ValueError, match='^cx_name: '):
+        validate_customer(dict(record, cx_name='Smit 2'))
+    with pytest.raises(ValueError, match='^cx_city_province: '):
+        validate_customer(dict(record, cx_province=''))
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_validate_file(tmp_path, workers):
+    customers = tmp_path / 'customers.csv'
+    rows = [['cx_name', 'cx_unit', 'cx_street', 'cx_city', 'cx_province', 'cx_postal']]
+    for i in range(50):
+        rows.append(['smit', '', 'abc street', 'toronto', 'on', 'a1b 2c3'] if i % 10 else
+                    ['R2 D2', '', 'Abc Street', 'Toronto', 'ON', 'A1B 2C3'])
+    with open(customers, 'w', newline='') as file:
+        csv.writer(file).writerows(rows)
+
+    valid_path, rejects_path = tmp_path / 'valid.csv', tmp_path / 'rejects.csv'
+    assert validate_file(str(customers), str(valid_path), str(rejects_path), workers, chunk_size=7) == (45, 5)
+    with open(valid_path, newline='') as file:
+        valid = list(csv.DictReader(file))
+    assert len(valid) == 45 and valid[0]['cx_name'] == 'Smit' and valid[0]['cx_province'] == 'ON'
+    with open(rejects_path, newline='') as file:
+        rejects = list(csv.DictReader(file))
+    assert [reject['line_no'] for reject in rejects] == ['2', '12', '22', '32', '42']
+    assert rejects[0]['reason'].startswith('cx_name: ') and rejects[0]['record'].startswith('R2 D2,')
+
+
+def test_validate_jsonl(tmp_path):
+    customers = tmp_path / 'customers.jsonl'
+    record = {'cx_name': 'Smit', 'cx_street': 'Abc Street', 'cx_city': 'Toronto', 'cx_province': 'ON',
+              'cx_postal': 'A1B 2C3'}
+    customers.write_text(json.dumps(record) + '\n\nnot json\n' + json.dumps([1]) + '\n')
+    rejects_path = tmp_path / 'rejects.csv'
+    assert validate_file(str(customers), str(tmp_path / 'valid.csv'), str(rejects_path)) == (1, 2)
+    with open(rejects_path, newline='') as file:
+        assert [row['line_no'] for row in csv.DictReader(file)] == ['3', '4']
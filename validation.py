@@ -0,0 +1,299 @@
+""" Customer and address validation shared by the interactive checkout, batch orders and bulk customer imports. """
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from collections import deque
+from multiprocessing import Pool
+
+OUTPUT_FIELDS: list = ['cx_name', 'cx_unit', 'cx_street', 'cx_city', 'cx_province', 'cx_postal']
+CHUNK_SIZE: int = 20000
+
+
+def validate_name(value):
+    """
+    Returns the customer name in title case.
+
+    Raises:
+    - `ValueError`: Unless the name is letters and spaces only.
+    """
+
+    name = value.strip().title()
+    if not name.replace(' ', '').isalpha():
+        raise ValueError('Please enter a valid name (letters only)')
+    return name
+
+
+def validate_unit(value):
+    """
+    Returns the unit/apt in upper case, or '' when there is none.
+
+    Raises:
+    - `ValueError`: Unless the unit is letters and numbers only.
+    """
+
+    unit = value.strip().upper()
+    if unit and not unit.isalnum():
+        raise ValueError('Please enter a valid unit/apt (Alphanumeric only)')
+    return unit
+
+
+def validate_street(value):
+    """
+    Returns the street address in title case.
+
+    Raises:
+    - `ValueError`: If the street is empty or not letters, numbers and spaces only.
+    """
+
+    street = value.strip().title()
+    if not street or not street.replace(' ', '').isalnum():
+        raise ValueError('Please enter a valid street address (letters and numbers only)')
+    return street
+
+
+def validate_city_province(value):
+    """
+    Splits "City, Province" into the city and province in title case; provinces of up to two letters
+    (e.g. 'ON') are upper-cased.
+
+    Returns:
+    - `city` (str): The city.
+    - `province` (str): The province.
+
+    Raises:
+    - `ValueError`: Unless the value is letters and spaces with exactly one comma between a city and a province.
+    """
+
+    city_province = value.strip().title()
+    if not city_province.replace(' ', '').replace(',', '').isalpha():
+        raise ValueError('Please enter a valid city and province (letters only, format: City, Province)')
+    if city_province.count(',') != 1:
+        raise ValueError('Please enter your city and province (City, Province)')
+    city, province = (part.strip() for part in city_province.split(','))
+    if not city or not province:
+        raise ValueError('Please enter a valid city and province (City, Province)')
+    if len(province) < 3:
+        province = province.upper()
+    return city, province
+
+
+def validate_postal(value):
+    """
+    Returns the postal code in upper case.
+
+    Raises:
+    - `ValueError`: Unless the postal code is 6 or 7 characters of letters, numbers and spaces.
+    """
+
+    postal = value.strip().upper()
+    if not 6 <= len(postal) <= 7 or not postal.replace(' ', '').isalnum():
+        raise ValueError('Please enter a valid postal code (e.g. A1B 2C3)')
+    return postal
+
+
+def validate_customer(record):
+    """
+    Validates and normalizes a customer record exactly like `get_cx_details()` does at the prompt.
+
+    Args:
+    - `record` (dict): `cx_name` and the address, either flat or in a `cx_address` object: `cx_unit`
+      (optional), `cx_street`, `cx_postal` and either `cx_city` and `cx_province` or `cx_city_province`.
+
+    Returns:
+    - `cx_name` (str): The customer's name.
+    - `cx_address` (dict): The customer's address details, without `cx_unit` when there is none.
+
+    Raises:
+    - `ValueError`: For the first invalid field, as `"<field>: <reason>"`.
+    """
+
+    address = record.get('cx_address') or record
+    if not isinstance(address, dict):
+        raise ValueError('cx_address: the address must be an object')
+    field = 'cx_name'
+    try:
+        cx_name = validate_name(_text(record, 'cx_name'))
+        field = 'cx_unit'
+        cx_unit = validate_unit(_text(address, 'cx_unit'))
+        field = 'cx_street'
+        cx_street = validate_street(_text(address, 'cx_street'))
+        field = 'cx_city_province'
+        city_province = _text(address, 'cx_city_province')
+        if not city_province:
+            city, province = _text(address, 'cx_city'), _text(address, 'cx_province')
+            city_province = f'{city}, {province}' if city or province else ''
+        cx_city, cx_province = validate_city_province(city_province)
+        field = 'cx_postal'
+        cx_postal = validate_postal(_text(address, 'cx_postal'))
+    except ValueError as e:
+        raise ValueError(f'{field}: {e}') from None
+
+    cx_address = {'cx_street': cx_street, 'cx_city': cx_city, 'cx_province': cx_province, 'cx_postal': cx_postal}
+    if cx_unit:
+        cx_address = {'cx_unit': cx_unit, **cx_address}
+    return cx_name, cx_address
+
+
+def _text(record, field):
+    value = record.get(field)
+    return value if isinstance(value, str) else '' if value is None else str(value)
+
+
+def validate_chunk(chunk):
+    """
+    Validates a chunk of customer records. Runs in a worker process when the import uses more than one worker.
+
+    Args:
+    - `chunk` (tuple): `(header, records)`, where `records` are `(line_no, row)` pairs and each `row` is a
+      list of CSV values for the columns in `header`, or a JSON line when `header` is None.
+
+    Returns:
+    - `valid` (str): CSV lines of the normalized valid customers.
+    - `rejects` (str): CSV lines of `line_no, reason, record` for the invalid ones.
+    - `valid_count` (int): The number of valid customers.
+    - `reject_count` (int): The number of rejects.
+    """
+
+    header, records = chunk
+    valid, rejects, line = io.StringIO(), io.StringIO(), io.StringIO()
+    valid_writer, rejects_writer = csv.writer(valid), csv.writer(rejects)
+    line_writer = csv.writer(line, lineterminator='')
+    valid_count = reject_count = 0
+    for line_no, row in records:
+        try:
+            record = json.loads(row) if header is None else dict(zip(header, row))
+            if not isinstance(record, dict):
+                raise ValueError('record is not an object')
+            cx_name, cx_address = validate_customer(record)
+        except ValueError as e:
+            if header is not None:
+                line.seek(0)
+                line.truncate()
+                line_writer.writerow(row)
+                row = line.getvalue()
+            rejects_writer.writerow([line_no, str(e), row])
+            reject_count += 1
+            continue
+        valid_writer.writerow([cx_name] + [cx_address.get(field, '') for field in OUTPUT_FIELDS[1:]])
+        valid_count += 1
+    return valid.getvalue(), rejects.getvalue(), valid_count, reject_count
+
+
+def read_chunks(path, chunk_size=CHUNK_SIZE):
+    """
+    Streams a CSV or JSONL customer file in chunks for `validate_chunk()`, so files of any size are
+    validated in constant memory.
+
+    Yields:
+    - `chunk` (tuple): `(header, records)`; see `validate_chunk()`.
+    """
+
+    with open(path, 'r', newline='') as file:
+        if os.path.splitext(path)[1].lower() == '.csv':
+            reader = csv.reader(file)
+            header = [column.strip() for column in next(reader, [])]
+            records = []
+            for row in reader:
+                if row:
+                    records.append((reader.line_num, row))
+                if len(records) == chunk_size:
+                    yield header, records
+                    records = []
+        else:
+            header = None
+            records = []
+            for line_no, line in enumerate(file, start=1):
+                if line.strip():
+                    records.append((line_no, line.strip()))
+                if len(records) == chunk_size:
+                    yield header, records
+                    records = []
+        if records:
+            yield header, records
+
+
+def validate_file(path, valid_path, rejects_path, workers=1, chunk_size=CHUNK_SIZE):
+    """
+    Validates every customer of a CSV or JSONL file, writing the normalized valid customers to `valid_path`
+    and the rejects with their line number and reason to `rejects_path`, both in input order.
+
+    Args:
+    - `path` (str): The customer file; CSV with a header row, or one JSON object per line.
+    - `valid_path` (str): The CSV file for the valid customers (columns `OUTPUT_FIELDS`).
+    - `rejects_path` (str): The CSV file for the rejects (columns `line_no`, `reason`, `record`).
+    - `workers` (int): Number of worker processes; 1 validates in this process.
+    - `chunk_size` (int): Records sent to a worker at a time.
+
+    Returns:
+    - `valid_count` (int): Number of valid customers.
+    - `reject_count` (int): Number of rejected customers.
+    """
+
+    pool = Pool(workers) if workers > 1 else None
+    valid_count = reject_count = 0
+    try:
+        with open(valid_path, 'w', newline='') as valid_file, open(rejects_path, 'w', newline='') as rejects_file:
+            csv.writer(valid_file).writerow(OUTPUT_FIELDS)
+            csv.writer(rejects_file).writerow(['line_no', 'reason', 'record'])
+            results = _validate_chunks(read_chunks(path, chunk_size), pool, workers)
+            for valid, rejects, chunk_valid, chunk_rejects in results:
+                valid_file.write(valid)
+                rejects_file.write(rejects)
+                valid_count += chunk_valid
+                reject_count += chunk_rejects
+    finally:
+        if pool is not None:
+            pool.terminate()
+    return valid_count, reject_count
+
+
+def _validate_chunks(chunks, pool, workers):
+    """
+    Yields the `validate_chunk()` result of every chunk, in order. With a pool, at most two chunks per
+    worker are in flight, so reading never runs ahead of validation and memory stays flat.
+    """
+
+    if pool is None:
+        yield from map(validate_chunk, chunks)
+        return
+    pending = deque()
+    for chunk in chunks:
+        pending.append(pool.apply_async(validate_chunk, (chunk,)))
+        if len(pending) >= workers * 2:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def main():
+    """
+    Command line entry point: `python validation.py customers.csv [--output FILE] [--rejects FILE] [--workers N]`.
+    """
+
+    arg_parser = argparse.ArgumentParser(description='Validate and normalize a customer file.')
+    arg_parser.add_argument('customers', help='customer file (.csv with a header row, or .jsonl)')
+    arg_parser.add_argument('--output', help='valid customers (default: <customers>_valid.csv)')
+    arg_parser.add_argument('--rejects', help='rejected customers with reasons (default: <customers>_rejects.csv)')
+    arg_parser.add_argument('--workers', type=int, default=1, help='number of worker processes (default: 1)')
+    arg_parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='records sent to a worker at a time')
+    args = arg_parser.parse_args()
+
+    stem = os.path.splitext(args.customers)[0]
+    valid_path = args.output or f'{stem}_valid.csv'
+    rejects_path = args.rejects or f'{stem}_rejects.csv'
+
+    start = time.perf_counter()
+    valid_count, reject_count = validate_file(args.customers, valid_path, rejects_path, args.workers, args.chunk_size)
+    elapsed = time.perf_counter() - start
+    total = valid_count + reject_count
+    print(f'Valid customers  : {valid_count} -> {valid_path}')
+    print(f'Rejected         : {reject_count} -> {rejects_path}')
+    print(f'Elapsed          : {elapsed:.2f}s ({total / elapsed if elapsed > 0 else 0.0:,.0f} records/sec)')
+    raise SystemExit(1 if reject_count else 0)
+
+
+if __name__ == "__main__":
+    main()